@@ -0,0 +1,279 @@
+"""Benchmarks for the TUI hot paths, driven by Textual's headless pilot.
+
+Run from the repository root with meshrc installed:
+
+    python benchmarks/bench_tui.py --output results.json
+    python benchmarks/bench_tui.py --quick --compare results.json
+
+Results are written as JSON (one record per benchmark and size) so runs from
+different releases can be compared; --compare exits non-zero when any
+benchmark got slower than the baseline by more than --threshold. Once a
+benchmark takes longer than --max-seconds, its larger sizes are recorded as
+skipped rather than run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from importlib.metadata import version
+
+from textual.app import App, ComposeResult
+
+from meshrc.__main__ import CREATE_MSGS_TABLE_SQL
+from meshrc.app import MeshrcApp
+from meshrc.messages import NewMessage
+from meshrc.record import incoming_record
+from meshrc.simulate import parse_simulate_spec
+from meshrc.widgets.message_log import MessageLog
+from meshrc.widgets.sidebar import Sidebar
+
+MESSAGE_SIZES = (1_000, 10_000, 100_000)
+CONTACT_SIZES = (100, 1_000, 5_000, 20_000)
+QUICK_MESSAGE_SIZES = (1_000,)
+QUICK_CONTACT_SIZES = (100,)
+
+# The app is driven headless at a fixed terminal size
+SCREEN_SIZE = (120, 40)
+
+
+def make_channel_msg(i: int) -> dict:
+    return {
+        "type": "CHAN",
+        "channel_idx": 0,
+        "path_len": i % 4,
+        "txt_type": 0,
+        "sender_timestamp": 1_700_000_000 + i,
+        "text": f"node-{i % 37:04d}: benchmark message number {i} on the mesh",
+        "context_type": "channel",
+        "channel_name": "Public",
+    }
+
+
+def make_channel_record(i: int):
+    return incoming_record(make_channel_msg(i), "chan_0")
+
+
+def make_contacts(count: int) -> dict:
+    contacts = {}
+    for i in range(count):
+        key = f"{i:064x}"
+        contacts[key] = {"public_key": key, "type": 1, "adv_name": f"node-{i:05d}"}
+    return contacts
+
+
+def simulated_app(**connection_args) -> MeshrcApp:
+    # A quiet synthetic mesh: no background traffic to disturb timings
+    spec = parse_simulate_spec("contacts=0,channels=1,rate=0,seed=1")
+    return MeshrcApp(
+        {"type": "simulate", "simulate": spec, "state": ":memory:", **connection_args}
+    )
+
+
+class LogApp(App):
+    def compose(self) -> ComposeResult:
+        yield MessageLog()
+
+
+async def bench_add_message(size: int) -> float:
+    app = LogApp()
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        log = app.query_one(MessageLog)
+        # Records are normalized at ingest; this measures rendering them
+        records = [make_channel_record(i) for i in range(size)]
+        start = time.perf_counter()
+        for record in records:
+            log.add_record(record)
+        await pilot.pause()
+        return time.perf_counter() - start
+
+
+async def bench_context_switch(size: int) -> float:
+    app = simulated_app()
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await pilot.pause()
+        app.message_history["chan_0"] = [make_channel_record(i) for i in range(size)]
+        start = time.perf_counter()
+        app._switch_context("chan_0")
+        await pilot.pause()
+        return time.perf_counter() - start
+
+
+async def bench_sidebar_refresh(size: int) -> float:
+    app = simulated_app()
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await pilot.pause()
+        sidebar = app.query_one(Sidebar)
+        start = time.perf_counter()
+        await sidebar.update_contacts(make_contacts(size))
+        await pilot.pause()
+        return time.perf_counter() - start
+
+
+async def bench_sidebar_search(size: int) -> float:
+    app = simulated_app()
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await pilot.pause()
+        sidebar = app.query_one(Sidebar)
+        await sidebar.update_contacts(make_contacts(size))
+        await pilot.pause()
+        start = time.perf_counter()
+        # Typing a query refreshes on every keystroke
+        for query in ("n", "no", "nod", "node-0", "node-00"):
+            sidebar.search_query = query
+            await sidebar.refresh_list()
+        await pilot.pause()
+        return time.perf_counter() - start
+
+
+async def bench_new_message_burst(size: int) -> float:
+    app = simulated_app()
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await pilot.pause()
+        app._switch_context("chan_0")
+        await pilot.pause()
+        start = time.perf_counter()
+        for i in range(size):
+            app.post_message(NewMessage(make_channel_record(i)))
+        while len(app.message_history.get("chan_0", ())) < size:
+            await asyncio.sleep(0.001)
+        await pilot.pause()
+        return time.perf_counter() - start
+
+
+async def bench_log_message(size: int, sink: str) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        connection_args = {}
+        if sink == "jsonl":
+            connection_args["log_file"] = os.path.join(tmp, "log.jsonl")
+        else:
+            db_path = os.path.join(tmp, "log.db")
+            with sqlite3.connect(db_path) as conn:
+                conn.execute(CREATE_MSGS_TABLE_SQL)
+            connection_args["log_db"] = db_path
+
+        app = simulated_app(**connection_args)
+        async with app.run_test(size=SCREEN_SIZE) as pilot:
+            await pilot.pause()
+            records = [make_channel_record(i) for i in range(size)]
+            start = time.perf_counter()
+            for record in records:
+                app._log_message(record)
+            app.log_sink.flush()
+            await pilot.pause()
+            return time.perf_counter() - start
+
+
+def benchmarks(quick: bool):
+    message_sizes = QUICK_MESSAGE_SIZES if quick else MESSAGE_SIZES
+    contact_sizes = QUICK_CONTACT_SIZES if quick else CONTACT_SIZES
+    for size in message_sizes:
+        yield "message_log.add_message", size, lambda n=size: bench_add_message(n)
+        yield "app.switch_context", size, lambda n=size: bench_context_switch(n)
+        yield (
+            "app.on_new_message_burst",
+            size,
+            lambda n=size: bench_new_message_burst(n),
+        )
+        for store in ("jsonl", "sqlite"):
+            yield (
+                f"app.log_message.{store}",
+                size,
+                lambda n=size, store=store: bench_log_message(n, store),
+            )
+    for size in contact_sizes:
+        yield "sidebar.refresh_list", size, lambda n=size: bench_sidebar_refresh(n)
+        yield "sidebar.search", size, lambda n=size: bench_sidebar_search(n)
+
+
+def compare(results: list[dict], baseline_path: str, threshold: float) -> list[str]:
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        base = baseline.get((result["name"], result["size"]))
+        if result.get("skipped") or not base or not base.get("seconds"):
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        line = f"{result['name']}[{result['size']}]: {ratio:.2f}x baseline"
+        print(line, file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark meshrc TUI hot paths")
+    parser.add_argument("--quick", action="store_true", help="Only run small sizes")
+    parser.add_argument(
+        "--filter", default="", help="Only run benchmarks containing this"
+    )
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=60.0,
+        help="Skip larger sizes of a benchmark once a run takes longer than this",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown ratio that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    too_slow = set()
+    for name, size, bench in benchmarks(args.quick):
+        if args.filter not in name:
+            continue
+        if name in too_slow:
+            print(f"{name}[{size}]: skipped", file=sys.stderr)
+            results.append({"name": name, "size": size, "skipped": True})
+            continue
+
+        seconds = asyncio.run(bench())
+        result = {
+            "name": name,
+            "size": size,
+            "seconds": round(seconds, 6),
+            "ops_per_sec": round(size / seconds, 1) if seconds else None,
+        }
+        print(f"{name}[{size}]: {seconds:.3f}s", file=sys.stderr)
+        results.append(result)
+        if seconds > args.max_seconds:
+            too_slow.add(name)
+
+    report = {
+        "meshrc": version("meshrc"),
+        "textual": version("textual"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,34 @@
 import argparse
+import asyncio
 import sys
 import sqlite3
 import os
 
 from . import __version__
 from .app import MeshrcApp
+from .heartbeat import HEARTBEAT_INTERVAL
+from .logdb import (
+    CREATE_MSGS_INDEX_SQL,
+    CREATE_MSGS_TABLE_SQL,
+    enable_wal,
+    init_msgs_db,
+)
 
 
 def run():
+    if sys.argv[1:2] == ["stats"]:
+        from .logstats import main
+
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ["archive"]:
+        from .archive import main
+
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] in (["import"], ["export"]):
+        from .logtransfer import main
+
+        sys.exit(main(sys.argv[1], sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description=f"MeshRC {__version__}")
 
     parser.add_argument("-s", "--serial", help="Serial port (e.g. /dev/ttyUSB0)")
@@ -21,23 +42,248 @@ def run():
     parser.add_argument("-t", "--target", help="TCP host (e.g. localhost)")
     parser.add_argument("-p", "--port", type=int, default=4403, help="TCP port")
     parser.add_argument("-a", "--address", help="BLE device address")
+    parser.add_argument(
+        "--simulate",
+        nargs="?",
+        const="",
+        metavar="SPEC",
+        help="Use a synthetic mesh instead of a device "
+        "(options as key=value,..., e.g. contacts=500,rate=20)",
+    )
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help="Find a device on serial ports, --discover-tcp hosts and BLE",
+    )
+    parser.add_argument(
+        "--discover-tcp",
+        action="append",
+        default=[],
+        metavar="HOST[:PORT]",
+        help="TCP host to probe with --discover (repeatable)",
+    )
+    parser.add_argument(
+        "--no-ble", action="store_true", help="Don't scan BLE with --discover"
+    )
+    parser.add_argument(
+        "--device",
+        action="append",
+        metavar="[NAME=]KIND:ARG",
+        help="Connect to a device (repeatable), e.g. north=serial:/dev/ttyUSB0, "
+        "tcp:host:port, ble:ADDRESS, simulate:SPEC, attach:SOCKET",
+    )
+    parser.add_argument(
+        "--daemon",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="Run headless, serving TUI clients on a Unix socket",
+    )
+    parser.add_argument(
+        "--attach",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="Attach to a running meshrc daemon instead of a device",
+    )
+    parser.add_argument(
+        "--replay", help="Replay a recorded session instead of a device"
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="Replay speed factor (0 = as fast as possible)",
+    )
+    parser.add_argument(
+        "--record", help="Record all device events to a file (.gz to compress)"
+    )
+    parser.add_argument(
+        "--highlight",
+        action="append",
+        metavar="TERMS",
+        help="Callsigns or keywords to highlight as mentions "
+        "(comma-separated, repeatable; your node names are included)",
+    )
+    parser.add_argument(
+        "--no-highlight-self",
+        action="store_true",
+        help="Don't treat your own node names as mentions",
+    )
+    parser.add_argument(
+        "--rules",
+        metavar="PATH",
+        help="JSON file of rules to drop, log only or collapse received messages",
+    )
     parser.add_argument("--log", help="Log file path (JSON format)")
+    parser.add_argument(
+        "--state",
+        help="File keeping favorites, recents and read markers "
+        "(default ~/.config/meshrc/state.db)",
+    )
     parser.add_argument("--logdb", help="Log database path (SQLite)")
+    parser.add_argument(
+        "--logdb-partition",
+        action="store_true",
+        help="Write messages to monthly files next to --logdb (e.g. meshrc.2024-05.db)",
+    )
+    parser.add_argument(
+        "--logdb-compact",
+        action="store_true",
+        help="Store --logdb messages without repeating their columns in raw_json",
+    )
+    parser.add_argument(
+        "--retention-days",
+        type=float,
+        metavar="DAYS",
+        help="Remove --logdb messages older than this",
+    )
+    parser.add_argument(
+        "--retention-size",
+        type=float,
+        metavar="MB",
+        help="Remove the oldest --logdb messages beyond this size",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Periodically export metrics (.prom/.txt: Prometheus text, else JSON)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=15,
+        help="Seconds between metrics exports",
+    )
+    parser.add_argument(
+        "--profile", help="Profile the app and write the profile here on exit"
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=["cprofile", "sample"],
+        default="cprofile",
+        help="cprofile: deterministic pstats; sample: sampled folded stacks",
+    )
+    parser.add_argument(
+        "--watchdog",
+        type=float,
+        metavar="MS",
+        help="Record event loop stalls longer than this many milliseconds",
+    )
+    parser.add_argument(
+        "--watchdog-log",
+        default="meshrc-stalls.log",
+        help="File to record loop stalls in",
+    )
+    parser.add_argument(
+        "--heartbeat",
+        type=float,
+        default=HEARTBEAT_INTERVAL,
+        metavar="SECONDS",
+        help="Seconds between link health probes of each device (0 disables)",
+    )
+    parser.add_argument(
+        "--poll",
+        action="append",
+        help="Poll status of contacts (names or key prefixes, comma-separated)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=900,
+        help="Seconds between status polls of each contact",
+    )
 
     args = parser.parse_args()
 
     connection_args = {}
+    if args.state:
+        connection_args["state"] = args.state
+
+    if args.highlight:
+        from .highlight import parse_terms
+
+        connection_args["highlight"] = parse_terms(args.highlight)
+    if args.no_highlight_self:
+        connection_args["highlight_own_name"] = False
+
+    if args.rules:
+        from .rules import load_rules
+
+        try:
+            connection_args["rules"] = load_rules(args.rules)
+        except ValueError as e:
+            parser.error(str(e))
+
     if args.log:
         connection_args["log_file"] = args.log
     
+    retention = args.retention_days or args.retention_size
+    if (retention or args.logdb_partition or args.logdb_compact) and not args.logdb:
+        parser.error(
+            "--retention-*, --logdb-partition and --logdb-compact need --logdb"
+        )
+
     if args.logdb:
-        if check_and_init_db(args.logdb):
+        if check_and_init_db(
+            args.logdb, retention=bool(retention), compact=args.logdb_compact
+        ):
             connection_args["log_db"] = args.logdb
         else:
              print("Database initialization failed or cancelled.")
              sys.exit(1)
+        if args.logdb_partition:
+            connection_args["log_partitioned"] = True
+        if args.logdb_compact:
+            connection_args["log_compact"] = True
+        if retention:
+            from .retention import Retention
+
+            connection_args["log_retention"] = Retention(
+                args.retention_days,
+                int(args.retention_size * 2**20) if args.retention_size else None,
+            )
+
+    if args.metrics_file:
+        connection_args["metrics_file"] = args.metrics_file
+        connection_args["metrics_interval"] = args.metrics_interval
+
+    if args.watchdog:
+        connection_args["watchdog"] = args.watchdog / 1000
+        connection_args["watchdog_log"] = args.watchdog_log
+
+    if args.heartbeat > 0:
+        connection_args["heartbeat"] = args.heartbeat
+
+    if args.poll:
+        connection_args["poll"] = [
+            target.strip()
+            for targets in args.poll
+            for target in targets.split(",")
+            if target.strip()
+        ]
+        connection_args["poll_interval"] = args.poll_interval
+
+    if args.record:
+        connection_args["record"] = args.record
 
-    if args.serial:
+    if args.attach is not None:
+        from .daemon import default_socket_path
+
+        connection_args["type"] = "attach"
+        connection_args["socket"] = args.attach or default_socket_path()
+    elif args.replay:
+        connection_args["type"] = "replay"
+        connection_args["replay"] = args.replay
+        connection_args["replay_speed"] = args.replay_speed
+    elif args.simulate is not None:
+        from .simulate import parse_simulate_spec
+
+        try:
+            connection_args["type"] = "simulate"
+            connection_args["simulate"] = parse_simulate_spec(args.simulate)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.serial:
         connection_args["type"] = "serial"
         connection_args["port"] = args.serial
         connection_args["baudrate"] = args.baudrate
@@ -48,30 +294,77 @@ def run():
     elif args.address:
         connection_args["type"] = "ble"
         connection_args["address"] = args.address
-    else:
-        # If no explicit connection arg, maybe user wants to scan?
-        # For now, require arguments.
-        parser.print_help()
-        sys.exit(1)
+    elif args.discover:
+        from .discovery import resolve_endpoint
+
+        print("Looking for MeshCore devices...")
+        endpoint, results = asyncio.run(
+            resolve_endpoint(args.discover_tcp, ble=not args.no_ble)
+        )
+        for result in results:
+            ms = result["latency"] * 1000
+            print(f"  {ms:6.0f} ms  {result['name']}  {result['args']}")
+        if not endpoint:
+            print("No MeshCore devices found.")
+            sys.exit(1)
+        connection_args.update(endpoint)
+    elif not args.device:
+        # Without connection args, reconnect to the last device that worked
+        from .discovery import load_endpoint
+
+        endpoint = load_endpoint()
+        if not endpoint:
+            parser.print_help()
+            sys.exit(1)
+        print(f"Connecting to last used device {endpoint} (--discover to scan)")
+        connection_args.update(endpoint)
+
+    if args.device:
+        from .devices import parse_device_spec
+
+        devices = []
+        if "type" in connection_args:
+            devices.append(
+                {k: connection_args[k] for k in DEVICE_KEYS if k in connection_args}
+            )
+        try:
+            devices.extend(parse_device_spec(spec) for spec in args.device)
+        except ValueError as e:
+            parser.error(str(e))
+        if len(devices) == 1:
+            connection_args.update(devices[0])
+        else:
+            connection_args["type"] = "devices"
+            connection_args["devices"] = devices
+
+    if args.daemon is not None:
+        if connection_args["type"] == "attach":
+            parser.error("--daemon needs a device, not --attach")
+        if connection_args["type"] == "devices":
+            parser.error("--daemon serves a single device")
+        from .daemon import default_socket_path, run_daemon
+
+        run_daemon(connection_args, args.daemon or default_socket_path())
+        return
 
     app = MeshrcApp(connection_args)
-    app.run()
-
-
-def check_and_init_db(path):
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS msgs (
-        timestamp INTEGER,
-        sender TEXT,
-        name TEXT,
-        text TEXT,
-        type TEXT,
-        channel_idx INTEGER,
-        pubkey_prefix TEXT,
-        raw_json TEXT
-    );
-    """
-    
+    if args.profile:
+        from .profiling import run_profiled
+
+        run_profiled(app.run, args.profile, args.profile_mode)
+    else:
+        app.run()
+
+
+# Connection args that describe the device itself, as opposed to app options
+DEVICE_KEYS = (
+    "type", "port", "baudrate", "host", "address", "simulate", "replay",
+    "replay_speed", "socket",
+)
+
+def check_and_init_db(path, retention=False, compact=False):
+    create_table_sql = CREATE_MSGS_TABLE_SQL
+
     # Check if exists
     if not os.path.exists(path):
         print(f"Database at '{path}' does not exist.")
@@ -82,7 +375,7 @@ def check_and_init_db(path):
         # Create
         try:
             with sqlite3.connect(path) as conn:
-                conn.execute(create_table_sql)
+                init_msgs_db(conn)
             print(f"Created database at '{path}'.")
             return True
         except Exception as e:
@@ -101,6 +394,32 @@ def check_and_init_db(path):
                      return False
                 conn.execute(create_table_sql)
                 print("Created 'msgs' table.")
+            conn.execute(CREATE_MSGS_INDEX_SQL)
+            enable_wal(conn)
+
+            (auto_vacuum,) = conn.execute("PRAGMA auto_vacuum").fetchone()
+            if retention and auto_vacuum != 2:
+                # Otherwise pruned space is reused but the file never shrinks
+                print("Retention works best with incremental vacuum, which needs")
+                print("the database to be rewritten once (this may take a while).")
+                response = input("Convert it now? [y/N] ").strip().lower()
+                if response == 'y':
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.execute("VACUUM")
+
+            if compact:
+                (plain,) = conn.execute(
+                    "SELECT COUNT(*) FROM msgs WHERE typeof(raw_json) = 'text'"
+                ).fetchone()
+                if plain:
+                    print(f"{plain} logged messages are stored uncompacted.")
+                    response = input("Compact them now (this may take a while)? [y/N] ")
+                    response = response.strip().lower()
+                    if response == 'y':
+                        from .logcompact import compact_rows
+
+                        print(f"Compacted {compact_rows(conn)} messages.")
+                        conn.execute("VACUUM")
     except Exception as e:
         print(f"Error checking database: {e}")
         return False
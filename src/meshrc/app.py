@@ -1,31 +1,63 @@
 import asyncio
-import json
 import time
-import sqlite3
+from contextlib import suppress
+from dataclasses import replace
 
-from meshcore import MeshCore
 from textual.app import App, ComposeResult
 from textual.command import Provider
 from textual.containers import Horizontal, Vertical
 from textual.reactive import reactive
 from textual.widgets import Button, Footer, Header, Input, Static
 
-from .client import MeshClient
+from . import bulk
+from .devices import Device, MessageDeduper
+from .discovery import save_endpoint
+from .highlight import MENTIONS, HighlightMatcher
+from .linkstats import LINK_SAVE_INTERVAL, LinkStats, read_link_series, save_link_series
+from .logdb import QueryCancelled, ReaderPool, search_messages
+from .paths import config_path
+from .record import MessageRecord, logged_record, outgoing_record
+from .logsink import LogSink
+from .metrics import REGISTRY
 from .messages import (
     ChannelListUpdated,
     ConnectionStatus,
     ContactListUpdated,
+    LinkHealth,
+    MessageDelivery,
     NewMessage,
+    SyncProgress,
 )
 from .screens.channel import ChannelScreen
 from .screens.settings import SettingsScreen
 from .screens.confirmation import ConfirmationScreen
+from .screens.link import LinkScreen
+from .screens.results import BulkResultsScreen
+from .screens.stats import StatsScreen
+from .state import STATE_FILE, StateStore, unread_counts
 from .widgets.message_log import MessageLog
 from .widgets.message_log import MessageLog
 from .widgets.sidebar import ContactItem, Sidebar, SidebarHeader
+from .widgets.statusbar import StatusBar
 from .widgets.tabbar import TabBar
 
 
+NEW_MESSAGE_TIME = REGISTRY.histogram(
+    "meshrc_new_message_seconds", "Time to ingest a message in the app"
+)
+
+# Messages read back from the --log when a conversation is first opened
+LOG_HISTORY_SIZE = 200
+
+
+def split_many(args: str) -> tuple[bool, str]:
+    """Split a leading `many` word off slash command arguments."""
+    words = args.split(maxsplit=1)
+    if words and words[0] == "many":
+        return True, words[1] if len(words) > 1 else ""
+    return False, args
+
+
 class MessageInput(Input):
     BINDINGS = [
         ("ctrl+w", "app.close_tab", "Close Tab"),
@@ -64,24 +96,53 @@ class MeshrcApp(App):
         ("ctrl+n", "next_buffer", "Next"),
         ("ctrl+p", "prev_buffer", "Prev"),
         ("alt+a", "next_active", "Next Active"),
+        ("alt+m", "next_mention", "Next Mention"),
         ("ctrl+w", "close_tab", "Close Tab"),
+        ("f2", "stats", "Stats"),
+        ("f3", "link_quality", "Link"),
     ]
 
     def __init__(self, connection_args, **kwargs):
         super().__init__(**kwargs)
         self.connection_args = connection_args
-        self.mc = None
+        self.devices = [
+            Device(self, index, args)
+            for index, args in enumerate(
+                connection_args.get("devices") or [connection_args]
+            )
+        ]
+        self.mc = None  # The first device's, used where no device is implied
         self.client = None
         self.active_recipient = None  # Can be channel idx (int) or contact pubkey (str)
         self.active_recipient_type = None  # 'channel' or 'contact'
-        self.message_history = {}  # Key: recipient_id, Value: list of messages
+        self.active_device = None  # Device that sends to the active recipient
+        self.active_context = None
+        self.active_title = None  # Name shown on the active context's tab
+        # Key: channel context id, Value: (device, channel idx)
+        self.channel_owners = {}
+        self.deduper = MessageDeduper()
+        self.highlighter = HighlightMatcher(connection_args.get("highlight", ()))
+        # RuleSet, used by each device's client
+        self.rules = connection_args.get("rules")
+        self.link_stats = LinkStats()  # SNR, RSSI and hops per context
+        self.message_history = {}  # Key: recipient_id, Value: list of MessageRecords
+        # Key: expected ack code, Value: (context id, history index)
+        self.outgoing_acks = {}
+        self.redraw_pending = None  # (context id, first history index) to redraw
+        self.history_loaded = set()  # Context ids whose logged history was loaded
+        self.log_sink = None
+        self.log_readers = None  # ReaderPool for queries against --logdb
+        self.watchdog = None
+        self.state = StateStore(connection_args.get("state") or config_path(STATE_FILE))
+        self.started = int(time.time())
 
     def compose(self) -> ComposeResult:
-        yield Sidebar()
+        yield Sidebar(state=self.state)
         with Vertical(id="main_content"):
             yield TabBar(id="main_tabbar")
             with Vertical(id="message_container"):
                 yield MessageLog()
+            yield StatusBar(id="status_bar")
             yield Input(placeholder="Type a message...", id="message_input")
         yield Footer()
 
@@ -95,35 +156,201 @@ class MeshrcApp(App):
     async def on_mount(self) -> None:
         self.title = "MeshRC"
 
-        # Initialize MeshCore based on args
+        if self.connection_args.get("log_file") or self.connection_args.get("log_db"):
+            self.log_sink = LogSink(
+                self.connection_args.get("log_file"),
+                self.connection_args.get("log_db"),
+                on_error=self._log_sink_error,
+                partitioned=self.connection_args.get("log_partitioned", False),
+                retention=self.connection_args.get("log_retention"),
+                compact=self.connection_args.get("log_compact", False),
+            )
+        if self.connection_args.get("log_db"):
+            self.log_readers = ReaderPool(
+                self.connection_args["log_db"],
+                partitioned=self.connection_args.get("log_partitioned", False),
+            )
+            self.run_worker(self._load_link_stats(), group="links")
+            self.set_interval(LINK_SAVE_INTERVAL, self._save_link_stats)
+
+        if self.connection_args.get("watchdog"):
+            from .profiling import LoopWatchdog
+
+            self.watchdog = LoopWatchdog(
+                self.connection_args["watchdog"],
+                self.connection_args.get("watchdog_log", "meshrc-stalls.log"),
+            )
+            self.watchdog.start(asyncio.get_running_loop())
+
+        if self.connection_args.get("metrics_file"):
+            self.set_interval(
+                self.connection_args.get("metrics_interval", 15),
+                self._export_metrics,
+            )
+
+        # Initialize MeshCore based on args. Other devices connect in the
+        # background so a slow link doesn't hold up the first one.
+        for device in self.devices[1:]:
+            self.run_worker(
+                self._connect_device(device), group=f"connect_{device.name}"
+            )
+
+        primary = self.devices[0]
         try:
-            if self.connection_args["type"] == "serial":
-                self.mc = await MeshCore.create_serial(
-                    port=self.connection_args["port"],
-                    baudrate=self.connection_args.get("baudrate", 115200),
-                )
-            elif self.connection_args["type"] == "tcp":
-                self.mc = await MeshCore.create_tcp(
-                    host=self.connection_args["host"], port=self.connection_args["port"]
+            await primary.connect(record_path=self.connection_args.get("record"))
+            self.mc = primary.mc
+            self.client = primary.client
+            self._highlight_own_name(primary)
+            save_endpoint(primary.connection_args)
+
+            if self.connection_args.get("log_db"):
+                # After connecting, so direct messages map to known contacts
+                self.run_worker(self._load_unread(), group="unread")
+
+            if primary.connection_args["type"] == "replay":
+                self.run_worker(self._report_replay(), group="replay")
+
+            if self.connection_args.get("poll"):
+                self.client.start_poller(
+                    self.connection_args["poll"],
+                    self.connection_args.get("log_db"),
+                    self.connection_args.get("poll_interval"),
                 )
-            elif self.connection_args["type"] == "ble":
-                self.mc = await MeshCore.create_ble(
-                    address=self.connection_args.get("address")
-                )
-            else:
-                self.notify("Unknown connection type", severity="error")
-                return
 
-            self.client = MeshClient(self, self.mc)
-            await self.client.start_subscriptions()
-            await self.client.fetch_initial_data()
-
-            self.notify("Connected to MeshCore")
+            self.notify(self._device_label(primary, "Connected to MeshCore"))
 
         except Exception as e:
-            self.notify(f"Connection failed: {e}", severity="error")
+            self.notify(
+                self._device_label(primary, f"Connection failed: {e}"),
+                severity="error",
+            )
             # In a real app, might want to show an error screen
 
+    async def _connect_device(self, device: Device):
+        try:
+            await device.connect()
+            self._highlight_own_name(device)
+            self.notify(self._device_label(device, "Connected to MeshCore"))
+        except Exception as e:
+            self.notify(
+                self._device_label(device, f"Connection failed: {e}"),
+                severity="error",
+            )
+
+    def _device_label(self, device: Device, text: str) -> str:
+        return f"{device.name}: {text}" if len(self.devices) > 1 else text
+
+    def _highlight_own_name(self, device: Device):
+        # Messages naming one of our nodes are mentions too
+        if self.connection_args.get("highlight_own_name", True):
+            self.highlighter.add(device.mc.self_info.get("name", ""))
+
+    def _message_device(self, message) -> Device:
+        # Messages posted by a device's client are tagged with it
+        return getattr(message, "device", None) or self.devices[0]
+
+    async def _load_unread(self):
+        """Restore unread counts for messages logged since each context was read."""
+        # Snapshot what the mapping needs; it runs in a thread
+        primary = self.devices[0]
+        channel_contexts = dict(primary.channel_contexts)
+        contact_keys = list(primary.mc.contacts)
+
+        def context_for(msg_type, channel_idx, pubkey_prefix):
+            if msg_type == "CHAN":
+                return channel_contexts.get(channel_idx, f"chan_{channel_idx}")
+            if not pubkey_prefix:
+                return None
+            for key in contact_keys:
+                if key.startswith(pubkey_prefix):
+                    return f"contact_{key}"
+            return f"contact_{pubkey_prefix}"
+
+        counts = await self.log_readers.run(
+            unread_counts,
+            context_for,
+            self.state.read_since,
+            self.started,
+            key="unread",
+        )
+        sidebar = self.query_one(Sidebar)
+        for context_id, count in counts.items():
+            if context_id == self._get_active_id():
+                continue
+            # Messages received since startup are already counted
+            count += sidebar.unread_counts.get(context_id, 0)
+            sidebar.set_unread(context_id, count)
+
+    def on_unmount(self) -> None:
+        for device in self.devices:
+            device.close()
+        if self._get_active_id():
+            self.state.mark_read(self._get_active_id())
+        self.state.close()
+        if self.log_sink:
+            self.log_sink.close()
+        if self.connection_args.get("log_db"):
+            # Only the link history since the last save is lost on failure
+            with suppress(Exception):
+                save_link_series(
+                    self.connection_args["log_db"], self.link_stats.snapshot()
+                )
+        if self.log_readers:
+            self.log_readers.close()
+        if self.watchdog:
+            self.watchdog.stop()
+        if self.connection_args.get("metrics_file"):
+            REGISTRY.export(self.connection_args["metrics_file"])
+
+    async def _export_metrics(self):
+        try:
+            await asyncio.to_thread(
+                REGISTRY.export, self.connection_args["metrics_file"]
+            )
+        except OSError as e:
+            self.notify(f"Metrics export failed: {e}", severity="error")
+
+    def action_stats(self) -> None:
+        self.push_screen(StatsScreen())
+
+    def action_link_quality(self) -> None:
+        if not self._get_active_id():
+            self.notify("Open a channel or contact first", severity="warning")
+            return
+        self.push_screen(
+            LinkScreen(self.link_stats, self.active_context, self.active_title)
+        )
+
+    async def _load_link_stats(self):
+        try:
+            rows = await self.log_readers.run(read_link_series)
+        except Exception as e:
+            self.notify(f"Could not load link history: {e}", severity="warning")
+            return
+        self.link_stats.load(rows)
+        sidebar = self.query_one(Sidebar)
+        for context_id in self.link_stats.series:
+            sidebar.set_weak_link(context_id, self.link_stats.degraded(context_id))
+
+    async def _save_link_stats(self):
+        try:
+            await asyncio.to_thread(
+                save_link_series,
+                self.connection_args["log_db"],
+                self.link_stats.snapshot(),
+            )
+        except Exception as e:
+            self.notify(f"Saving link history failed: {e}", severity="error")
+
+    async def _report_replay(self):
+        await self.mc.finished.wait()
+        stats = self.mc.stats
+        rate = stats["events"] / stats["elapsed"] if stats["elapsed"] else 0
+        self.notify(
+            f"Replay finished: {stats['events']} events in "
+            f"{stats['elapsed']:.2f}s ({rate:.0f} events/s)"
+        )
+
     async def action_toggle_favorite(self):
         if self.active_recipient_type == "contact" and self.active_recipient:
             item_id = f"contact_{self.active_recipient}"
@@ -148,6 +375,13 @@ class MeshrcApp(App):
         if item:
             self._activate_item(item)
 
+    def action_next_mention(self):
+        item = self.query_one(Sidebar).select_next_mention()
+        if item:
+            self._activate_item(item)
+        else:
+            self.notify("No unread mentions")
+
     def _activate_item(self, item):
         self._switch_context(item.id)
         if item.id and item.id.startswith("contact_"):
@@ -183,6 +417,7 @@ class MeshrcApp(App):
             # For now, clear.
             self.active_recipient = None
             self.active_recipient_type = None
+            self.active_context = None
             self.query_one(MessageLog).clear()
             # Try to activate another tab if available
             # ... (omitted for brevity, could rely on defaults)
@@ -227,9 +462,10 @@ class MeshrcApp(App):
             return
 
         # Get current name
+        device = self.active_device
         current_name = ""
-        if hasattr(self.mc, "channels"):
-            for ch in self.mc.channels:
+        if hasattr(device.mc, "channels"):
+            for ch in device.mc.channels:
                 if ch.get("channel_idx") == self.active_recipient:
                     current_name = ch.get("channel_name", "")
                     break
@@ -238,24 +474,29 @@ class MeshrcApp(App):
             if not data:
                 return
             if data.get("action") == "save" and data.get("name"):
-                asyncio.create_task(self._edit_channel(data["idx"], data["name"], data.get("key")))
+                asyncio.create_task(
+                    self._edit_channel(
+                        data["idx"], data["name"], data.get("key"), device
+                    )
+                )
             elif data.get("action") == "delete":
-                asyncio.create_task(self._delete_channel(data["idx"]))
+                asyncio.create_task(self._delete_channel(data["idx"], device))
 
         self.push_screen(
             ChannelScreen(channel_idx=self.active_recipient, name=current_name),
             handle_edit,
         )
 
-    async def _edit_channel(self, idx, name, key=None):
+    async def _edit_channel(self, idx, name, key=None, device=None):
+        device = device or self.devices[0]
         try:
             if key:
-                await self.mc.commands.set_channel(idx, name, key)
+                await device.mc.commands.set_channel(idx, name, key)
             else:
-                await self.mc.commands.set_channel(idx, name)
+                await device.mc.commands.set_channel(idx, name)
             
             self.notify(f"Updated channel {idx} to {name}")
-            await self.client.fetch_initial_data()
+            await device.client.fetch_initial_data()
         except Exception as e:
             self.notify(f"Failed to edit channel: {e}", severity="error")
 
@@ -264,153 +505,215 @@ class MeshrcApp(App):
             self.notify("Select a channel to delete", severity="warning")
             return
 
+        device = self.active_device
+
         def handle_confirm(confirm):
             if confirm:
-                asyncio.create_task(self._delete_channel(self.active_recipient))
+                asyncio.create_task(self._delete_channel(self.active_recipient, device))
 
         self.push_screen(
             ConfirmationScreen(f"Are you sure you want to delete channel {self.active_recipient}?"),
             handle_confirm
         )
 
-    async def _delete_channel(self, idx):
+    async def _delete_channel(self, idx, device=None):
+        device = device or self.devices[0]
         try:
             # Assuming empty name deletes/disables it
-            await self.mc.commands.set_channel(idx, "")
+            await device.mc.commands.set_channel(idx, "")
             self.notify(f"Deleted channel {idx}")
-            await self.client.fetch_initial_data()
+            await device.client.fetch_initial_data()
         except Exception as e:
             self.notify(f"Failed to delete channel: {e}", severity="error")
 
     async def on_new_message(self, message: NewMessage) -> None:
-        msg = message.message_data
+        if not self.is_running:
+            # Messages still queued while shutting down; the widgets are gone
+            return
+        with NEW_MESSAGE_TIME.time():
+            self._ingest_message(message.record)
 
-        # Log raw message data if logging enabled
-        self._log_message(msg)
+    def _ingest_message(self, record: MessageRecord):
+        context_id = record.context_id
 
-        # Sender is implicit from context or embedded in text (for channels)
-        sender = None
+        if len(self.devices) > 1 and self.deduper.is_duplicate(record):
+            # Already heard by another device
+            return
 
-        content = msg.get("text", "")
-        timestamp = msg.get("sender_timestamp") or msg.get("timestamp")
+        mentions = self.highlighter.find(record.text)
+        if mentions:
+            record = replace(record, mentions=mentions)
+            MENTIONS.inc()
 
-        # Determine context (channel or private)
-        context_id = None
-        if msg.get("context_type") == "channel":
-            context_id = f"chan_{msg.get('channel_idx')}"
-        else:
-            # For private messages, context is the sender's pubkey
-            # Or if we sent it, the recipient.
-            # Assuming incoming for now.
-            context_id = f"contact_{msg.get('pubkey_prefix')}"  # This is partial, usually handled better
-            # If we don't have the full key, we might have issues.
-            # But the sidebar uses IDs.
+        if record.log_entry is not None:
+            self._track_link(record)
+
+        # Log raw message data if logging enabled
+        self._log_message(record)
+
+        if record.hidden:
+            # Kept for the archive only, by a filter rule
+            return
 
         # Store in history
         if context_id not in self.message_history:
             self.message_history[context_id] = []
-        self.message_history[context_id].append(msg)
+        self.message_history[context_id].append(record)
 
         # If active, display
-        current_active_id = self._get_active_id()
-        if current_active_id == context_id:
-            self.query_one(MessageLog).add_message(sender, content, timestamp)
-        current_active_id = self._get_active_id()
-        if current_active_id == context_id:
-            self.query_one(MessageLog).add_message(sender, content, timestamp)
+        if self._get_active_id() == context_id:
+            self.query_one(MessageLog).add_record(record)
+            self.state.mark_read(context_id)
         else:
             # Increment badge on sidebar AND tab
             self.query_one(Sidebar).increment_unread(context_id)
             count = self.query_one(Sidebar).unread_counts.get(context_id, 0)
             self.query_one("#main_tabbar", TabBar).set_unread(context_id, count)
+            if mentions:
+                self.query_one(Sidebar).increment_mentions(context_id)
+                self.notify(
+                    f"{record.sender or 'Mention'}: {record.text[:80]}",
+                    title="Mention",
+                )
 
-    def _log_message(self, msg_data: dict):
-        log_file = self.connection_args.get("log_file")
-        log_db = self.connection_args.get("log_db")
-        
-        if not log_file and not log_db:
+    def on_sync_progress(self, message: SyncProgress) -> None:
+        device = self._message_device(message)
+        status_bar = self.query_one("#status_bar", StatusBar)
+        segment = f"sync_{device.name}"
+        if message.done:
+            status_bar.set_segment(segment, None)
+            if message.count:
+                text = f"Synced {message.count} pending messages"
+                self.notify(self._device_label(device, text))
+        else:
+            status_bar.set_segment(
+                segment, self._device_label(device, f"Syncing… {message.count} msgs")
+            )
+
+    def on_connection_status(self, message: ConnectionStatus) -> None:
+        device = self._message_device(message)
+        if message.connected == device.connected:
+            return  # The first CONNECTED, seen while connecting
+        device.connected = message.connected
+        if message.connected:
+            self.notify(self._device_label(device, "Reconnected"))
+        else:
+            self.query_one("#status_bar", StatusBar).set_segment(
+                f"link_{device.name}", self._device_label(device, "link down")
+            )
+            self.notify(self._device_label(device, "Disconnected"), severity="warning")
+
+    def on_link_health(self, message: LinkHealth) -> None:
+        device = self._message_device(message)
+        if message.state in ("ok", "slow"):
+            text = f"link {message.rtt * 1000:.0f} ms"
+            if message.state == "slow":
+                text += " (slow)"
+        elif message.state == "lost":
+            text = "link lost, reconnecting"
+        else:
+            text = f"link {message.state}"
+        self.query_one("#status_bar", StatusBar).set_segment(
+            f"link_{device.name}", self._device_label(device, text)
+        )
+        if message.changed and message.state in ("stalled", "lost"):
+            self.notify(
+                self._device_label(device, f"Device not answering ({message.state})"),
+                severity="warning",
+            )
+
+    def _track_link(self, record: MessageRecord):
+        context_id = record.context_id
+        was_degraded = self.link_stats.degraded(context_id)
+        entry = record.log_entry
+        self.link_stats.add(context_id, entry, entry.get("timestamp"))
+        degraded = self.link_stats.degraded(context_id)
+        if degraded != was_degraded:
+            self.query_one(Sidebar).set_weak_link(context_id, degraded)
+
+    def _log_message(self, record: MessageRecord):
+        if not self.log_sink or record.log_entry is None:
             return
 
         try:
-            # Create a copy to modify for logging without affecting app logic
-            log_entry = msg_data.copy()
-
-            # Ensure timestamp exists
-            if "timestamp" not in log_entry:
-                log_entry["timestamp"] = int(time.time())
-
-            # Emulate meshcore-cli logic for 'name' and 'sender'
-            # meshcore-cli adds 'name' and 'sender' based on contact/channel info
-            if "name" not in log_entry:
-                if "channel_name" in log_entry:
-                    log_entry["name"] = log_entry["channel_name"]
-                    log_entry["sender"] = log_entry["channel_name"]
-                elif "sender_name" in log_entry:
-                    log_entry["name"] = log_entry["sender_name"]
-                    log_entry["sender"] = log_entry["sender_name"]
-                # Fallbacks if my enrichment failed or differed
-                elif log_entry.get("type") == "CHAN":
-                    log_entry["sender"] = f"channel {log_entry.get('channel_idx')}"
-                    log_entry["name"] = log_entry["sender"]
-                elif log_entry.get("type") == "PRIV":
-                    # pubkey prefix usually
-                    prefix = log_entry.get("pubkey_prefix", "unknown")
-                    log_entry["sender"] = prefix
-                    log_entry["name"] = prefix
-
-            # Remove internal keys to match meshcore-cli format more closely
-            for key in ["context_type", "sender_name", "channel_name"]:
-                if key in log_entry:
-                    del log_entry[key]
-
-            # Write to JSON File
-            if log_file:
-                with open(log_file, "a") as f:
-                    f.write(json.dumps(log_entry) + "\n")
-            
-            # Write to SQLite DB
-            if log_db:
-                self._write_log_db(log_db, log_entry)
-
+            self.log_sink.submit(record.log_entry)
         except Exception as e:
             self.notify(f"Logging failed: {e}", severity="error")
 
-    def _write_log_db(self, db_path, log_entry):
-        try:
-            with sqlite3.connect(db_path) as conn:
-                # Prepare data
-                # Schema: timestamp, sender, name, text, type, channel_idx, pubkey_prefix, raw_json
-                timestamp = log_entry.get("timestamp")
-                sender = log_entry.get("sender")
-                name = log_entry.get("name")
-                text = log_entry.get("text")
-                msg_type = log_entry.get("type")
-                channel_idx = log_entry.get("channel_idx")
-                pubkey_prefix = log_entry.get("pubkey_prefix")
-                raw_json = json.dumps(log_entry)
-                
-                conn.execute(
-                    "INSERT INTO msgs (timestamp, sender, name, text, type, channel_idx, pubkey_prefix, raw_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (timestamp, sender, name, text, msg_type, channel_idx, pubkey_prefix, raw_json)
-                )
-        except Exception as e:
-            self.notify(f"DB Logging failed: {e}", severity="error")
-
-
+    def _log_sink_error(self, message: str):
+        # Called from the log writer thread
+        self.call_from_thread(self.notify, message, severity="error")
 
     def _get_active_id(self):
         if self.active_recipient is None:
             return None
-        if self.active_recipient_type == "channel":
-            return f"chan_{self.active_recipient}"
-        else:
-            return f"contact_{self.active_recipient}"
+        return self.active_context
 
     async def on_contact_list_updated(self, message: ContactListUpdated) -> None:
-        await self.query_one(Sidebar).update_contacts(message.contacts)
+        contacts = message.contacts
+        if len(self.devices) > 1:
+            # Contacts are the same nodes whichever device heard them
+            contacts = {}
+            for device in self.devices:
+                if device.mc:
+                    for key, contact in device.mc.contacts.items():
+                        contacts.setdefault(key, contact)
+        await self.query_one(Sidebar).update_contacts(contacts)
 
     async def on_channel_list_updated(self, message: ChannelListUpdated) -> None:
-        self.query_one(Sidebar).update_channels(message.channels)
+        if len(self.devices) == 1:
+            self.channel_owners = {
+                f"chan_{idx}": (self.devices[0], idx)
+                for idx in (ch.get("channel_idx") for ch in message.channels)
+            }
+            self.query_one(Sidebar).update_channels(message.channels)
+            return
+        self.query_one(Sidebar).update_channels(self._merge_channels())
+
+    def _merge_channels(self) -> list:
+        """Give each device's channels a context id, sharing identical channels.
+
+        A channel with the same name and secret as one on an earlier device is
+        the same channel, so it shares that context (and its messages are
+        deduplicated); others get an id namespaced by the device.
+        """
+        self.channel_owners = {}
+        shared = {}  # Key: (name, secret), Value: merged sidebar entry
+        merged = []
+        for device in self.devices:
+            device.channel_contexts = {}
+            for ch in getattr(device.mc, "channels", None) or []:
+                name = ch.get("channel_name")
+                idx = ch.get("channel_idx")
+                if not name:
+                    continue
+                entry = shared.get((name, ch.get("channel_secret")))
+                if entry is None:
+                    context_id = f"chan_{idx}"
+                    if device.index:
+                        context_id += f"_{device.index}"
+                    entry = {
+                        "channel_idx": idx,
+                        "channel_name": name,
+                        "context_id": context_id,
+                        "device_index": device.index,
+                        "devices": [],
+                    }
+                    shared[(name, ch.get("channel_secret"))] = entry
+                    merged.append(entry)
+                    self.channel_owners[context_id] = (device, idx)
+                entry["devices"].append(device.name)
+                device.channel_contexts[idx] = entry["context_id"]
+
+        for entry in merged:
+            entry["label"] = f"{entry['channel_name']} ({', '.join(entry['devices'])})"
+        return merged
+
+    def _device_for_contact(self, key: str) -> Device:
+        for device in self.devices:
+            if device.mc and device.mc.get_contact_by_key_prefix(key):
+                return device
+        return self.devices[0]
 
     async def on_list_view_selected(self, event) -> None:
         item = event.item
@@ -438,31 +741,38 @@ class MeshrcApp(App):
 
         # Clear unread
         self.query_one(Sidebar).clear_unread(item_id)
+        self.state.mark_read(item_id)
         self.query_one("#main_tabbar", TabBar).set_unread(item_id, 0)
 
         # Parse ID
         if item_id.startswith("chan_"):
             self.active_recipient_type = "channel"
-            self.active_recipient = int(item_id.split("_")[1])
+            self.active_device, self.active_recipient = self.channel_owners.get(
+                item_id, (self.devices[0], int(item_id.split("_")[1]))
+            )
         elif item_id.startswith("contact_"):
             self.active_recipient_type = "contact"
             self.active_recipient = item_id.split("_")[1]
+            self.active_device = self._device_for_contact(self.active_recipient)
+        self.active_context = item_id
+        mc = self.active_device.mc
 
         # Update TabBar
         name = item_id # Fallback
         
         # Get decent name
         if self.active_recipient_type == "channel":
-             if hasattr(self.mc, "channels"):
-                 for ch in self.mc.channels:
+             if hasattr(mc, "channels"):
+                 for ch in mc.channels:
                       if ch.get("channel_idx") == self.active_recipient:
                            name = ch.get("channel_name", str(self.active_recipient))
                            break
         elif self.active_recipient_type == "contact":
-             contact = self.mc.get_contact_by_key_prefix(self.active_recipient)
+             contact = mc.get_contact_by_key_prefix(self.active_recipient)
              if contact:
                   name = contact.get("adv_name", self.active_recipient[:8])
         
+        self.active_title = name
         tab_bar = self.query_one("#main_tabbar", TabBar)
         tab_bar.add_tab(item_id, name)
         tab_bar.activate_tab(item_id)
@@ -473,23 +783,90 @@ class MeshrcApp(App):
         # ).title = f"MeshRC - {self.active_recipient_type}: {self.active_recipient}"  # Improve name display
 
         # Reload Log
+        self._reload_log(item_id)
+        self._load_log_history(item_id)
+
+        # Focus input
+        self.query_one("#message_input").focus()
+
+    def _reload_log(self, item_id: str):
         log = self.query_one(MessageLog)
         log.clear()
 
-        my_name = self.mc.self_info.get("name", "Me")
+        for record in self.message_history.get(item_id, ()):
+            log.add_record(record)
 
-        if item_id in self.message_history:
-            for msg in self.message_history[item_id]:
-                # Only show sender if it's us (outgoing)
-                display_sender = None
-                if msg.get("sender_name") == my_name:
-                    display_sender = my_name
+    def _load_log_history(self, context_id: str):
+        if not self.connection_args.get("log_file"):
+            return
+        if context_id in self.history_loaded:
+            return
+        self.history_loaded.add(context_id)
+        self.run_worker(self._load_history(context_id), group="history")
+
+    async def _load_history(self, context_id: str):
+        """Put messages logged in earlier sessions before this session's."""
+        sink = self.log_sink
+        await asyncio.to_thread(sink.index_ready.wait)
+        index = sink.index
+        if not index:
+            return
+        if context_id.startswith("chan_"):
+            device, idx = self.channel_owners.get(
+                context_id, (self.devices[0], int(context_id.split("_")[1]))
+            )
+            if device.index != 0:
+                # The log doesn't say which device heard a message; assume the first
+                return
+            numbers = index.find("CHAN", idx)
+        else:
+            numbers = index.find("PRIV", context_id.removeprefix("contact_"))
+        if not numbers:
+            return
 
-                content = msg.get("text", "")
-                log.add_message(display_sender, content)
+        entries = await asyncio.to_thread(
+            index.newest, numbers, LOG_HISTORY_SIZE, sink.indexed_before
+        )
+        records = []
+        for entry in entries:
+            record = logged_record(entry, context_id)
+            mentions = self.highlighter.find(record.text)
+            records.append(replace(record, mentions=mentions) if mentions else record)
+
+        self.message_history.setdefault(context_id, [])[:0] = records
+        # Outgoing messages awaiting acks moved down
+        for ack, (cid, position) in self.outgoing_acks.items():
+            if cid == context_id:
+                self.outgoing_acks[ack] = (cid, position + len(records))
+        if records and self._get_active_id() == context_id:
+            self._reload_log(context_id)
+
+    def on_message_delivery(self, message: MessageDelivery) -> None:
+        pending = self.outgoing_acks.pop(message.ack, None)
+        if pending is None:
+            return
+        context_id, index = pending
+        history = self.message_history[context_id]
+        history[index] = replace(history[index], status=message.status, rtt=message.rtt)
 
-        # Focus input
-        self.query_one("#message_input").focus()
+        if self._get_active_id() != context_id:
+            return
+        # Acks often come in bursts; redraw once for all of them
+        if self.redraw_pending is None:
+            self.call_after_refresh(self._redraw_delivered)
+        elif self.redraw_pending[0] == context_id:
+            index = min(index, self.redraw_pending[1])
+        self.redraw_pending = (context_id, index)
+
+    def _redraw_delivered(self):
+        context_id, index = self.redraw_pending
+        self.redraw_pending = None
+        if self._get_active_id() != context_id:
+            return  # Switching contexts reloaded the log
+        # Rows can't be edited in place; redraw from the acked message on
+        history = self.message_history[context_id]
+        if not self.query_one(MessageLog).redraw_from(index, history[index:]):
+            self._reload_log(context_id)
 
     async def on_input_submitted(self, event: Input.Submitted) -> None:
         text = event.value.strip()
@@ -508,24 +885,32 @@ class MeshrcApp(App):
             return
 
         try:
+            cid = self._get_active_id()
+            ack = status = None
+            device = self.active_device
+            device.client.airtime.spend()
             if self.active_recipient_type == "channel":
-                await self.mc.commands.send_chan_msg(self.active_recipient, text)
+                await device.mc.commands.send_chan_msg(self.active_recipient, text)
             elif self.active_recipient_type == "contact":
-                contact = self.mc.get_contact_by_key_prefix(self.active_recipient)
+                contact = device.mc.get_contact_by_key_prefix(self.active_recipient)
                 if contact:
-                    await self.mc.commands.send_msg(contact, text)
+                    ack = await device.client.send_msg(contact, text, cid)
+                    status = "pending" if ack else "failed"
                 else:
                     self.notify("Contact not found locally", severity="error")
                     return
 
-            my_name = self.mc.self_info.get("name", "Me")
-            log = self.query_one(MessageLog)
-            log.add_message(my_name, text)
+            my_name = device.mc.self_info.get("name", "Me")
+            record = outgoing_record(cid, my_name, text, status=status, ack=ack)
 
-            cid = self._get_active_id()
             if cid not in self.message_history:
                 self.message_history[cid] = []
-            self.message_history[cid].append({"sender_name": my_name, "text": text})
+            self.message_history[cid].append(record)
+            if ack:
+                self.outgoing_acks[ack] = (cid, len(self.message_history[cid]) - 1)
+
+            log = self.query_one(MessageLog)
+            log.add_record(record)
 
         except Exception as e:
             self.notify(f"Failed to send: {e}", severity="error")
@@ -535,16 +920,52 @@ class MeshrcApp(App):
         cmd = parts[0].lower()
         args = parts[1] if len(parts) > 1 else ""
 
+        device = self.active_device or self.devices[0]
         contact = None
         if self.active_recipient_type == "contact":
-            contact = self.mc.get_contact_by_key_prefix(self.active_recipient)
+            contact = device.mc.get_contact_by_key_prefix(self.active_recipient)
+
+        many, selector = split_many(args)
+        selector = selector.strip() or "all"
 
         try:
-            if cmd == "rs" or cmd == "status":
+            if (cmd == "rs" or cmd == "status") and args:
+                # /rs <selector> or /rs many <selector>
+                self._start_bulk(
+                    f"Status: {selector}",
+                    selector,
+                    device,
+                    lambda c: bulk.request_status(device.mc, c),
+                )
+
+            elif cmd == "trace" and many:
+                self._start_bulk(
+                    f"Trace: {selector}",
+                    selector,
+                    device,
+                    lambda c: bulk.request_trace(device.mc, c),
+                )
+
+            elif cmd == "login" and many:
+                bulk_args = args.split(maxsplit=2)
+                if len(bulk_args) < 3:
+                    self.notify(
+                        "Usage: /login many <selector> <password>", severity="warning"
+                    )
+                    return
+                _, selector, password = bulk_args
+                self._start_bulk(
+                    f"Login: {selector}",
+                    selector,
+                    device,
+                    lambda c: bulk.request_login(device.mc, c, password),
+                )
+
+            elif cmd == "rs" or cmd == "status":
                 if not contact:
                     self.notify("Select a contact/repeater first", severity="warning")
                     return
-                await self.mc.commands.send_statusreq(contact)
+                await device.mc.commands.send_statusreq(contact)
                 self.notify(f"Status request sent to {contact.get('adv_name')}")
 
             elif cmd == "login":
@@ -554,14 +975,14 @@ class MeshrcApp(App):
                 if not args:
                     self.notify("Usage: /login <password>", severity="warning")
                     return
-                await self.mc.commands.send_login(contact, args)
+                await device.mc.commands.send_login(contact, args)
                 self.notify(f"Login request sent to {contact.get('adv_name')}")
 
             elif cmd == "logout":
                 if not contact:
                     self.notify("Select a contact first", severity="warning")
                     return
-                await self.mc.commands.send_logout(contact)
+                await device.mc.commands.send_logout(contact)
                 self.notify(f"Logout sent to {contact.get('adv_name')}")
 
             elif cmd == "trace":
@@ -569,20 +990,88 @@ class MeshrcApp(App):
                 if contact:
                     # If active contact selected, we can use their key or args as path
                     path = args if args else contact.get("public_key", "")[:2]
-                    await self.mc.commands.send_trace(path=path)
+                    await device.mc.commands.send_trace(path=path)
                     self.notify(f"Trace sent: {path}")
                 else:
                     if not args:
                         self.notify("Usage: /trace <path_hex_csv>", severity="warning")
                         return
-                    await self.mc.commands.send_trace(path=args)
+                    await device.mc.commands.send_trace(path=args)
                     self.notify(f"Trace sent: {args}")
+            elif cmd == "search":
+                if not self.log_readers:
+                    self.notify("Searching needs --logdb", severity="warning")
+                    return
+                if not args:
+                    self.notify("Usage: /search <text>", severity="warning")
+                    return
+                self.run_worker(self._search(args), group="search")
+
+            elif cmd == "rules":
+                if not self.rules:
+                    self.notify("No filter rules loaded (--rules)", severity="warning")
+                    return
+                self.notify(f"Rule hits: {self.rules.summary()}")
+
+            elif cmd == "rtt":
+                if not contact:
+                    self.notify("Select a contact first", severity="warning")
+                    return
+                p50, p95, count = device.client.rtt_stats(contact.get("public_key", ""))
+                if not count:
+                    self.notify(f"No acks measured for {contact.get('adv_name')} yet")
+                    return
+                self.notify(
+                    f"RTT to {contact.get('adv_name')}: "
+                    f"p50 {p50:.1f}s, p95 {p95:.1f}s ({count} acks)"
+                )
+
             else:
                 self.notify(f"Unknown command: /{cmd}", severity="error")
 
         except Exception as e:
             self.notify(f"Command failed: {e}", severity="error")
 
+    async def _search(self, text: str):
+        try:
+            # A newer search interrupts this one
+            rows = await self.log_readers.run(search_messages, text, key="search")
+        except QueryCancelled:
+            return
+        if not rows:
+            self.notify(f"No logged messages contain '{text}'")
+            return
+        lines = [
+            f"{time.strftime('%m-%d %H:%M', time.localtime(ts))} {name}: {msg}"
+            for ts, name, msg in rows[:5]
+        ]
+        if len(rows) > len(lines):
+            lines.append(f"… and {len(rows) - len(lines)} more")
+        self.notify("\n".join(lines), title=f"Search: {text}")
+
+    def _start_bulk(self, title: str, selector: str, device: Device, request):
+        favorites = self.query_one(Sidebar).favorites
+        targets = bulk.select_contacts(device.mc.contacts, selector, favorites)
+        if not targets:
+            self.notify(
+                f"No contacts match '{selector}' "
+                f"(use {', '.join(bulk.SELECTORS)} or names)",
+                severity="warning",
+            )
+            return
+
+        async def budgeted_request(contact):
+            # Bulk requests count against the airtime budget background polls respect
+            device.client.airtime.spend()
+            return await request(contact)
+
+        screen = BulkResultsScreen(title, targets)
+        self.push_screen(screen)
+        self.run_worker(
+            bulk.run_bulk(targets, budgeted_request, on_result=screen.set_result),
+            group="bulk",
+        )
+
     def action_settings(self) -> None:
         def set_settings(data):
             if data:
@@ -0,0 +1,474 @@
+"""Columnar archives of old log messages: `meshrc archive`.
+
+An archive holds a closed time range of `msgs` (by default, everything
+before the current month) column by column, sorted by time:
+
+- timestamps and channel indexes as typed arrays,
+- senders, names, types, pubkey prefixes and the author (the sender parsed
+  out of channel text) as small dictionaries plus an array of codes,
+- texts, and what raw_json holds beyond the columns (see logcompact), as
+  zlib-compressed blocks of BLOCK_ROWS rows, with an array of where each
+  row ends in its block.
+
+Readers memory-map the file and only touch the columns they use: message
+statistics read a few bytes per row and never the texts, a search over a
+time range only decompresses the text blocks in that range, and the
+timestamps are binary searched. Nothing else is needed to read one.
+
+Layout: MAGIC, the sections (8-byte aligned, arrays little-endian), a JSON
+footer describing them, the footer's length (uint64) and MAGIC again.
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from contextlib import suppress
+
+from .logcompact import (
+    COLUMN_KEYS,
+    FORMAT_LIST,
+    entry_items,
+    load_entry,
+    raw_items,
+    raw_json_text,
+)
+from .logdb import db_uri
+from .record import split_sender
+
+MAGIC = b"MESHRCA1"
+# Rows per compressed block of texts and raw_json
+BLOCK_ROWS = 8192
+
+# Columns stored as a dictionary of their values and an array of codes
+DICT_COLUMNS = ("sender", "name", "type", "pubkey_prefix", "author")
+# Stored for rows whose channel_idx is NULL (or doesn't fit)
+NULL_CHANNEL = -(2**31)
+
+MSGS_COLUMNS = ", ".join((*COLUMN_KEYS, "raw_json"))
+
+
+def is_archive(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _codes_typecode(size: int) -> str:
+    return "B" if size <= 2**8 else "H" if size <= 2**16 else "I"
+
+
+class _Blocks:
+    """A column of byte strings written in compressed blocks."""
+
+    def __init__(self):
+        self.ends = array("I")
+        self.blocks = []  # [offset, length] in the file
+        self.pending = []
+        self.size = 0
+
+    def add(self, value: bytes):
+        self.pending.append(value)
+        self.size += len(value)
+        self.ends.append(self.size)
+
+    def flush(self, out):
+        if self.pending:
+            self.blocks.append(_write(out, zlib.compress(b"".join(self.pending))))
+            self.pending = []
+            self.size = 0
+
+
+def _write(out, data) -> list:
+    """Append a section, 8-byte aligned; return [offset, length]."""
+    out.write(b"\0" * (-out.tell() % 8))
+    offset = out.tell()
+    out.write(data)
+    return [offset, len(data)]
+
+
+def _write_array(out, values: array) -> dict:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    offset, length = _write(out, values.tobytes())
+    return {"typecode": values.typecode, "offset": offset, "length": length}
+
+
+def _fits(channel_idx) -> bool:
+    return type(channel_idx) is int and NULL_CHANNEL < channel_idx < 2**31
+
+
+def _archive_raw(row) -> bytes:
+    """What the archive keeps of a row's raw_json."""
+    timestamp, sender, name, text, msg_type, channel_idx, prefix, raw = row
+    if raw is None:
+        return b""
+    if type(text) is str and (channel_idx is None or _fits(channel_idx)):
+        # The columns come back as they are, so the key/value list rebuilds it
+        if isinstance(raw, bytes):
+            return bytes((FORMAT_LIST,)) + raw_items(raw)
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            entry = None
+        if isinstance(entry, dict) and json.dumps(entry) == raw:
+            items = entry_items(entry)
+            if items is not None:
+                return bytes((FORMAT_LIST,)) + items
+    return raw_json_text(row).encode()
+
+
+def write_archive(log_db: str, path: str, since: float = None, until: float = None,
+                  prune: bool = False) -> int:
+    """Archive the messages of a log database between since and until.
+
+    Returns the number of messages archived. With `prune`, they are then
+    deleted from the database.
+    """
+    conn = sqlite3.connect(db_uri(log_db, "rw" if prune else "ro"), uri=True)
+    try:
+        (last_rowid,) = conn.execute("SELECT MAX(rowid) FROM msgs").fetchone()
+        where = "timestamp IS NOT NULL AND rowid <= ?"
+        params = [last_rowid or 0]
+        if since is not None:
+            where += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            where += " AND timestamp < ?"
+            params.append(until)
+
+        timestamps = array("q")
+        channels = array("i")
+        dicts = {name: {} for name in DICT_COLUMNS}  # Key: value, Value: code
+        codes = {name: [] for name in DICT_COLUMNS}
+        texts, raws = _Blocks(), _Blocks()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(MAGIC)
+            rows = conn.execute(
+                f"SELECT {MSGS_COLUMNS} FROM msgs WHERE {where} "
+                "ORDER BY timestamp, rowid",
+                params,
+            )
+            for row in rows:
+                timestamp, sender, name, text, msg_type, channel_idx, prefix, raw = row
+                if type(timestamp) is not int and timestamps.typecode == "q":
+                    timestamps = array("d", timestamps)
+                timestamps.append(timestamp)
+                channels.append(channel_idx if _fits(channel_idx) else NULL_CHANNEL)
+                author = split_sender(text or "")[0] if msg_type == "CHAN" else name
+                values = (sender, name, msg_type, prefix, author)
+                for column, value in zip(DICT_COLUMNS, values, strict=True):
+                    known = dicts[column]
+                    code = known.get(value)
+                    if code is None:
+                        code = known[value] = len(known)
+                    codes[column].append(code)
+                texts.add((text or "").encode())
+                raws.add(_archive_raw(row))
+                if len(texts.ends) % BLOCK_ROWS == 0:
+                    texts.flush(out)
+                    raws.flush(out)
+            texts.flush(out)
+            raws.flush(out)
+
+            columns = {
+                "timestamp": _write_array(out, timestamps),
+                "channel_idx": _write_array(out, channels),
+            }
+            for column in DICT_COLUMNS:
+                values = list(dicts[column])
+                columns[column] = _write_array(
+                    out, array(_codes_typecode(len(values)), codes[column])
+                )
+                columns[column]["values"] = _write(out, json.dumps(values).encode())
+            for column, blocks in (("text", texts), ("raw", raws)):
+                columns[column] = {
+                    "ends": _write_array(out, blocks.ends),
+                    "blocks": blocks.blocks,
+                }
+
+            footer = json.dumps(
+                {"rows": len(timestamps), "block_rows": BLOCK_ROWS, "columns": columns}
+            ).encode()
+            out.write(footer)
+            out.write(len(footer).to_bytes(8, "little"))
+            out.write(MAGIC)
+        os.replace(tmp, path)
+
+        if prune and timestamps:
+            with conn:
+                conn.execute(f"DELETE FROM msgs WHERE {where}", params)
+        return len(timestamps)
+    finally:
+        conn.close()
+
+
+class Archive:
+    """Read-only, memory-mapped view of an archive."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = len(self._map) - len(MAGIC)
+        if self._map[: len(MAGIC)] != MAGIC or self._map[end:] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a meshrc archive")
+        length = int.from_bytes(self._map[end - 8 : end], "little")
+        footer = json.loads(self._map[end - 8 - length : end - 8])
+        self.rows = footer["rows"]
+        self.block_rows = footer["block_rows"]
+        self.columns = footer["columns"]
+        self._arrays = {}
+        self._values = {}
+        self._block = (None, None)  # Last decompressed (key, data)
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        for values in self._arrays.values():
+            if isinstance(values, memoryview):
+                values.release()
+        self._arrays.clear()
+        # A caller may still hold a view; the map then goes with it
+        with suppress(BufferError):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _array(self, spec: dict):
+        key = spec["offset"]
+        values = self._arrays.get(key)
+        if values is None:
+            offset, length = spec["offset"], spec["length"]
+            data = memoryview(self._map)[offset : offset + length]
+            if sys.byteorder == "little":
+                values = data.cast(spec["typecode"])  # No copy
+            else:
+                values = array(spec["typecode"], data)
+                values.byteswap()
+            self._arrays[key] = values
+        return values
+
+    def array(self, column: str):
+        """The typed array of timestamp or channel_idx, or a dictionary's codes."""
+        return self._array(self.columns[column])
+
+    def dictionary(self, column: str) -> list:
+        values = self._values.get(column)
+        if values is None:
+            offset, length = self.columns[column]["values"]
+            values = json.loads(self._map[offset : offset + length])
+            self._values[column] = values
+        return values
+
+    def values(self, column: str, start: int = 0, stop: int = None) -> list:
+        stop = self.rows if stop is None else stop
+        if column in DICT_COLUMNS:
+            dictionary = self.dictionary(column)
+            return [dictionary[code] for code in self.array(column)[start:stop]]
+        if column == "channel_idx":
+            channels = self.array(column)[start:stop]
+            return [None if c == NULL_CHANNEL else c for c in channels]
+        if column == "timestamp":
+            timestamps = self.array(column)[start:stop].tolist()
+            if self.columns[column]["typecode"] == "d":
+                # SQLite keeps whole numbers in an INTEGER column as integers
+                timestamps = [int(t) if t.is_integer() else t for t in timestamps]
+            return timestamps
+        return [data.decode() for data in self._bytes(column, start, stop)]
+
+    def _block_data(self, column: str, block: int) -> bytes:
+        key = (column, block)
+        if self._block[0] != key:
+            offset, length = self.columns[column]["blocks"][block]
+            self._block = (key, zlib.decompress(self._map[offset : offset + length]))
+        return self._block[1]
+
+    def _bytes(self, column: str, start: int, stop: int) -> list:
+        ends = self._array(self.columns[column]["ends"])
+        found = []
+        for row in range(start, min(stop, self.rows)):
+            data = self._block_data(column, row // self.block_rows)
+            first = 0 if row % self.block_rows == 0 else ends[row - 1]
+            found.append(data[first : ends[row]])
+        return found
+
+    def range(self, since: float = None, until: float = None) -> tuple:
+        """Rows (start, stop) of messages from since until before until."""
+        timestamps = self.array("timestamp")
+        start = 0 if since is None else bisect.bisect_left(timestamps, since)
+        stop = self.rows if until is None else bisect.bisect_left(timestamps, until)
+        return start, max(start, stop)
+
+    def msgs_rows(self, start: int = 0, stop: int = None):
+        """Yield rows as `SELECT timestamp, ..., raw_json FROM msgs` gives them."""
+        stop = self.rows if stop is None else stop
+        block_start = start
+        while block_start < stop:
+            block_end = (block_start // self.block_rows + 1) * self.block_rows
+            block_stop = min(stop, block_end)
+            columns = [
+                self.values(column, block_start, block_stop) for column in COLUMN_KEYS
+            ]
+            raws = [
+                None if not raw else raw if raw[0] == FORMAT_LIST else raw.decode()
+                for raw in self._bytes("raw", block_start, block_stop)
+            ]
+            yield from zip(*columns, raws, strict=True)
+            block_start = block_stop
+
+    def entries(self, start: int = 0, stop: int = None):
+        for row in self.msgs_rows(start, stop):
+            yield load_entry(row)
+
+    def search(
+        self, text: str, since: float = None, until: float = None, limit: int = 20
+    ) -> list:
+        """Find messages containing `text`, newest first, like search_messages.
+
+        Matches are found in whole decompressed blocks, ignoring ASCII case
+        as LIKE does.
+        """
+        needle = text.encode().lower()
+        start, stop = self.range(since, until)
+        ends = self._array(self.columns["text"]["ends"])
+        timestamps = self.array("timestamp")
+        names = self.array("name")
+        found = []
+        blocks = range((stop - 1) // self.block_rows, start // self.block_rows - 1, -1)
+        for block in blocks if stop > start else ():
+            haystack = self._block_data("text", block).lower()
+            base = block * self.block_rows
+            block_ends = ends[base : min(base + self.block_rows, self.rows)]
+            rows = []
+            position = haystack.find(needle)
+            while position >= 0:
+                row = bisect.bisect_right(block_ends, position)
+                row_end = block_ends[row]
+                if position + len(needle) <= row_end and start <= base + row < stop:
+                    rows.append(base + row)
+                    position = row_end
+                else:
+                    position += 1
+                position = haystack.find(needle, position)
+            for row in reversed(rows):
+                found.append(row)
+                if len(found) >= limit:
+                    break
+            if len(found) >= limit:
+                break
+
+        dictionary = self.dictionary("name")
+        return [
+            (
+                timestamps[row],
+                dictionary[names[row]],
+                self.values("text", row, row + 1)[0],
+            )
+            for row in found
+        ]
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+
+def _month_start() -> float:
+    now = time.localtime()
+    return time.mktime((now.tm_year, now.tm_mon, 1, 0, 0, 0, 0, 0, -1))
+
+
+def main(argv=None) -> int:
+    from .logtransfer import parse_time
+
+    parser = argparse.ArgumentParser(
+        prog="meshrc archive", description="Columnar archives of old log messages"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    write = commands.add_parser("write", help="Archive messages from a log database")
+    write.add_argument("logdb", help="Log database (or a monthly partition)")
+    write.add_argument("archive", help="Archive file to write")
+    write.add_argument(
+        "--since", type=parse_time, help="Only messages from this time on"
+    )
+    write.add_argument(
+        "--until",
+        type=parse_time,
+        help="Only messages before this time (default: this month)",
+    )
+    write.add_argument(
+        "--prune",
+        action="store_true",
+        help="Delete the archived messages from the database",
+    )
+    search = commands.add_parser("search", help="Search archives for text")
+    search.add_argument("text")
+    search.add_argument("archives", nargs="+")
+    search.add_argument(
+        "--since", type=parse_time, help="Only messages from this time on"
+    )
+    search.add_argument(
+        "--until", type=parse_time, help="Only messages before this time"
+    )
+    search.add_argument("--limit", type=int, default=20, help="Most matches shown")
+    info = commands.add_parser("info", help="Describe archives")
+    info.add_argument("archives", nargs="+")
+    args = parser.parse_args(argv)
+
+    paths = [args.logdb] if args.command == "write" else args.archives
+    for path in paths:
+        if not os.path.isfile(path):
+            parser.error(f"No such file: {path}")
+
+    started = time.perf_counter()
+    try:
+        if args.command == "write":
+            until = _month_start() if args.until is None else args.until
+            count = write_archive(
+                args.logdb, args.archive, args.since, until, args.prune
+            )
+            size = os.path.getsize(args.archive)
+            elapsed = time.perf_counter() - started
+            print(
+                f"Archived {count} messages into {args.archive} ({size / 2**20:.1f} MB)"
+                f"{', pruned' if args.prune else ''} ({elapsed:.1f}s)",
+                file=sys.stderr,
+            )
+        elif args.command == "search":
+            found = []
+            for path in args.archives:
+                with Archive(path) as archive:
+                    found += archive.search(
+                        args.text, args.since, args.until, args.limit
+                    )
+            for timestamp, name, text in sorted(found, reverse=True)[: args.limit]:
+                print(f"{_format_time(timestamp)} {name}: {text}")
+        else:
+            for path in args.archives:
+                with Archive(path) as archive:
+                    timestamps = archive.array("timestamp")
+                    span = ""
+                    if len(archive):
+                        first = _format_time(timestamps[0])
+                        last = _format_time(timestamps[-1])
+                        span = f", {first} to {last}"
+                    print(f"{path}: {len(archive)} messages{span}")
+                    for column in DICT_COLUMNS:
+                        print(f"  {column}: {len(archive.dictionary(column))} distinct")
+    except (sqlite3.Error, ValueError, OSError) as e:
+        print(f"Archive failed: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,174 @@
+"""Fan-out of repeater commands (status, trace, login) over many contacts."""
+
+import asyncio
+import random
+import time
+
+from meshcore import EventType
+
+# Maximum number of requests in flight at once
+BULK_CONCURRENCY = 4
+# Per-node timeout (seconds), including time spent queued on the device
+BULK_TIMEOUT = 30.0
+
+# Advert types as reported in contact["type"]
+ADV_TYPE_CHAT = 1
+ADV_TYPE_REPEATER = 2
+ADV_TYPE_ROOM = 3
+
+SELECTORS = ("all", "rep", "rooms", "fav")
+
+
+def select_contacts(contacts: dict, selector: str, favorites=()) -> list[dict]:
+    """Resolve a bulk selector to a list of contacts.
+
+    `all` means every repeater and room server, `rep` repeaters only, `rooms`
+    room servers only and `fav` favorites. Anything else is a comma-separated
+    list of names or public key prefixes.
+    """
+    selector = selector.strip().lower()
+    if selector in ("all", "rep", "repeaters", "rooms"):
+        types = {
+            "all": (ADV_TYPE_REPEATER, ADV_TYPE_ROOM),
+            "rep": (ADV_TYPE_REPEATER,),
+            "repeaters": (ADV_TYPE_REPEATER,),
+            "rooms": (ADV_TYPE_ROOM,),
+        }[selector]
+        selected = [c for c in contacts.values() if c.get("type") in types]
+    elif selector in ("fav", "favorites"):
+        selected = [c for key, c in contacts.items() if key in favorites]
+    else:
+        terms = [t.strip().lower() for t in selector.split(",") if t.strip()]
+        selected = []
+        for key, contact in contacts.items():
+            name = contact.get("adv_name", "").lower()
+            if any(name == t or key.lower().startswith(t) for t in terms):
+                selected.append(contact)
+
+    return sorted(selected, key=lambda c: c.get("adv_name", "").lower())
+
+
+async def run_bulk(
+    targets: list[dict],
+    request,
+    concurrency: int = BULK_CONCURRENCY,
+    timeout: float = BULK_TIMEOUT,
+    on_result=None,
+) -> list[dict]:
+    """Run `request(contact)` for every target with bounded concurrency.
+
+    `request` returns a short detail string, or raises/returns None on
+    failure. Each result is a dict with name, key, ok, latency and detail,
+    passed to `on_result` as soon as it is available.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(contact):
+        async with semaphore:
+            result = {
+                "name": contact.get("adv_name", contact.get("public_key", "")[:8]),
+                "key": contact.get("public_key", ""),
+                "ok": False,
+                "latency": None,
+                "detail": "",
+            }
+            start = time.monotonic()
+            try:
+                detail = await asyncio.wait_for(request(contact), timeout)
+                if detail is None:
+                    result["detail"] = "no response"
+                else:
+                    result["ok"] = True
+                    result["latency"] = time.monotonic() - start
+                    result["detail"] = detail
+            except TimeoutError:
+                result["detail"] = "timeout"
+            except Exception as e:
+                result["detail"] = f"error: {e}"
+
+            if on_result:
+                on_result(result)
+            return result
+
+    return await asyncio.gather(*(run_one(c) for c in targets))
+
+
+async def request_status_payload(mc, contact, timeout: float = BULK_TIMEOUT):
+    """Request a repeater status and return the raw status payload."""
+    waiter = asyncio.ensure_future(
+        mc.wait_for_event(
+            EventType.STATUS_RESPONSE,
+            attribute_filters={"pubkey_prefix": contact["public_key"][:12]},
+            timeout=timeout,
+        )
+    )
+    try:
+        res = await mc.commands.send_statusreq(contact)
+        if res.type == EventType.ERROR:
+            return None
+        event = await waiter
+    finally:
+        waiter.cancel()
+
+    return event.payload if event is not None else None
+
+
+async def request_status(mc, contact, timeout: float = BULK_TIMEOUT):
+    """Request a repeater status and summarize the response."""
+    status = await request_status_payload(mc, contact, timeout)
+    if status is None:
+        return None
+    return (
+        f"up {status.get('uptime', 0) // 3600}h "
+        f"bat {status.get('bat', 0)}mV "
+        f"queue {status.get('tx_queue_len', 0)}"
+    )
+
+
+async def request_trace(mc, contact, timeout: float = BULK_TIMEOUT):
+    """Trace to a repeater (by its 1-byte hash) and summarize the returned path."""
+    tag = random.randint(1, 0xFFFFFFFF)
+    waiter = asyncio.ensure_future(
+        mc.wait_for_event(
+            EventType.TRACE_DATA, attribute_filters={"tag": tag}, timeout=timeout
+        )
+    )
+    try:
+        res = await mc.commands.send_trace(path=contact["public_key"][:2], tag=tag)
+        if res.type == EventType.ERROR:
+            return None
+        event = await waiter
+    finally:
+        waiter.cancel()
+
+    if event is None:
+        return None
+    hops = event.payload.get("path_len", 0)
+    snrs = [f"{node.get('snr', 0):.1f}" for node in event.payload.get("path", [])]
+    return f"{hops} hops, snr {'/'.join(snrs)}" if snrs else f"{hops} hops"
+
+
+async def request_login(mc, contact, password: str, timeout: float = BULK_TIMEOUT):
+    """Log in to a repeater or room server."""
+    attribute_filters = {"pubkey_prefix": contact["public_key"][:12]}
+    waiters = [
+        asyncio.ensure_future(
+            mc.wait_for_event(
+                event_type, attribute_filters=attribute_filters, timeout=timeout
+            )
+        )
+        for event_type in (EventType.LOGIN_SUCCESS, EventType.LOGIN_FAILED)
+    ]
+    try:
+        res = await mc.commands.send_login(contact, password)
+        if res.type == EventType.ERROR:
+            return None
+        done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+    event = next((w.result() for w in done if w.result() is not None), None)
+    if event is None:
+        return None
+    return "logged in" if event.type == EventType.LOGIN_SUCCESS else "login failed"
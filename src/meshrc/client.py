@@ -1,36 +1,161 @@
 import asyncio
+import math
+import time
+from collections import deque
 from typing import Any
 
 from meshcore import EventType, MeshCore
 from meshcore.events import Event
 from textual.app import App
 
+from .heartbeat import HEARTBEAT_INTERVAL, LinkMonitor
 from .messages import (
     ChannelListUpdated,
     ConnectionStatus,
     ContactListUpdated,
+    MessageDelivery,
     NewMessage,
+    SyncProgress,
 )
+from .metrics import REGISTRY
+from .record import incoming_record
+from .telemetry import POLL_INTERVAL, AirtimeBudget, TelemetryPoller
+
+# Scale applied to the device's suggested ack timeout before giving up
+ACK_TIMEOUT_FACTOR = 1.2
+# Used when the device does not suggest a timeout
+DEFAULT_ACK_TIMEOUT = 30.0
+# Number of round-trip samples kept per contact for percentile stats
+RTT_HISTORY_SIZE = 100
+# Messages handled between yields to the event loop while draining the device
+SYNC_CHUNK_SIZE = 20
+# Reconnect attempts after a lost serial, TCP or BLE link (or a heartbeat timeout)
+RECONNECT_ATTEMPTS = 10
+
+
+async def create_meshcore(connection_args: dict[str, Any]):
+    """Create and connect a MeshCore (or stand-in) from connection args."""
+    kind = connection_args.get("type")
+    if kind == "serial":
+        return await MeshCore.create_serial(
+            port=connection_args["port"],
+            baudrate=connection_args.get("baudrate", 115200),
+            auto_reconnect=True,
+            max_reconnect_attempts=RECONNECT_ATTEMPTS,
+        )
+    elif kind == "tcp":
+        return await MeshCore.create_tcp(
+            host=connection_args["host"],
+            port=connection_args["port"],
+            auto_reconnect=True,
+            max_reconnect_attempts=RECONNECT_ATTEMPTS,
+        )
+    elif kind == "ble":
+        return await MeshCore.create_ble(
+            address=connection_args.get("address"),
+            auto_reconnect=True,
+            max_reconnect_attempts=RECONNECT_ATTEMPTS,
+        )
+    elif kind == "simulate":
+        from .simulate import SimulatedMeshCore
+
+        return await SimulatedMeshCore.create(**connection_args.get("simulate", {}))
+    elif kind == "replay":
+        from .recording import ReplayMeshCore
+
+        return await ReplayMeshCore.create(
+            connection_args["replay"], connection_args.get("replay_speed", 1.0)
+        )
+    elif kind == "attach":
+        from .daemon import RemoteMeshCore
+
+        return await RemoteMeshCore.create(connection_args["socket"])
+    raise ValueError(f"Unknown connection type: {kind}")
+
+
+EVENT_RATE = REGISTRY.rate(
+    "meshrc_events_per_second", "Device events handled per second"
+)
+
+
+def default_channel_context(channel_idx) -> str:
+    return f"chan_{channel_idx}"
 
 
 class MeshClient:
-    def __init__(self, app: App, mc: MeshCore):
+    def __init__(
+        self,
+        app: App,
+        mc: MeshCore,
+        record_path: str = None,
+        channel_context=default_channel_context,
+        rules=None,
+    ):
         self.app = app
         self.mc = mc
+        self.record_path = record_path
+        self.channel_context = channel_context  # Maps a channel idx to its context id
+        self.rules = rules  # Filter rules applied before messages are posted
+        self.recorder = None
+        self.pending_acks = {}  # Key: expected ack code (hex), Value: pending entry
+        self.early_acks = {}  # Acks that arrived before send_msg returned
+        self._sends_in_flight = 0  # send_msg calls not returned yet
+        self.rtt_samples = {}  # Key: contact public key, Value: deque of RTTs (s)
+        self.airtime = AirtimeBudget()  # Shared by interactive and background sends
+        self.poller = None
+        self.heartbeat = None
 
     async def start_subscriptions(self):
         """Subscribe to MeshCore events."""
-        self.mc.subscribe(EventType.CONTACT_MSG_RECV, self._handle_contact_msg)
-        self.mc.subscribe(EventType.CHANNEL_MSG_RECV, self._handle_channel_msg)
-        self.mc.subscribe(EventType.CONTACTS, self._handle_contacts_update)
-        self.mc.subscribe(EventType.NEW_CONTACT, self._handle_new_contact)
-        self.mc.subscribe(EventType.CONNECTED, self._handle_connected)
-        self.mc.subscribe(EventType.DISCONNECTED, self._handle_disconnected)
+        if self.record_path:
+            from .recording import EventRecorder
+
+            # Subscribed first and to every event type, so the recording sees
+            # events (including command responses) before our handlers do
+            self.recorder = EventRecorder(self.record_path, self.mc.self_info)
+            self.mc.subscribe(None, self.recorder.record)
+
+        self._subscribe(EventType.CONTACT_MSG_RECV, self._handle_contact_msg)
+        self._subscribe(EventType.CHANNEL_MSG_RECV, self._handle_channel_msg)
+        self._subscribe(EventType.CONTACTS, self._handle_contacts_update)
+        self._subscribe(EventType.NEW_CONTACT, self._handle_new_contact)
+        self._subscribe(EventType.CONNECTED, self._handle_connected)
+        self._subscribe(EventType.DISCONNECTED, self._handle_disconnected)
+        self._subscribe(EventType.ACK, self._handle_ack)
 
         # Also subscribe to channels update if available or poll for it
         # Based on CLI, channels are fetched via get_channels
         await self.mc.start_auto_message_fetching()
 
+    def _subscribe(self, event_type: EventType, handler):
+        """Subscribe a handler, counting events and timing the handler."""
+        events = REGISTRY.counter(
+            "meshrc_events_total", "Device events handled", type=event_type.value
+        )
+        handler_time = REGISTRY.histogram(
+            "meshrc_handler_seconds",
+            "Time spent in MeshClient event handlers",
+            handler=handler.__name__.removeprefix("_handle_"),
+        )
+
+        async def timed_handler(event: Event):
+            events.inc()
+            EVENT_RATE.mark()
+            with handler_time.time():
+                await handler(event)
+
+        return self.mc.subscribe(event_type, timed_handler)
+
+    def close(self):
+        """Stop event dispatch and background jobs, and finish the recording."""
+        self.mc.stop()
+        if self.poller:
+            self.poller.stop()
+        if self.heartbeat:
+            self.heartbeat.stop()
+        if self.recorder:
+            self.recorder.close()
+
     async def _handle_contact_msg(self, event: Event):
         msg = event.payload
         # Normalize data structure if needed, or pass raw
@@ -38,15 +163,19 @@ class MeshClient:
         # We might need to enrich it with sender name if it's just a key
 
         # Basic enrichment
+        context_id = f"contact_{msg.get('pubkey_prefix')}"
         if "pubkey_prefix" in msg:
             contact = self.mc.get_contact_by_key_prefix(msg["pubkey_prefix"])
             if contact:
                 msg["sender_name"] = contact.get("adv_name", "Unknown")
+                # The sidebar identifies contacts by their full key
+                key = contact.get("public_key", msg["pubkey_prefix"])
+                context_id = f"contact_{key}"
             else:
                 msg["sender_name"] = msg["pubkey_prefix"][:8]
 
         msg["context_type"] = "contact"  # Explicitly mark as direct message
-        self.app.post_message(NewMessage(msg))
+        await self._post_record(incoming_record(msg, context_id), msg)
 
     async def _handle_channel_msg(self, event: Event):
         msg = event.payload
@@ -58,7 +187,17 @@ class MeshClient:
                 )
 
         msg["context_type"] = "channel"
-        self.app.post_message(NewMessage(msg))
+        context_id = self.channel_context(msg.get("channel_idx"))
+        await self._post_record(incoming_record(msg, context_id), msg)
+
+    async def _post_record(self, record, msg: dict):
+        if self.rules:
+            record = self.rules.apply(record, msg)
+            if record is None:
+                return
+        # Waits while the host is behind instead of losing the message. Only
+        # this event's task waits; reading from the device goes on.
+        await self.app.put_message(NewMessage(record))
 
     async def _handle_contacts_update(self, event: Event):
         self.app.post_message(ContactListUpdated(event.payload))
@@ -73,10 +212,98 @@ class MeshClient:
 
     async def _handle_connected(self, event: Event):
         self.app.post_message(ConnectionStatus("Connected", True))
+        if event.payload.get("reconnected"):
+            # Messages may have queued up on the device while we were away
+            self.start_sync()
 
     async def _handle_disconnected(self, event: Event):
         self.app.post_message(ConnectionStatus("Disconnected", False))
 
+    async def _handle_ack(self, event: Event):
+        code = event.payload.get("code")
+        if not code:
+            return
+        entry = self.pending_acks.pop(code, None)
+        if entry is None:
+            if self._sends_in_flight:
+                # The ack can be dispatched before send_msg has returned its code
+                self.early_acks[code] = time.monotonic()
+            return
+        self._complete_ack(code, entry, time.monotonic())
+
+    def _complete_ack(self, code: str, entry: dict, acked_at: float):
+        entry["timer"].cancel()
+        rtt = max(acked_at - entry["sent_at"], 0.0)
+        samples = self.rtt_samples.setdefault(
+            entry["key"], deque(maxlen=RTT_HISTORY_SIZE)
+        )
+        samples.append(rtt)
+        self.app.post_message(
+            MessageDelivery(code, entry["context_id"], "delivered", rtt)
+        )
+
+    def _expire_ack(self, code: str):
+        entry = self.pending_acks.pop(code, None)
+        if entry is not None:
+            self.app.post_message(
+                MessageDelivery(code, entry["context_id"], "failed")
+            )
+
+    async def send_msg(self, contact: dict[str, Any], text: str, context_id: str):
+        """Send a direct message and track its expected ack.
+
+        Returns the expected ack code, or None if the device did not accept
+        the message.
+        """
+        sent_at = time.monotonic()
+        self._sends_in_flight += 1
+        try:
+            res = await self.mc.commands.send_msg(contact, text)
+        finally:
+            self._sends_in_flight -= 1
+            early_acks = self.early_acks
+            if not self._sends_in_flight:
+                # No other send can claim the rest (e.g. repeats of old acks)
+                self.early_acks = {}
+        if res is None or res.type == EventType.ERROR:
+            return None
+
+        code = res.payload["expected_ack"].hex()
+        timeout = res.payload.get("suggested_timeout", 0) / 1000 * ACK_TIMEOUT_FACTOR
+        if timeout <= 0:
+            timeout = DEFAULT_ACK_TIMEOUT
+
+        loop = asyncio.get_running_loop()
+        entry = {
+            "context_id": context_id,
+            "key": contact.get("public_key", ""),
+            "sent_at": sent_at,
+            "timer": loop.call_later(timeout, self._expire_ack, code),
+        }
+
+        acked_at = early_acks.pop(code, None)
+        if acked_at is not None:
+            self._complete_ack(code, entry, acked_at)
+        else:
+            self.pending_acks[code] = entry
+        return code
+
+    def rtt_stats(self, key: str):
+        """Return (p50, p95, count) of recent round-trip times for a contact.
+
+        Percentiles are None when no ack has been measured yet.
+        """
+        samples = sorted(self.rtt_samples.get(key, ()))
+        if not samples:
+            return None, None, 0
+
+        def percentile(p):
+            # Nearest-rank percentile
+            rank = max(math.ceil(p / 100 * len(samples)), 1)
+            return samples[rank - 1]
+
+        return percentile(50), percentile(95), len(samples)
+
     async def fetch_initial_data(self):
         """Fetch contacts and channels on startup."""
         await self.mc.commands.get_contacts_async()
@@ -96,18 +323,53 @@ class MeshClient:
         self.mc.channels = channels  # Store like CLI does
         self.app.post_message(ChannelListUpdated(channels))
 
-        # Sync unread messages
-        await self.sync_messages()
+        # Sync unread messages in the background so a long backlog
+        # doesn't hold up the UI
+        self.start_sync()
+
+    def start_poller(
+        self, targets: list[str], db_path: str = None, interval: float = POLL_INTERVAL
+    ):
+        """Start polling the status of `targets` (names or key prefixes)."""
+        if self.poller:
+            self.poller.stop()
+        self.poller = TelemetryPoller(self.mc, targets, self.airtime, db_path, interval)
+        self.poller.start()
+        return self.poller
+
+    def start_heartbeat(
+        self, interval: float = HEARTBEAT_INTERVAL, device: str = "dev0"
+    ):
+        """Start probing the link to the device every `interval` seconds."""
+        if self.heartbeat:
+            self.heartbeat.stop()
+        self.heartbeat = LinkMonitor(self.app, self.mc, interval, device)
+        self.heartbeat.start()
+        return self.heartbeat
+
+    def start_sync(self):
+        """Drain pending messages from the device in a background worker."""
+        return self.app.run_worker(
+            self.sync_messages(), name="sync_messages", group="sync", exclusive=True
+        )
 
     async def sync_messages(self):
-        """Fetch all pending messages from the device."""
+        """Fetch all pending messages from the device.
+
+        The loop yields after every chunk of messages and reports progress.
+        """
+        count = 0
         while True:
             res = await self.mc.commands.get_msg()
             if res.type == EventType.NO_MORE_MSGS or res.type == EventType.ERROR:
                 break
-            
-            # Dispatch based on type
-            if res.type == EventType.CONTACT_MSG_RECV:
-                await self._handle_contact_msg(res)
-            elif res.type == EventType.CHANNEL_MSG_RECV:
-                await self._handle_channel_msg(res)
+            # The reader dispatches every fetched message to our subscriptions,
+            # so there is nothing to hand off here; handling it again would
+            # show each backlog message twice.
+            count += 1
+            if count % SYNC_CHUNK_SIZE == 0:
+                self.app.post_message(SyncProgress(count))
+                await asyncio.sleep(0)
+
+        self.app.post_message(SyncProgress(count, done=True))
+        return count
@@ -0,0 +1,469 @@
+"""Headless daemon (`--daemon`) that owns the radio and serves TUI clients.
+
+The daemon runs `MeshClient` and the log sinks without Textual and listens on
+a Unix socket. The protocol is newline-delimited JSON; every request carries
+an `op` and an optional `id` that is echoed in the reply:
+
+- `hello`: returns `session`, `seq`, `self_info`, `contacts` and `channels`.
+- `subscribe` (`since`): replays buffered messages with a sequence number
+  above `since`, then streams every device event as `{"seq", "event"}`.
+- `history` (`since`, `limit`): returns buffered messages without subscribing.
+- `command` (`method`, `args`, `kwargs`): runs a `meshcore` command, such as
+  `send_msg` or `send_chan_msg`, and returns its response event.
+
+Events are encoded as in recordings (see `recording.encode_event`).
+`RemoteMeshCore` is the transport the TUI uses to attach (`--attach`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import tempfile
+import time
+from collections import deque
+
+from meshcore import EventType
+from meshcore.events import Event
+
+from .client import MeshClient, create_meshcore
+from .logsink import LogSink
+from .messages import ConnectionStatus, LinkHealth, NewMessage
+from .metrics import REGISTRY
+from .recording import decode_event_data, decode_value, encode_event, encode_value
+from .simulate import StandInMeshCore
+
+# Message events kept for catch-up when a client (re)attaches
+HISTORY_SIZE = 2000
+# Lines queued for a client before it is considered stuck and dropped;
+# large enough for a full history catch-up plus live traffic
+CLIENT_QUEUE_SIZE = 4096
+# Seconds between attempts to reach the daemon after losing it
+RECONNECT_DELAY = 2.0
+
+HISTORY_EVENTS = (EventType.CONTACT_MSG_RECV, EventType.CHANNEL_MSG_RECV)
+
+CLIENTS = REGISTRY.gauge("meshrc_daemon_clients", "Attached daemon clients")
+DROPPED_CLIENTS = REGISTRY.counter(
+    "meshrc_daemon_dropped_clients_total", "Clients dropped for falling behind"
+)
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"meshrc-{os.getuid()}.sock")
+
+
+def _dumps(obj) -> bytes:
+    return (json.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+
+class _DaemonClient:
+    """An attached connection and the lines waiting to be written to it."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.queue = asyncio.Queue()
+        self.subscribed = False
+        self.task = asyncio.current_task()
+
+    def send(self, line: bytes):
+        self.queue.put_nowait(line)
+
+    async def write_loop(self):
+        while True:
+            line = await self.queue.get()
+            if line is None:
+                break
+            self.writer.write(line)
+            await self.writer.drain()
+
+
+class MeshDaemon:
+    """Runs the device connection, logging and the socket server.
+
+    Stands in for the app as `MeshClient`'s host: `post_message` and
+    `run_worker` are the only parts of it the client uses.
+    """
+
+    def __init__(self, connection_args: dict, socket_path: str):
+        self.connection_args = connection_args
+        self.socket_path = socket_path
+        self.session = os.urandom(4).hex()  # Lets clients tell a restarted daemon apart
+        self.seq = 0
+        self.history = deque(maxlen=HISTORY_SIZE)  # (seq, encoded event line)
+        self.clients = set()
+        self.mc = None
+        self.client = None
+        self.log_sink = None
+        self.start = time.monotonic()
+        self._workers = {}  # Key: worker group, Value: task
+        self._stopping = asyncio.Event()
+
+    # MeshClient host surface
+
+    def post_message(self, message):
+        if isinstance(message, NewMessage):
+            if self.log_sink:
+                self.log_sink.submit(message.record.log_entry)
+        elif isinstance(message, ConnectionStatus):
+            print(f"meshrc daemon: {message.status}", flush=True)
+        elif isinstance(message, LinkHealth) and message.changed:
+            print(f"meshrc daemon: link {message.state}", flush=True)
+
+    async def put_message(self, message):
+        self.post_message(message)
+
+    def run_worker(self, coro, name=None, group="default", exclusive=False):
+        if exclusive and group in self._workers:
+            self._workers[group].cancel()
+        task = asyncio.create_task(coro, name=name)
+        self._workers[group] = task
+        return task
+
+    # Lifecycle
+
+    async def run(self):
+        args = self.connection_args
+        if args.get("log_file") or args.get("log_db"):
+            self.log_sink = LogSink(
+                args.get("log_file"),
+                args.get("log_db"),
+                self._log_error,
+                partitioned=args.get("log_partitioned", False),
+                retention=args.get("log_retention"),
+                compact=args.get("log_compact", False),
+            )
+
+        self.mc = await create_meshcore(args)
+        self.client = MeshClient(
+            self, self.mc, record_path=args.get("record"), rules=args.get("rules")
+        )
+        await self.client.start_subscriptions()
+        # A sync callback, so events are fanned out in dispatch order
+        self.mc.subscribe(None, self._fan_out)
+        await self.client.fetch_initial_data()
+        if args.get("heartbeat"):
+            self.client.start_heartbeat(args["heartbeat"])
+        if args.get("poll"):
+            self.client.start_poller(
+                args["poll"], args.get("log_db"), args.get("poll_interval")
+            )
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path, limit=2**20
+        )
+        os.chmod(self.socket_path, 0o600)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        if args.get("metrics_file"):
+            self.run_worker(self._export_metrics(), group="metrics")
+
+        print(f"meshrc daemon: listening on {self.socket_path}", flush=True)
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            connections = [client.task for client in self.clients]
+            for client in list(self.clients):
+                client.writer.close()
+            if connections:
+                # Closing the writers ends each connection's read loop
+                await asyncio.wait(connections, timeout=1)
+            for task in self._workers.values():
+                task.cancel()
+            self.client.close()
+            if self.log_sink:
+                self.log_sink.close()
+            if args.get("metrics_file"):
+                REGISTRY.export(args["metrics_file"])
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _export_metrics(self):
+        while True:
+            await asyncio.sleep(self.connection_args.get("metrics_interval", 15))
+            try:
+                await asyncio.to_thread(
+                    REGISTRY.export, self.connection_args["metrics_file"]
+                )
+            except OSError as e:
+                print(f"meshrc daemon: metrics export failed: {e}", flush=True)
+
+    def _log_error(self, message: str):
+        print(f"meshrc daemon: {message}", flush=True)
+
+    # Fan-out
+
+    def _fan_out(self, event: Event):
+        self.seq += 1
+        # Encoded once and shared by every subscriber
+        encoded = encode_event(event, time.monotonic() - self.start)
+        line = f'{{"seq":{self.seq},"event":{encoded}}}\n'.encode()
+        if event.type in HISTORY_EVENTS:
+            self.history.append((self.seq, line))
+
+        for client in list(self.clients):
+            if not client.subscribed:
+                continue
+            if client.queue.qsize() >= CLIENT_QUEUE_SIZE:
+                # A stuck client must not hold events in memory forever; it
+                # catches up from history when it reattaches
+                DROPPED_CLIENTS.inc()
+                self._detach(client)
+                client.writer.close()
+                continue
+            client.send(line)
+
+    def _detach(self, client: _DaemonClient):
+        if client in self.clients:
+            self.clients.discard(client)
+            client.send(None)
+            CLIENTS.set(len(self.clients))
+
+    # Connections
+
+    async def _handle_connection(self, reader, writer):
+        client = _DaemonClient(writer)
+        self.clients.add(client)
+        CLIENTS.set(len(self.clients))
+        write_task = asyncio.create_task(client.write_loop())
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    client.send(_dumps({"error": "invalid json"}))
+                    continue
+                if request.get("op") == "command":
+                    # Commands wait for the device, so don't hold up the reader
+                    asyncio.create_task(self._command(client, request))
+                else:
+                    client.send(_dumps(self._handle_request(client, request)))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._detach(client)
+            await asyncio.gather(write_task, return_exceptions=True)
+            writer.close()
+
+    def _handle_request(self, client: _DaemonClient, request: dict) -> dict:
+        op = request.get("op")
+        reply = {"id": request.get("id")}
+        if op == "hello":
+            reply["result"] = {
+                "session": self.session,
+                "seq": self.seq,
+                "self_info": encode_value(self.mc.self_info),
+                "contacts": encode_value(self.mc.contacts),
+                "channels": encode_value(getattr(self.mc, "channels", [])),
+            }
+        elif op == "subscribe":
+            since = request.get("since", 0)
+            for seq, line in self.history:
+                if seq > since:
+                    client.send(line)
+            client.subscribed = True
+            reply["result"] = {"seq": self.seq}
+        elif op == "history":
+            since = request.get("since", 0)
+            lines = [line for seq, line in self.history if seq > since]
+            lines = lines[-request["limit"]:] if request.get("limit") else lines
+            reply["result"] = [json.loads(line) for line in lines]
+        else:
+            reply["error"] = f"unknown op: {op}"
+        return reply
+
+    async def _command(self, client: _DaemonClient, request: dict):
+        reply = {"id": request.get("id")}
+        method = request.get("method", "")
+        func = getattr(self.mc.commands, method, None)
+        if method.startswith("_") or not callable(func):
+            reply["error"] = f"unknown command: {method}"
+        else:
+            try:
+                res = await func(
+                    *decode_value(request.get("args", [])),
+                    **decode_value(request.get("kwargs", {})),
+                )
+                if isinstance(res, Event):
+                    encoded = encode_event(res, time.monotonic() - self.start)
+                    reply["result"] = json.loads(encoded)
+                else:
+                    reply["result"] = None
+            except Exception as e:
+                reply["error"] = str(e)
+        client.send(_dumps(reply))
+
+
+class RemoteCommands:
+    """Proxies commands to the daemon.
+
+    Contacts and self info are answered from the daemon's snapshot and
+    pending messages are drained by the daemon, so attaching sends nothing
+    to the radio.
+    """
+
+    def __init__(self, mc: RemoteMeshCore):
+        self.mc = mc
+
+    async def _local(self, event_type, payload):
+        event = Event(event_type, payload)
+        await self.mc.dispatch(event)
+        return event
+
+    async def send_appstart(self, timeout=None):
+        return await self._local(EventType.SELF_INFO, dict(self.mc.self_info))
+
+    async def get_contacts_async(self, lastmod=0):
+        return await self.get_contacts(lastmod)
+
+    async def get_contacts(self, lastmod=0, timeout=5):
+        return await self._local(EventType.CONTACTS, dict(self.mc.contacts))
+
+    async def get_msg(self, timeout=None):
+        return Event(EventType.NO_MORE_MSGS, {})
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        async def command(*args, **kwargs):
+            return await self.mc.request(
+                "command",
+                method=method,
+                args=encode_value(list(args)),
+                kwargs=encode_value(kwargs),
+            )
+
+        return command
+
+
+class RemoteMeshCore(StandInMeshCore):
+    """A MeshCore stand-in attached to a `MeshDaemon` over its socket.
+
+    Events streamed by the daemon are dispatched locally, so `MeshClient`
+    handles them as if the device were attached. If the daemon goes away the
+    connection is retried, and only the events missed meanwhile are replayed.
+    """
+
+    commands_class = RemoteCommands
+
+    def __init__(self, socket_path: str):
+        super().__init__()
+        self.socket_path = socket_path
+        self.session = None
+        self.last_seq = 0
+        self.channels = []
+        self._reader = None
+        self._writer = None
+        self._next_id = 0
+        self._pending = {}  # Key: request id, Value: future for the reply
+
+    @classmethod
+    async def create(cls, socket_path: str):
+        mc = cls(socket_path)
+        await mc._attach()
+        await mc.connect()
+        mc.spawn(mc._read_loop())
+        return mc
+
+    async def connect(self):
+        # No appstart: the daemon already did it on the real device
+        await self.dispatcher.start()
+        self.connected = True
+        await self.dispatch(Event(EventType.CONNECTED, {}))
+
+    async def _attach(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(
+            self.socket_path, limit=2**20
+        )
+        self._write({"op": "hello"})
+        hello = json.loads(await self._reader.readline())["result"]
+        if hello["session"] != self.session:
+            # A different daemon run: sequence numbers start over
+            self.session = hello["session"]
+            self.last_seq = 0
+        self._self_info = decode_value(hello["self_info"])
+        self._contacts = decode_value(hello["contacts"])
+        self.channels = decode_value(hello["channels"])
+        self._write({"op": "subscribe", "since": self.last_seq})
+
+    def _write(self, request: dict):
+        self._writer.write(_dumps(request))
+
+    async def request(self, op: str, **params):
+        if not self.connected:
+            raise ConnectionError("Not attached to the meshrc daemon")
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._write({"op": op, "id": request_id, **params})
+        try:
+            reply = await future
+        finally:
+            # Also when the caller gave up waiting (e.g. a heartbeat timeout)
+            self._pending.pop(request_id, None)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        result = reply.get("result")
+        if op == "command" and result is not None:
+            _, result = decode_event_data(result)
+        return result
+
+    async def _read_loop(self):
+        while True:
+            try:
+                while line := await self._reader.readline():
+                    await self._handle_line(json.loads(line))
+            except (ConnectionError, ValueError):
+                pass
+
+            self.connected = False
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Lost the meshrc daemon"))
+            self._pending.clear()
+            await self.dispatch(Event(EventType.DISCONNECTED, {}))
+
+            while not self.connected:
+                await asyncio.sleep(RECONNECT_DELAY)
+                try:
+                    await self._attach()
+                except (OSError, ValueError, KeyError):
+                    continue
+                self.connected = True
+                await self.dispatch(Event(EventType.CONNECTED, {}))
+                await self.dispatch(Event(EventType.CONTACTS, dict(self._contacts)))
+
+    async def _handle_line(self, message: dict):
+        if "event" in message:
+            self.last_seq = message["seq"]
+            _, event = decode_event_data(message["event"])
+            if event.type == EventType.CONTACTS:
+                self._contacts = dict(event.payload)
+            await self.dispatch(event)
+        else:
+            future = self._pending.pop(message.get("id"), None)
+            if future and not future.done():
+                future.set_result(message)
+
+    def stop(self):
+        super().stop()
+        if self._writer:
+            self._writer.close()
+
+
+def run_daemon(connection_args: dict, socket_path: str):
+    daemon = MeshDaemon(connection_args, socket_path)
+    asyncio.run(daemon.run())
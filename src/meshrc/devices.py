@@ -0,0 +1,190 @@
+"""Several MeshCore devices in one session (`--device`, repeatable).
+
+Each `Device` has its own connection and `MeshClient`. The messages its
+client posts are tagged with the device and go through a per-device queue,
+so a flood from one device is handled in turns with the others instead of
+ahead of them. Nothing received is dropped: the library delivers each event
+in a task of its own, so when a queue is full that task waits for room.
+Reading from the device carries on meanwhile, so such waiting messages are
+not bounded; they are counted in `meshrc_device_backlog`.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from .client import MeshClient, create_meshcore
+from .messages import NewMessage
+from .metrics import REGISTRY
+
+# Received messages queued per device; more wait for room (see put_message)
+DEVICE_QUEUE_SIZE = 1000
+# Messages handled from one device's queue before letting the others run
+DEVICE_BATCH = 20
+# Recently seen messages remembered for deduplication across devices
+DEDUP_SIZE = 1024
+
+DUPLICATES = REGISTRY.counter(
+    "meshrc_duplicate_messages_total", "Messages heard by more than one device"
+)
+
+
+def parse_device_spec(spec: str) -> dict:
+    """Parse `[NAME=]KIND[:ARG]` into connection args for one device.
+
+    KIND is serial (`serial:/dev/ttyUSB0[@baud]`), tcp (`tcp:host[:port]`),
+    ble (`ble[:address]`), simulate (`simulate[:spec]`), replay
+    (`replay:path`) or attach (`attach[:socket]`).
+    """
+    name = None
+    if "=" in spec.split(":", 1)[0]:
+        name, spec = spec.split("=", 1)
+    kind, _, arg = spec.partition(":")
+
+    if kind == "serial" and arg:
+        port, _, baudrate = arg.partition("@")
+        args = {"type": "serial", "port": port, "baudrate": int(baudrate or 115200)}
+    elif kind == "tcp" and arg:
+        host, _, port = arg.partition(":")
+        args = {"type": "tcp", "host": host, "port": int(port or 4403)}
+    elif kind == "ble":
+        args = {"type": "ble", "address": arg or None}
+    elif kind == "simulate":
+        from .simulate import parse_simulate_spec
+
+        args = {"type": "simulate", "simulate": parse_simulate_spec(arg)}
+    elif kind == "replay" and arg:
+        args = {"type": "replay", "replay": arg}
+    elif kind == "attach":
+        from .daemon import default_socket_path
+
+        args = {"type": "attach", "socket": arg or default_socket_path()}
+    else:
+        raise ValueError(f"Invalid device: {spec}")
+    if name:
+        args["name"] = name
+    return args
+
+
+class MessageDeduper:
+    """Remembers recent MessageRecords to drop copies heard by another device."""
+
+    def __init__(self, size: int = DEDUP_SIZE):
+        self.size = size
+        self.seen = OrderedDict()
+
+    def is_duplicate(self, record) -> bool:
+        key = (record.context_id, record.timestamp, record.sender, record.text)
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            DUPLICATES.inc()
+            return True
+        self.seen[key] = True
+        if len(self.seen) > self.size:
+            self.seen.popitem(last=False)
+        return False
+
+
+class Device:
+    """One connected device and its share of the app.
+
+    Acts as the `MeshClient`'s host: messages it posts are tagged with
+    `message.device` and passed on to the app, and its workers are grouped
+    per device so one device's sync does not cancel another's.
+    """
+
+    def __init__(self, app, index: int, connection_args: dict):
+        self.app = app
+        self.index = index
+        self.connection_args = connection_args
+        self.name = connection_args.get("name") or f"dev{index}"
+        self.mc = None
+        self.client = None
+        self.connected = False
+        self.channel_contexts = {}  # Key: channel idx, Value: context id
+        self.queue = asyncio.Queue(DEVICE_QUEUE_SIZE)
+        self.queue_full = REGISTRY.counter(
+            "meshrc_device_queue_full_total",
+            "Received messages that found the device's queue full",
+            device=self.name,
+        )
+        self.backlog = REGISTRY.gauge(
+            "meshrc_device_backlog",
+            "Received messages waiting for room in the device's queue",
+            device=self.name,
+        )
+        self._waiting = 0
+        self._pump = None
+
+    async def connect(self, record_path: str = None):
+        self.mc = await create_meshcore(self.connection_args)
+        self.client = MeshClient(
+            self,
+            self.mc,
+            record_path=record_path,
+            channel_context=self.channel_context,
+            rules=self.app.rules,
+        )
+        self._pump = asyncio.create_task(self._pump_messages())
+        await self.client.start_subscriptions()
+        await self.client.fetch_initial_data()
+        self.connected = True
+        heartbeat = self.app.connection_args.get("heartbeat")
+        if heartbeat and self.connection_args["type"] != "replay":
+            self.client.start_heartbeat(heartbeat, self.name)
+
+    def close(self):
+        if self.client:
+            self.client.close()
+        if self._pump:
+            self._pump.cancel()
+
+    # MeshClient host surface
+
+    def post_message(self, message):
+        message.device = self
+        return self.app.post_message(message)
+
+    async def put_message(self, message: NewMessage):
+        """Queue a received message, waiting for room if the app is behind.
+
+        Only the calling event task waits; the device's other events are
+        still read and delivered.
+        """
+        message.device = self
+        if not self.queue.full():
+            self.queue.put_nowait(message)
+            return
+        self.queue_full.inc()
+        self._waiting += 1
+        self.backlog.set(self._waiting)
+        try:
+            await self.queue.put(message)
+        finally:
+            self._waiting -= 1
+            self.backlog.set(self._waiting)
+
+    def run_worker(self, work, name=None, group="default", **kwargs):
+        group = f"{group}_{self.name}"
+        return self.app.run_worker(work, name=name, group=group, **kwargs)
+
+    async def _pump_messages(self):
+        handled = 0
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.app.on_new_message(message)
+            except Exception as e:
+                # Keep draining: a stopped pump would leave every later
+                # message waiting for room forever
+                self.app.notify(
+                    f"{self.name}: could not handle a message: {e}",
+                    severity="error",
+                )
+            handled += 1
+            if handled % DEVICE_BATCH == 0:
+                await asyncio.sleep(0)
+
+    # Channels
+
+    def channel_context(self, channel_idx) -> str:
+        return self.channel_contexts.get(channel_idx, f"chan_{channel_idx}")
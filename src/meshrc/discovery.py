@@ -0,0 +1,145 @@
+"""Device discovery (`--discover`) and the cached last good endpoint.
+
+Serial ports, TCP hosts and BLE advertisements are probed concurrently, each
+with a short timeout. A probe is a full connect (including the appstart
+handshake), so its duration ranks how responsive each device is.
+"""
+
+import asyncio
+import glob
+import json
+import time
+from contextlib import suppress
+
+from .client import create_meshcore
+from .paths import config_path
+
+# Seconds a single probe may take (a serial probe can try two DTR settings)
+PROBE_TIMEOUT = 6.0
+# Seconds spent listening for BLE advertisements
+BLE_SCAN_TIMEOUT = 5.0
+SERIAL_GLOBS = (
+    "/dev/ttyUSB*",
+    "/dev/ttyACM*",
+    "/dev/cu.usbserial*",
+    "/dev/cu.usbmodem*",
+)
+ENDPOINT_FILE = "last_endpoint.json"
+# Connection args worth remembering for each transport
+ENDPOINT_KEYS = ("type", "port", "baudrate", "host", "address")
+
+
+def serial_candidates() -> list[str]:
+    ports = set()
+    try:
+        from serial.tools import list_ports
+
+        ports.update(p.device for p in list_ports.comports())
+    except ImportError:
+        pass
+    for pattern in SERIAL_GLOBS:
+        ports.update(glob.glob(pattern))
+    return sorted(ports)
+
+
+async def ble_candidates(timeout: float = BLE_SCAN_TIMEOUT) -> list[str]:
+    """Return addresses of devices advertising as MeshCore."""
+    try:
+        from bleak import BleakScanner
+
+        found = await BleakScanner.discover(timeout=timeout, return_adv=True)
+    except Exception:
+        # No BLE stack or adapter
+        return []
+    return [
+        device.address
+        for device, adv in found.values()
+        if adv.local_name and adv.local_name.startswith("MeshCore")
+    ]
+
+
+def parse_tcp_host(host: str) -> dict:
+    name, _, port = host.partition(":")
+    return {"type": "tcp", "host": name, "port": int(port or 4403)}
+
+
+async def probe(connection_args: dict, timeout: float = PROBE_TIMEOUT):
+    """Connect to a candidate and return what answered, or None."""
+    start = time.monotonic()
+    try:
+        mc = await asyncio.wait_for(create_meshcore(connection_args), timeout)
+    except Exception:
+        return None
+    if mc is None:
+        return None
+    latency = time.monotonic() - start
+    # Connecting succeeds even if the appstart handshake timed out, so only
+    # a SELF_INFO reply shows that a MeshCore device is listening
+    self_info = mc.self_info
+    with suppress(Exception):
+        await mc.disconnect()
+    if not self_info:
+        return None
+    name = self_info.get("name", "")
+    return {"args": connection_args, "name": name, "latency": latency}
+
+
+async def discover(
+    tcp_hosts=(), ble: bool = True, timeout: float = PROBE_TIMEOUT
+) -> list:
+    """Probe every candidate concurrently; return responders, fastest first."""
+
+    async def probe_ble():
+        addresses = await ble_candidates()
+        return await asyncio.gather(
+            *(probe({"type": "ble", "address": a}, timeout) for a in addresses)
+        )
+
+    probes = [
+        probe({"type": "serial", "port": p}, timeout) for p in serial_candidates()
+    ]
+    probes += [probe(parse_tcp_host(h), timeout) for h in tcp_hosts]
+    groups = [asyncio.gather(*probes)]
+    if ble:
+        # The BLE scan runs alongside the serial and TCP probes
+        groups.append(probe_ble())
+    results = [r for group in await asyncio.gather(*groups) for r in group if r]
+    return sorted(results, key=lambda r: r["latency"])
+
+
+async def resolve_endpoint(tcp_hosts=(), ble: bool = True):
+    """Return (connection args, ranked responders) for --discover.
+
+    The cached endpoint is tried first and used without a scan if it
+    answers; otherwise everything is probed and the fastest device wins.
+    """
+    cached = load_endpoint()
+    if cached:
+        result = await probe(cached)
+        if result:
+            return cached, [result]
+
+    results = await discover(tcp_hosts, ble)
+    if not results:
+        return None, []
+    save_endpoint(results[0]["args"])
+    return results[0]["args"], results
+
+
+def load_endpoint():
+    try:
+        with open(config_path(ENDPOINT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_endpoint(connection_args: dict):
+    if connection_args.get("type") not in ("serial", "tcp", "ble"):
+        return
+    endpoint = {k: connection_args[k] for k in ENDPOINT_KEYS if k in connection_args}
+    try:
+        with open(config_path(ENDPOINT_FILE), "w") as f:
+            json.dump(endpoint, f)
+    except OSError:
+        pass
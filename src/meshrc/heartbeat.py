@@ -0,0 +1,136 @@
+"""Host-to-device link health from periodic heartbeat probes (`--heartbeat`).
+
+A dead link normally only shows up as a DISCONNECTED event, and a half-open
+TCP socket or a BLE link that stopped answering may never produce one. So
+every interval a `get_time` command, which the device answers itself
+without touching the radio, is sent and its round trip timed. A slow reply
+marks the link "slow"; a missed one marks it "stalled" and the next probe
+follows sooner. After `LOST_MISSES` misses in a row the link is "lost":
+the stale transport is aborted and the connection manager's disconnect
+handling runs, which reconnects when auto-reconnect is on (it is for
+serial, TCP and BLE, see `create_meshcore()`).
+
+Each change of state, and each round trip, is posted to the host as a
+`LinkHealth` message.
+"""
+
+import asyncio
+import time
+
+from meshcore import EventType
+
+from .messages import LinkHealth
+from .metrics import REGISTRY
+
+# Default seconds between probes of a healthy link
+HEARTBEAT_INTERVAL = 15.0
+# Seconds between probes once one has been missed
+STALLED_INTERVAL = 2.0
+# Seconds a probe may take before it counts as missed
+PROBE_TIMEOUT = 5.0
+# Round trips slower than this mark the link as slow (seconds)
+SLOW_RTT = 1.0
+# Missed probes in a row before the link is declared lost
+LOST_MISSES = 3
+
+# Link states, best first
+OK, SLOW, STALLED, LOST, DOWN = "ok", "slow", "stalled", "lost", "down"
+
+
+class LinkMonitor:
+    """Probes one connection on an interval and tracks its health."""
+
+    def __init__(
+        self, host, mc, interval: float = HEARTBEAT_INTERVAL, device: str = "dev0"
+    ):
+        self.host = host
+        self.mc = mc
+        self.interval = interval
+        self.state = None
+        self.rtt = None  # Seconds, of the last probe answered
+        self.misses = 0  # Probes missed in a row
+        self.rtt_histogram = REGISTRY.histogram(
+            "meshrc_heartbeat_rtt_seconds",
+            "Heartbeat probe round trips",
+            device=device,
+        )
+        self.missed = REGISTRY.counter(
+            "meshrc_heartbeat_missed_total",
+            "Heartbeat probes not answered in time",
+            device=device,
+        )
+        self.lost = REGISTRY.counter(
+            "meshrc_heartbeat_lost_total",
+            "Links declared lost by the heartbeat",
+            device=device,
+        )
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            if not self.mc.is_connected:
+                self._update(DOWN, None)
+                await asyncio.sleep(STALLED_INTERVAL)
+                continue
+            rtt = await self.probe()
+            if rtt is not None:
+                self.misses = 0
+                self._update(SLOW if rtt > SLOW_RTT else OK, rtt)
+                await asyncio.sleep(self.interval)
+                continue
+
+            self.misses += 1
+            self.missed.inc()
+            if self.misses < LOST_MISSES:
+                self._update(STALLED, None)
+                await asyncio.sleep(STALLED_INTERVAL)
+                continue
+            self.misses = 0
+            self.lost.inc()
+            self._update(LOST, None)
+            await self._declare_lost()
+
+    async def probe(self) -> float | None:
+        """Round trip of one get_time command, or None if it timed out or failed."""
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.mc.commands.get_time(), PROBE_TIMEOUT)
+        except (TimeoutError, ConnectionError, RuntimeError, OSError):
+            return None
+        if (
+            getattr(result, "type", None) == EventType.ERROR
+            and "error_code" not in result.payload
+        ):
+            return None  # The library's own timeout or send failure, not a reply
+        rtt = time.monotonic() - start
+        self.rtt_histogram.observe(rtt)
+        return rtt
+
+    async def _declare_lost(self):
+        """Hand the dead link to the connection manager's disconnect handling."""
+        manager = getattr(self.mc, "connection_manager", None)
+        if manager is None:
+            # Stand-ins (simulate, replay, attach) manage their own connection
+            await asyncio.sleep(self.interval)
+            return
+        # A half-open socket would otherwise linger until the OS notices
+        transport = getattr(getattr(manager, "connection", None), "transport", None)
+        if transport is not None and hasattr(transport, "abort"):
+            transport.abort()
+        await manager.handle_disconnect("heartbeat timeout")
+
+    def _update(self, state: str, rtt: float | None):
+        changed = state != self.state
+        self.state = state
+        if rtt is not None:
+            self.rtt = rtt
+        if changed or rtt is not None:
+            self.host.post_message(LinkHealth(state, self.rtt, changed))
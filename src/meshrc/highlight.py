@@ -0,0 +1,75 @@
+"""Highlight terms (`--highlight`) matched in every received message.
+
+All terms are compiled into one regex whose alternatives share prefixes
+(a trie), so matching a message is a single scan however many callsigns
+and keywords are configured, instead of one search per term.
+"""
+
+import re
+
+from .metrics import REGISTRY
+
+MENTIONS = REGISTRY.counter(
+    "meshrc_mentions_total", "Received messages matching a highlight term"
+)
+
+
+def parse_terms(values) -> list:
+    """Split repeated, comma-separated --highlight values into terms."""
+    return [
+        term.strip()
+        for value in values or ()
+        for term in value.split(",")
+        if term.strip()
+    ]
+
+
+def _trie_pattern(node: dict) -> str:
+    # A key of "" marks the end of a term
+    end = "" in node
+    branches = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in node.items()
+        if char
+    ]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not end:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if end else pattern
+
+
+def compile_terms(terms) -> re.Pattern | None:
+    """Compile terms into one case-insensitive, whole-word pattern."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+    if not trie:
+        return None
+    # Terms may start or end with punctuation, so \b is not enough
+    return re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE)
+
+
+class HighlightMatcher:
+    def __init__(self, terms=()):
+        self.terms = []
+        self.pattern = None
+        self.add(*terms)
+
+    def add(self, *terms):
+        """Add terms (e.g. the device's own name) and recompile."""
+        known = {term.lower() for term in self.terms}
+        new = [term for term in terms if term and term.lower() not in known]
+        if new:
+            self.terms.extend(new)
+            self.pattern = compile_terms(self.terms)
+
+    def find(self, text: str) -> tuple:
+        """Return the (start, end) spans of terms in `text`."""
+        if self.pattern is None or not text:
+            return ()
+        return tuple(match.span() for match in self.pattern.finditer(text))
@@ -0,0 +1,212 @@
+"""RF link quality per contact and channel, from the messages we receive.
+
+Each received message's SNR, RSSI and path length are added to fixed-size
+ring buffers per conversation. Every update is O(1) (amortized for min and
+max): the window's min and max are kept in monotonic queues, percentiles
+come from a histogram of the window (the values are quantized, SNR to
+0.25 dB, so it is exact) that is updated as values enter and leave, and an
+EWMA follows recent values. Nothing has to be re-read from the log to see
+how a link is doing, or whether it is getting worse.
+
+With `--logdb`, the buffers are saved to a `link_series` table in the log
+database, so they survive restarts.
+"""
+
+import math
+import sqlite3
+import time
+from array import array
+from collections import deque
+
+# Samples kept per conversation and field
+LINK_WINDOW = 256
+# Weight of the newest sample in the EWMA
+EWMA_ALPHA = 0.2
+# SNR EWMA this far below the window's median counts as degrading (dB)
+DEGRADED_SNR = 3.0
+# Seconds between saves to the log database
+LINK_SAVE_INTERVAL = 300
+
+# Key in log entries: (label, lowest, highest, step) of its histogram
+FIELDS = {
+    "SNR": ("SNR dB", -40.0, 40.0, 0.25),
+    "RSSI": ("RSSI dBm", -150.0, 0.0, 1.0),
+    "path_len": ("Hops", 0.0, 63.0, 1.0),
+}
+
+CREATE_LINK_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS link_series (
+    context_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    ewma REAL,
+    samples BLOB,
+    PRIMARY KEY (context_id, field)
+) WITHOUT ROWID;
+"""
+
+
+class Series:
+    """The last `size` samples of one value, with running aggregates."""
+
+    def __init__(self, low: float, high: float, step: float, size: int = LINK_WINDOW):
+        self.low, self.high, self.step = low, high, step
+        self.size = size
+        self.times = array("d", bytes(8 * size))
+        self.values = array("d", bytes(8 * size))
+        self.added = 0  # Samples ever added; the next one goes to added % size
+        self.bins = [0] * (round((high - low) / step) + 1)
+        self._min = deque()  # (sample number, value), values increasing
+        self._max = deque()  # ... decreasing
+        self.ewma = None
+
+    def __len__(self):
+        return min(self.added, self.size)
+
+    def _bin(self, value: float) -> int:
+        return round((min(max(value, self.low), self.high) - self.low) / self.step)
+
+    def add(self, timestamp: float, value: float):
+        number = self.added
+        slot = number % self.size
+        if number >= self.size:
+            self.bins[self._bin(self.values[slot])] -= 1
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.bins[self._bin(value)] += 1
+        self.added += 1
+
+        # Each queue's front is the window's min (max); values that can never
+        # be again, as a newer one is smaller (larger), are dropped
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((number, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((number, value))
+        for queue in (self._min, self._max):
+            if queue[0][0] <= number - self.size:
+                queue.popleft()  # Left the window
+
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            self.ewma += EWMA_ALPHA * (value - self.ewma)
+
+    @property
+    def last(self) -> float:
+        return self.values[(self.added - 1) % self.size] if self.added else None
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else None
+
+    def percentile(self, q: float) -> float:
+        """Value below which a fraction q of the window lies (to the step)."""
+        if not self.added:
+            return None
+        rank = max(math.ceil(q * len(self)), 1)
+        seen = 0
+        for index, count in enumerate(self.bins):
+            seen += count
+            if seen >= rank:
+                return self.low + index * self.step
+        return self.high
+
+    def recent(self, count: int = None) -> list:
+        """(timestamp, value) of the newest samples, oldest first."""
+        count = len(self) if count is None else min(count, len(self))
+        return [
+            (self.times[n % self.size], self.values[n % self.size])
+            for n in range(self.added - count, self.added)
+        ]
+
+    @property
+    def degraded(self) -> bool:
+        return len(self) >= 8 and self.ewma < self.percentile(0.5) - DEGRADED_SNR
+
+
+class LinkStats:
+    """Series per conversation (context id) and field."""
+
+    def __init__(self, size: int = LINK_WINDOW):
+        self.size = size
+        self.series = {}  # Key: context id, Value: {field: Series}
+        self.updated = 0.0  # time.monotonic() of the last sample
+
+    def add(self, context_id: str, entry: dict, timestamp: float = None):
+        """Add the link fields of a received message's payload (or log entry)."""
+        fields = None
+        for field, (_, low, high, step) in FIELDS.items():
+            value = entry.get(field)
+            if type(value) not in (int, float) or not low <= value <= high:
+                continue  # e.g. path_len 255: no hop count
+            if fields is None:
+                fields = self.series.setdefault(context_id, {})
+            series = fields.get(field)
+            if series is None:
+                series = fields[field] = Series(low, high, step, self.size)
+            series.add(timestamp or time.time(), value)
+        if fields is not None:
+            self.updated = time.monotonic()
+
+    def get(self, context_id: str) -> dict:
+        return self.series.get(context_id, {})
+
+    def degraded(self, context_id: str) -> bool:
+        snr = self.get(context_id).get("SNR")
+        return bool(snr and snr.degraded)
+
+    def snapshot(self) -> list:
+        """link_series rows of the series, for save_link_series()."""
+        rows = []
+        for context_id, fields in self.series.items():
+            for field, series in fields.items():
+                samples = array("d")
+                for timestamp, value in series.recent():
+                    samples += array("d", (timestamp, value))
+                rows.append((context_id, field, series.ewma, samples.tobytes()))
+        return rows
+
+    def load(self, rows):
+        """Restore series from link_series rows, ahead of any added since."""
+        for context_id, field, ewma, data in rows:
+            if field not in FIELDS:
+                continue
+            _, low, high, step = FIELDS[field]
+            series = Series(low, high, step, self.size)
+            samples = array("d")
+            samples.frombytes(data)
+            for i in range(0, len(samples), 2):
+                series.add(samples[i], samples[i + 1])
+            series.ewma = ewma
+            newer = self.series.setdefault(context_id, {}).get(field)
+            if newer is not None:
+                for timestamp, value in newer.recent():
+                    series.add(timestamp, value)
+            self.series[context_id][field] = series
+
+
+def read_link_series(conn: sqlite3.Connection) -> list:
+    """All link_series rows (none if the table doesn't exist yet)."""
+    try:
+        return conn.execute(
+            "SELECT context_id, field, ewma, samples FROM link_series"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+
+
+def save_link_series(log_db: str, rows: list):
+    conn = sqlite3.connect(log_db)
+    try:
+        with conn:
+            conn.execute(CREATE_LINK_TABLE_SQL)
+            conn.executemany(
+                "INSERT OR REPLACE INTO link_series VALUES (?, ?, ?, ?)", rows
+            )
+    finally:
+        conn.close()
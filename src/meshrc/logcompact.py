@@ -0,0 +1,174 @@
+"""Compact `raw_json` for the `--logdb` message log (`--logdb-compact`).
+
+Normally `raw_json` repeats every field the typed columns already hold.
+Compacted, it keeps only what the columns don't: the remaining keys and
+values, with a column's key standing in for its value, in the entry's key
+order. That list is deflated against a dictionary of the usual keys and
+values, which matters as rows are far too short to compress well alone.
+The column is then a BLOB, which sets compacted rows apart from plain ones,
+so both can live in one database.
+
+`raw_json_text()` rebuilds the JSON only when asked for (export); it is the
+exact `json.dumps()` text the plain log would hold. Entries whose JSON
+couldn't be rebuilt exactly (e.g. imported lines formatted differently)
+are kept as plain text.
+"""
+
+import json
+import zlib
+
+# Columns of msgs that also appear in log entries, in table order
+COLUMN_KEYS = (
+    "timestamp",
+    "sender",
+    "name",
+    "text",
+    "type",
+    "channel_idx",
+    "pubkey_prefix",
+)
+COLUMN_NUMBERS = {key: number for number, key in enumerate(COLUMN_KEYS)}
+INTEGER_COLUMNS = {"timestamp", "channel_idx"}
+
+# First byte of a compacted raw_json
+FORMAT_LIST = 1  # The key/value list as UTF-8 JSON
+FORMAT_DEFLATE = 2  # ... deflated with DICTIONARY
+
+# Raw deflate with a 1 KB window: rows are short, and a small window and
+# hash table make setting up each stream several times cheaper
+WINDOW_BITS = -10
+MEM_LEVEL = 2
+
+# Likely substrings of the key/value lists, the most likely last (deflate
+# finds nearer matches cheaper). Never change it: rows depend on it.
+DICTIONARY = (
+    b'"attempt",1,"expected_ack","suggested_timeout","out_path_len",-1,"path":'
+    b'[4,6,"path_len",0,"txt_type",0,"sender_timestamp",17'
+    b'[4,5,"path_len",0,"txt_type",0,"sender_timestamp",17'
+    b'[4,5,"path_len",1,"txt_type",0,"sender_timestamp",17'
+    b',"SNR",-1'
+    b',"SNR",1'
+    b',"SNR",'
+    b'.25,3,0,2,1]'
+    b'.5,3,0,2,1]'
+    b'.75,3,0,2,1]'
+    b',3,0,2,1]'
+)
+
+_dumps = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+def _column_value(key: str, value) -> bool:
+    """Whether the column gives back exactly this value."""
+    if value is None:
+        return True
+    if key in INTEGER_COLUMNS:
+        # INTEGER affinity would turn 1.0 into 1, and big ints into floats
+        return type(value) is int and -(2**63) <= value < 2**63
+    return type(value) is str
+
+
+def entry_items(entry: dict):
+    """The key/value list of a log entry as UTF-8 JSON, or None if it can't be made."""
+    items = []
+    for key, value in entry.items():
+        if type(key) is not str:
+            return None  # json.dumps() would turn it into a string
+        number = COLUMN_NUMBERS.get(key)
+        if number is not None and _column_value(key, value):
+            items.append(number)
+        else:
+            items += (key, value)
+    try:
+        return _dumps(items).encode()
+    except (TypeError, ValueError):
+        return None
+
+
+def compact_entry(entry: dict):
+    """Compact a log entry's raw_json, or return None if it can't be."""
+    data = entry_items(entry)
+    if data is None:
+        return None
+    compressor = zlib.compressobj(
+        9, zlib.DEFLATED, WINDOW_BITS, MEM_LEVEL, zdict=DICTIONARY
+    )
+    packed = compressor.compress(data) + compressor.flush()
+    if len(packed) < len(data):
+        return bytes((FORMAT_DEFLATE,)) + packed
+    return bytes((FORMAT_LIST,)) + data
+
+
+def compact_line(entry: dict, line: str):
+    """raw_json for an entry logged as `line`: compacted if that's lossless."""
+    if json.dumps(entry) == line:
+        return compact_entry(entry) or line
+    return line
+
+
+def raw_items(raw: bytes) -> bytes:
+    """The key/value list in a compacted raw_json."""
+    if raw[0] == FORMAT_DEFLATE:
+        decompressor = zlib.decompressobj(WINDOW_BITS, zdict=DICTIONARY)
+        return decompressor.decompress(raw[1:]) + decompressor.flush()
+    if raw[0] == FORMAT_LIST:
+        return raw[1:]
+    raise ValueError(f"unknown raw_json format {raw[0]}")
+
+
+def load_entry(row) -> dict:
+    """The log entry of a msgs row (the COLUMN_KEYS columns, then raw_json)."""
+    raw = row[-1]
+    if raw is None:
+        # zip() stops before raw_json
+        pairs = zip(COLUMN_KEYS, row, strict=False)
+        return {key: value for key, value in pairs if value is not None}
+    if isinstance(raw, str):
+        return json.loads(raw)
+    data = raw_items(raw)
+
+    entry = {}
+    items = iter(json.loads(data))
+    for item in items:
+        if type(item) is int:
+            entry[COLUMN_KEYS[item]] = row[item]
+        else:
+            entry[item] = next(items)
+    return entry
+
+
+def raw_json_text(row) -> str:
+    """The JSON text of a msgs row's log entry, rebuilt if compacted."""
+    raw = row[-1]
+    if isinstance(raw, str):
+        return raw
+    return json.dumps(load_entry(row))
+
+
+def compact_rows(conn, batch: int = 5000) -> int:
+    """Compact the plain raw_json of existing rows; returns how many were."""
+    compacted = 0
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, timestamp, sender, name, text, type, channel_idx, "
+            "pubkey_prefix, raw_json FROM msgs "
+            "WHERE rowid > ? AND typeof(raw_json) = 'text' "
+            "ORDER BY rowid LIMIT ?",
+            (last, batch),
+        ).fetchall()
+        if not rows:
+            return compacted
+        updates = []
+        for rowid, *columns, raw in rows:
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            packed = compact_line(entry, raw) if isinstance(entry, dict) else raw
+            if isinstance(packed, bytes) and load_entry((*columns, packed)) == entry:
+                updates.append((packed, rowid))
+        with conn:
+            conn.executemany("UPDATE msgs SET raw_json = ? WHERE rowid = ?", updates)
+        compacted += len(updates)
+        last = rows[-1][0]
@@ -0,0 +1,223 @@
+"""The `--logdb` message log: schema, monthly partitions and read-only queries.
+
+Queries run on a small pool of threads, each with its own read-only
+connection. The log is in WAL mode, so readers neither wait for the log
+writer nor hold it up, and nothing blocks the event loop. A query started
+with a `key` supersedes the previous one with that key (e.g. an older
+search), which is interrupted; cancelling the awaiting task interrupts its
+query too.
+
+With `--logdb-partition`, messages are written to one file per month next
+to the log database (`meshrc.2024-05.db` for `meshrc.db`). Readers attach
+the newest partitions and see them, with the main database's own rows,
+through a temporary `msgs` view, so queries are the same either way.
+"""
+
+import asyncio
+import glob
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from .metrics import REGISTRY
+
+# Reader threads (and connections)
+READER_POOL_SIZE = 3
+# Partitions readers attach; SQLite allows 10 attached databases by default
+PARTITION_ATTACH_LIMIT = 9
+
+CREATE_MSGS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS msgs (
+    timestamp INTEGER,
+    sender TEXT,
+    name TEXT,
+    text TEXT,
+    type TEXT,
+    channel_idx INTEGER,
+    pubkey_prefix TEXT,
+    raw_json TEXT
+);
+"""
+
+# Lets unread counts per context be computed as index range counts
+CREATE_MSGS_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS msgs_context
+ON msgs (type, channel_idx, pubkey_prefix, timestamp);
+"""
+
+QUERY_TIME = REGISTRY.histogram("meshrc_logdb_query_seconds", "Time to run a log query")
+CANCELLED = REGISTRY.counter("meshrc_logdb_cancelled_total", "Log queries interrupted")
+
+
+class QueryCancelled(Exception):
+    """The query was superseded or cancelled before it finished."""
+
+
+def enable_wal(conn: sqlite3.Connection):
+    # Persistent, so readers opened later see the database in WAL mode
+    conn.execute("PRAGMA journal_mode=WAL")
+
+
+def init_msgs_db(conn: sqlite3.Connection):
+    """Set up a new log (or partition) database."""
+    # Only takes effect before the first table is created
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    enable_wal(conn)
+    conn.execute(CREATE_MSGS_TABLE_SQL)
+    conn.execute(CREATE_MSGS_INDEX_SQL)
+
+
+def partition_path(log_db: str, timestamp: float) -> str:
+    base, ext = os.path.splitext(log_db)
+    return f"{base}.{time.strftime('%Y-%m', time.gmtime(timestamp))}{ext or '.db'}"
+
+
+def list_partitions(log_db: str) -> list:
+    """Return (month, path) of the log's partition files, oldest first."""
+    base, ext = os.path.splitext(log_db)
+    ext = ext or ".db"
+    month = re.compile(r"\.(\d{4}-\d{2})" + re.escape(ext) + "$")
+    partitions = []
+    for path in glob.glob(f"{glob.escape(base)}.????-??{glob.escape(ext)}"):
+        match = month.search(path)
+        if match:
+            partitions.append((match.group(1), path))
+    return sorted(partitions)
+
+
+def db_uri(path: str, mode: str = "ro") -> str:
+    """URI opening the database at `path` in `mode` (a path may contain ?, # or %)."""
+    return f"file:{quote(path)}?mode={mode}"
+
+
+def attach_partitions(conn: sqlite3.Connection, partitions: list):
+    """Attach partitions and shadow `msgs` with a view over them and the main table."""
+    selects = ["SELECT * FROM main.msgs"]
+    for i, (_, path) in enumerate(partitions):
+        conn.execute(f"ATTACH DATABASE ? AS p{i}", (db_uri(path),))
+        selects.append(f"SELECT * FROM p{i}.msgs")
+    # Temp objects are found before main's, so queries on msgs use the view
+    conn.execute("CREATE TEMP VIEW msgs AS " + " UNION ALL ".join(selects))
+
+
+class _Query:
+    def __init__(self):
+        self.cancelled = False
+        self.conn = None  # Set while running
+
+    def cancel(self):
+        self.cancelled = True
+        conn = self.conn
+        if conn is not None:
+            conn.interrupt()
+
+
+class ReaderPool:
+    def __init__(
+        self, path: str, size: int = READER_POOL_SIZE, partitioned: bool = False
+    ):
+        self.path = path
+        self.partitioned = partitioned
+        self.executor = ThreadPoolExecutor(size, thread_name_prefix="meshrc-logdb")
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._running = {}  # Key: query key, Value: _Query
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        partitions = None
+        if self.partitioned:
+            partitions = list_partitions(self.path)[-PARTITION_ATTACH_LIMIT:]
+            if conn is not None and partitions != self._local.partitions:
+                # A month started or a partition was removed
+                with self._lock:
+                    self._connections.remove(conn)
+                conn.close()
+                conn = None
+        if conn is None:
+            conn = sqlite3.connect(db_uri(self.path), uri=True, check_same_thread=False)
+            if partitions:
+                attach_partitions(conn, partitions)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            self._local.partitions = partitions
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, query: _Query, fn, args):
+        query.conn = self._connection()
+        try:
+            if query.cancelled:
+                raise QueryCancelled()
+            with QUERY_TIME.time():
+                return fn(query.conn, *args)
+        except sqlite3.OperationalError:
+            if query.cancelled:
+                raise QueryCancelled() from None
+            raise
+        finally:
+            query.conn = None
+
+    async def run(self, fn, *args, key: str = None):
+        """Run `fn(conn, *args)` on a reader connection and return its result.
+
+        Raises QueryCancelled if a later query with the same key, or
+        `cancel(key)`, interrupted it.
+        """
+        query = _Query()
+        if key is not None:
+            self.cancel(key)
+            self._running[key] = query
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor, self._call, query, fn, args
+            )
+        except asyncio.CancelledError:
+            query.cancel()
+            raise
+        except QueryCancelled:
+            CANCELLED.inc()
+            raise
+        finally:
+            if key is not None and self._running.get(key) is query:
+                del self._running[key]
+
+    async def query(self, sql: str, params=(), key: str = None) -> list:
+        return await self.run(_fetchall, sql, params, key=key)
+
+    def cancel(self, key: str):
+        query = self._running.pop(key, None)
+        if query is not None:
+            query.cancel()
+
+    def close(self):
+        for query in self._running.values():
+            query.cancel()
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def _fetchall(conn, sql, params):
+    return conn.execute(sql, params).fetchall()
+
+
+def search_messages(conn, text: str, limit: int = 20) -> list:
+    """Find logged messages containing `text`, newest first."""
+    for char in "\\%_":
+        text = text.replace(char, "\\" + char)
+    pattern = f"%{text}%"
+    return conn.execute(
+        "SELECT timestamp, name, text FROM msgs WHERE text LIKE ? ESCAPE '\\' "
+        "ORDER BY timestamp DESC LIMIT ?",
+        (pattern, limit),
+    ).fetchall()
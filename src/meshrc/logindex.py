@@ -0,0 +1,216 @@
+"""Sidecar index for the JSONL `--log`, so history can be read back quickly.
+
+For each logged line, `<log>.idx` holds a fixed-size entry with the line's
+offset and length, its timestamp, its conversation and the number of the
+previous entry for the same conversation. Following that chain from a
+conversation's newest entry finds its last N messages directly: only those
+lines are read (through mmap) and parsed, however large the log is.
+
+The index is appended to as the log is written. Conversation names are kept
+in `<log>.idx.keys`, and the newest entry per conversation is saved to
+`<log>.idx.heads` on close, so opening the index only scans entries added
+since. Lines logged before the index existed (or while it was missing) are
+indexed when it is opened.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import suppress
+
+# offset, length, timestamp, conversation number, previous entry (-1 for none)
+ENTRY = struct.Struct("<QIdIq")
+
+
+def log_key(entry: dict) -> str:
+    """Conversation of a log entry: "CHAN:<idx>" or "PRIV:<pubkey prefix>"."""
+    if entry.get("type") == "CHAN":
+        return f"CHAN:{entry.get('channel_idx')}"
+    return f"PRIV:{entry.get('pubkey_prefix')}"
+
+
+class LogIndex:
+    """Index of one JSONL log. Appended to by the log writer thread; read from any."""
+
+    def __init__(self, log_path: str):
+        self.log_path = log_path
+        self.path = log_path + ".idx"
+        self.keys_path = self.path + ".keys"
+        self.heads_path = self.path + ".heads"
+        self._lock = threading.Lock()
+        self.keys = []  # Conversation number -> key
+        self.numbers = {}  # Key -> conversation number
+        self.heads = {}  # Conversation number -> newest entry number
+        self.count = 0
+        self.end = 0  # Log offset up to which lines are indexed
+        self._open()
+
+    def _open(self):
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path) as f:
+                self.keys = f.read().splitlines()
+        self.numbers = {key: number for number, key in enumerate(self.keys)}
+
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.count = size // ENTRY.size
+        if self.count:
+            offset, length, *_ = self._read_entries(self.count - 1, self.count)[0]
+            self.end = offset + length
+        exists = os.path.exists(self.log_path)
+        log_size = os.path.getsize(self.log_path) if exists else 0
+        if self.end > log_size or len(self.keys) < self._max_number() + 1:
+            # The log was replaced or truncated; start over
+            self._reset()
+
+        start = 0
+        try:
+            with open(self.heads_path) as f:
+                saved = json.load(f)
+            if saved["count"] <= self.count:
+                start = saved["count"]
+                self.heads = {
+                    int(number): entry for number, entry in saved["heads"].items()
+                }
+        except (OSError, ValueError, KeyError):
+            pass
+        for number, entry in enumerate(self._read_entries(start, self.count), start):
+            self.heads[entry[3]] = number
+
+        # Kept open for appends until close()
+        self._index_fp = open(self.path, "ab")  # noqa: SIM115
+        self._keys_fp = open(self.keys_path, "a")  # noqa: SIM115
+        # Make up for lines logged without the index
+        self.catch_up()
+
+    def _max_number(self) -> int:
+        if not self.count:
+            return -1
+        return self._read_entries(self.count - 1, self.count)[0][3]
+
+    def _reset(self):
+        for path in (self.path, self.keys_path, self.heads_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.keys, self.numbers, self.heads = [], {}, {}
+        self.count = self.end = 0
+
+    def _read_entries(self, start: int, stop: int) -> list:
+        if stop <= start:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(start * ENTRY.size)
+            return list(ENTRY.iter_unpack(f.read((stop - start) * ENTRY.size)))
+
+    def catch_up(self):
+        """Index complete lines in the log past the indexed end."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self.end)
+            offset = self.end
+            lines = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = {}
+                lines.append((offset, len(line), entry))
+                offset += len(line)
+        self.add(lines)
+
+    def add(self, lines: list):
+        """Index `(offset, length, log entry)` of lines appended to the log."""
+        if not lines:
+            return
+        packed = []
+        with self._lock:
+            count = self.count
+            for offset, length, entry in lines:
+                key = log_key(entry)
+                number = self.numbers.get(key)
+                if number is None:
+                    number = self.numbers[key] = len(self.keys)
+                    self.keys.append(key)
+                    self._keys_fp.write(key + "\n")
+                timestamp = entry.get("timestamp") or 0
+                previous = self.heads.get(number, -1)
+                packed.append(ENTRY.pack(offset, length, timestamp, number, previous))
+                self.heads[number] = count
+                count += 1
+            self._keys_fp.flush()
+            self._index_fp.write(b"".join(packed))
+            self._index_fp.flush()
+            self.count = count
+            self.end = offset + length
+
+    def find(self, msg_type: str, ident) -> list:
+        """Conversation numbers for a channel index, or for a (full) public key."""
+        if msg_type == "CHAN":
+            number = self.numbers.get(f"CHAN:{ident}")
+            return [] if number is None else [number]
+        return [
+            number
+            for key, number in self.numbers.items()
+            if key.startswith("PRIV:") and key[5:] and ident.startswith(key[5:])
+        ]
+
+    def newest(self, numbers: list, limit: int, before: int = None) -> list:
+        """Return up to `limit` newest log entries of conversations, oldest first.
+
+        Only entries numbered below `before` (e.g. the count when the app
+        started) are returned.
+        """
+        with self._lock:
+            count = self.count
+            chains = [self.heads.get(number, -1) for number in numbers]
+        if not count:
+            return []
+        before = count if before is None else before
+
+        found = []
+        with open(self.path, "rb") as f:
+            index = mmap.mmap(f.fileno(), count * ENTRY.size, access=mmap.ACCESS_READ)
+        try:
+            for entry_number in chains:
+                # Skip entries added after `before`
+                while entry_number >= before:
+                    entry = ENTRY.unpack_from(index, entry_number * ENTRY.size)
+                    entry_number = entry[4]
+                taken = 0
+                while entry_number >= 0 and taken < limit:
+                    offset, length, timestamp, _, previous = ENTRY.unpack_from(
+                        index, entry_number * ENTRY.size
+                    )
+                    found.append((timestamp, offset, length))
+                    taken += 1
+                    entry_number = previous
+        finally:
+            index.close()
+
+        found = sorted(found)[-limit:]
+        if not found:
+            return []
+        entries = []
+        with open(self.log_path, "rb") as f:
+            log = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for _, offset, length in found:
+                    with suppress(ValueError):
+                        entries.append(json.loads(log[offset : offset + length]))
+            finally:
+                log.close()
+        return entries
+
+    def close(self):
+        with self._lock:
+            self._index_fp.close()
+            self._keys_fp.close()
+            heads = {"count": self.count, "heads": self.heads}
+        tmp = self.heads_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(heads, f)
+        os.replace(tmp, self.heads_path)
@@ -0,0 +1,259 @@
+"""Message logging to JSONL (`--log`) and SQLite (`--logdb`).
+
+Entries are formatted on the event loop and written by a background thread
+that keeps the file and database connection open and commits in batches, so
+a slow SD card never stalls the UI. The JSONL log is indexed as it is
+written (see logindex), so history can be read back from it. The same
+thread writes monthly partitions of the database, compacts `raw_json`
+(see logcompact) and applies retention.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+from .logcompact import compact_entry
+from .logdb import enable_wal, init_msgs_db, partition_path
+from .logindex import LogIndex
+from .metrics import REGISTRY
+
+# Maximum entries written per batch (and per DB transaction)
+LOG_BATCH_SIZE = 256
+
+QUEUE_DEPTH = REGISTRY.gauge("meshrc_log_queue_depth", "Entries waiting to be logged")
+LOGGED = REGISTRY.counter("meshrc_log_entries_total", "Entries written to log sinks")
+LOG_ERRORS = REGISTRY.counter("meshrc_log_errors_total", "Failed log writes")
+JSONL_WRITE_TIME = REGISTRY.histogram(
+    "meshrc_log_write_seconds", "Time to write a batch", sink="jsonl"
+)
+DB_COMMIT_TIME = REGISTRY.histogram(
+    "meshrc_log_write_seconds", "Time to write a batch", sink="sqlite"
+)
+
+
+def format_log_entry(msg_data: dict) -> dict:
+    """Turn a received message into a meshcore-cli compatible log entry."""
+    # Create a copy to modify for logging without affecting app logic
+    log_entry = msg_data.copy()
+
+    # Ensure timestamp exists
+    if "timestamp" not in log_entry:
+        log_entry["timestamp"] = int(time.time())
+
+    # Emulate meshcore-cli logic for 'name' and 'sender'
+    # meshcore-cli adds 'name' and 'sender' based on contact/channel info
+    if "name" not in log_entry:
+        if "channel_name" in log_entry:
+            log_entry["name"] = log_entry["channel_name"]
+            log_entry["sender"] = log_entry["channel_name"]
+        elif "sender_name" in log_entry:
+            log_entry["name"] = log_entry["sender_name"]
+            log_entry["sender"] = log_entry["sender_name"]
+        # Fallbacks if my enrichment failed or differed
+        elif log_entry.get("type") == "CHAN":
+            log_entry["sender"] = f"channel {log_entry.get('channel_idx')}"
+            log_entry["name"] = log_entry["sender"]
+        elif log_entry.get("type") == "PRIV":
+            # pubkey prefix usually
+            prefix = log_entry.get("pubkey_prefix", "unknown")
+            log_entry["sender"] = prefix
+            log_entry["name"] = prefix
+
+    # Remove internal keys to match meshcore-cli format more closely
+    for key in ["context_type", "sender_name", "channel_name"]:
+        if key in log_entry:
+            del log_entry[key]
+
+    return log_entry
+
+
+def db_row(log_entry: dict, compact: bool = False) -> tuple:
+    # Schema: timestamp, sender, name, text, type, channel_idx, pubkey_prefix, raw_json
+    raw_json = compact_entry(log_entry) if compact else None
+    return (
+        log_entry.get("timestamp"),
+        log_entry.get("sender"),
+        log_entry.get("name"),
+        log_entry.get("text"),
+        log_entry.get("type"),
+        log_entry.get("channel_idx"),
+        log_entry.get("pubkey_prefix"),
+        raw_json or json.dumps(log_entry),
+    )
+
+
+class LogSink:
+    """Queues log entries and writes them from a background thread."""
+
+    def __init__(
+        self,
+        log_file: str = None,
+        log_db: str = None,
+        on_error=None,
+        partitioned: bool = False,
+        retention=None,
+        compact: bool = False,
+    ):
+        self.log_file = log_file
+        self.log_db = log_db
+        self.partitioned = partitioned  # Write messages to monthly files
+        self.partitions = {}  # Key: partition path, Value: open connection
+        self.retention = retention  # Retention, applied between writes
+        self.compact = compact  # Store raw_json compacted
+        self.on_error = on_error  # Called (from the writer thread) with a message
+        self.queue = queue.Queue()
+        self.index = None  # LogIndex of the JSONL log, once index_ready is set
+        self.index_ready = threading.Event()
+        self.indexed_before = 0  # Index entries logged before this session
+        self._thread = threading.Thread(
+            target=self._run, name="meshrc-log", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, log_entry: dict):
+        self.queue.put(log_entry)
+        QUEUE_DEPTH.set(self.queue.qsize())
+
+    def flush(self):
+        """Block until everything submitted so far has been written."""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _open_index(self):
+        try:
+            self.index = LogIndex(self.log_file)
+            self.indexed_before = self.index.count
+        except Exception as e:
+            self._error(f"Log index unavailable: {e}")
+        finally:
+            self.index_ready.set()
+
+    def _run(self):
+        if self.log_file:
+            self._open_index()
+        else:
+            self.index_ready.set()
+        conn = sqlite3.connect(self.log_db) if self.log_db else None
+        try:
+            with (
+                open(self.log_file, "ab") if self.log_file else nullcontext()
+            ) as log_fp:
+                if conn:
+                    # Readers (ReaderPool) then never wait for our commits
+                    enable_wal(conn)
+                while True:
+                    if conn and self.retention and self.retention.due():
+                        self._prune(conn)
+                    try:
+                        batch = [self.queue.get(timeout=self._idle_timeout(conn))]
+                    except queue.Empty:
+                        continue
+                    # Drain whatever else is already waiting into the same batch
+                    while len(batch) < LOG_BATCH_SIZE:
+                        try:
+                            batch.append(self.queue.get_nowait())
+                        except queue.Empty:
+                            break
+
+                    entries = [entry for entry in batch if entry is not None]
+                    if entries:
+                        self._write(entries, log_fp, conn)
+                    for _ in batch:
+                        self.queue.task_done()
+                    QUEUE_DEPTH.set(self.queue.qsize())
+                    if len(entries) < len(batch):
+                        return
+        finally:
+            if self.index:
+                self.index.close()
+            for partition in self.partitions.values():
+                partition.close()
+            if conn:
+                conn.close()
+
+    def _write(self, entries: list[dict], log_fp, conn):
+        # Write to JSON File
+        if log_fp:
+            try:
+                with JSONL_WRITE_TIME.time():
+                    lines = [(json.dumps(e) + "\n").encode() for e in entries]
+                    offset = log_fp.tell()
+                    log_fp.write(b"".join(lines))
+                    log_fp.flush()
+            except Exception as e:
+                self._error(f"Logging failed: {e}")
+            else:
+                self._index_lines(offset, lines, entries)
+
+        # Write to SQLite DB
+        if conn:
+            try:
+                with DB_COMMIT_TIME.time():
+                    self._write_log_db(conn, entries)
+            except Exception as e:
+                self._error(f"DB Logging failed: {e}")
+
+        LOGGED.inc(len(entries))
+
+    def _index_lines(self, offset: int, lines: list[bytes], entries: list[dict]):
+        if not self.index:
+            return
+        indexed = []
+        for line, entry in zip(lines, entries, strict=True):
+            indexed.append((offset, len(line), entry))
+            offset += len(line)
+        try:
+            self.index.add(indexed)
+        except Exception as e:
+            self._error(f"Log indexing failed: {e}")
+            self.index = None
+
+    def _idle_timeout(self, conn):
+        if not (conn and self.retention):
+            return None
+        return max(self.retention.next_prune - time.monotonic(), 0.01)
+
+    def _prune(self, conn):
+        try:
+            partitions = self.partitions if self.partitioned else None
+            self.retention.prune(conn, self.log_db, partitions)
+        except Exception as e:
+            self._error(f"Log pruning failed: {e}")
+
+    def _partition(self, path: str):
+        conn = self.partitions.get(path)
+        if conn is None:
+            conn = self.partitions[path] = sqlite3.connect(path)
+            init_msgs_db(conn)
+        return conn
+
+    def _write_log_db(self, conn, entries: list[dict]):
+        if self.partitioned:
+            by_month = {}
+            for entry in entries:
+                timestamp = entry.get("timestamp") or time.time()
+                path = partition_path(self.log_db, timestamp)
+                by_month.setdefault(path, []).append(entry)
+            for path, month_entries in by_month.items():
+                self._insert(self._partition(path), month_entries)
+        else:
+            self._insert(conn, entries)
+
+    def _insert(self, conn, entries: list[dict]):
+        with conn:
+            conn.executemany(
+                "INSERT INTO msgs (timestamp, sender, name, text, type, channel_idx, "
+                "pubkey_prefix, raw_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [db_row(entry, self.compact) for entry in entries],
+            )
+
+    def _error(self, message: str):
+        LOG_ERRORS.inc()
+        if self.on_error:
+            self.on_error(message)
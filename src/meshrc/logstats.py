@@ -0,0 +1,290 @@
+"""Offline statistics over message logs: `meshrc stats LOG...`.
+
+Reads JSONL logs (`--log`), SQLite logs (`--logdb`) and archives. Inputs
+are split into shards (byte ranges of JSONL files, rowid ranges of `msgs`,
+row ranges of archives, which are read without touching texts) that a
+process pool reads in parallel, streaming the records; each worker returns
+small partial counts that are merged at the end. Reports message rates per
+channel and sender, activity per hour of the day and the top talkers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .archive import Archive, is_archive
+from .logdb import db_uri
+from .record import split_sender
+
+# Bytes of JSONL (roughly) per shard
+JSONL_SHARD_SIZE = 32 * 2**20
+# msgs rows per shard
+DB_SHARD_ROWS = 200_000
+
+# Timestamps beyond this (2106) are not plausible, and overflow localtime()
+MAX_TIMESTAMP = 2**32
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+class Totals:
+    """Counts from part of the logs; merged across shards."""
+
+    def __init__(self):
+        self.messages = 0
+        self.channels = Counter()
+        self.senders = Counter()
+        self.hours = [0] * 24
+        self.spans = {}  # Key: channel or sender label, Value: [first, last] timestamp
+        self.skipped = 0
+        self._offsets = {}  # Key: day, Value: local UTC offset (seconds)
+
+    def add(self, timestamp, msg_type, channel_idx, name, text):
+        # SQLite keeps whatever was stored, e.g. a timestamp of 'abc' as TEXT
+        if type(timestamp) not in (int, float) or not 0 < timestamp < MAX_TIMESTAMP:
+            self.skipped += 1
+            return
+        if msg_type == "CHAN":
+            sender, _ = split_sender(text or "")
+        else:
+            sender = name
+        self.count(timestamp, msg_type, channel_idx, name, sender)
+
+    def count(self, timestamp, msg_type, channel_idx, name, sender):
+        """Count a message whose sender is already known."""
+        channel = (name or f"channel {channel_idx}") if msg_type == "CHAN" else "direct"
+        sender = sender or "?"
+
+        self.messages += 1
+        self.channels[channel] += 1
+        self.senders[sender] += 1
+
+        day = timestamp // 86400
+        offset = self._offsets.get(day)
+        if offset is None:
+            offset = self._offsets[day] = time.localtime(timestamp).tm_gmtoff
+        self.hours[int((timestamp + offset) // 3600 % 24)] += 1
+
+        for key in (("channel", channel), ("sender", sender)):
+            span = self.spans.get(key)
+            if span is None:
+                self.spans[key] = [timestamp, timestamp]
+            elif timestamp < span[0]:
+                span[0] = timestamp
+            elif timestamp > span[1]:
+                span[1] = timestamp
+
+    def merge(self, other: Totals):
+        self.messages += other.messages
+        self.channels.update(other.channels)
+        self.senders.update(other.senders)
+        self.hours = [a + b for a, b in zip(self.hours, other.hours, strict=True)]
+        self.skipped += other.skipped
+        for key, (first, last) in other.spans.items():
+            span = self.spans.setdefault(key, [first, last])
+            span[0] = min(span[0], first)
+            span[1] = max(span[1], last)
+
+    def __getstate__(self):
+        # The offset cache is per process
+        state = dict(self.__dict__)
+        state["_offsets"] = {}
+        return state
+
+    def rate(self, kind: str, label: str) -> float:
+        """Messages per hour over the time the channel or sender was heard."""
+        first, last = self.spans[(kind, label)]
+        count = self.channels[label] if kind == "channel" else self.senders[label]
+        return count / max((last - first) / 3600, 1)
+
+
+# Shards: ("jsonl", path, start, end), ("db", path, first rowid, last rowid)
+# or ("archive", path, first row, row after the last)
+
+
+def is_sqlite(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+def plan_shards(paths: list) -> list:
+    shards = []
+    for path in paths:
+        if is_archive(path):
+            with Archive(path) as archive:
+                rows = len(archive)
+            for start in range(0, rows, DB_SHARD_ROWS):
+                stop = min(start + DB_SHARD_ROWS, rows)
+                shards.append(("archive", path, start, stop))
+        elif is_sqlite(path):
+            with sqlite3.connect(db_uri(path), uri=True) as conn:
+                low, high = conn.execute(
+                    "SELECT MIN(rowid), MAX(rowid) FROM msgs"
+                ).fetchone()
+            if low is None:
+                continue
+            for start in range(low, high + 1, DB_SHARD_ROWS):
+                shards.append(("db", path, start, min(start + DB_SHARD_ROWS - 1, high)))
+        else:
+            size = os.path.getsize(path)
+            for start in range(0, size, JSONL_SHARD_SIZE):
+                stop = min(start + JSONL_SHARD_SIZE, size)
+                shards.append(("jsonl", path, start, stop))
+    return shards
+
+
+def read_shard(shard: tuple) -> Totals:
+    kind, path, start, end = shard
+    totals = Totals()
+    if kind == "db":
+        with sqlite3.connect(db_uri(path), uri=True) as conn:
+            rows = conn.execute(
+                "SELECT timestamp, type, channel_idx, name, text FROM msgs "
+                "WHERE rowid BETWEEN ? AND ?",
+                (start, end),
+            )
+            for row in rows:
+                totals.add(*row)
+        return totals
+    if kind == "archive":
+        with Archive(path) as archive:
+            columns = [
+                archive.values(column, start, end)
+                for column in ("timestamp", "type", "channel_idx", "name", "author")
+            ]
+        for row in zip(*columns, strict=True):
+            totals.count(*row)
+        return totals
+
+    with open(path, "rb") as f:
+        if start:
+            # A line belongs to the shard it starts in
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        loads = json.loads
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            try:
+                entry = loads(line)
+            except ValueError:
+                totals.skipped += 1
+                continue
+            if not isinstance(entry, dict):
+                totals.skipped += 1
+                continue
+            totals.add(
+                entry.get("timestamp"),
+                entry.get("type"),
+                entry.get("channel_idx"),
+                entry.get("name"),
+                entry.get("text"),
+            )
+    return totals
+
+
+def analyze(paths: list, workers: int = None) -> Totals:
+    shards = plan_shards(paths)
+    totals = Totals()
+    if len(shards) <= 1 or workers == 1:
+        for shard in shards:
+            totals.merge(read_shard(shard))
+        return totals
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(read_shard, shard) for shard in shards]
+        for future in as_completed(futures):
+            totals.merge(future.result())
+    return totals
+
+
+def _date(timestamp) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+
+def report(totals: Totals, top: int = 10) -> str:
+    if not totals.messages:
+        return "No messages found."
+    first = min(span[0] for span in totals.spans.values())
+    last = max(span[1] for span in totals.spans.values())
+    lines = [f"{totals.messages} messages, {_date(first)} to {_date(last)}"]
+    if totals.skipped:
+        lines.append(f"{totals.skipped} unreadable entries skipped")
+
+    for title, kind, counter in (
+        ("Channels", "channel", totals.channels),
+        ("Top talkers", "sender", totals.senders),
+    ):
+        lines += ["", f"{title}:", f"  {'messages':>9}  {'per hour':>8}  name"]
+        for label, count in counter.most_common(top):
+            lines.append(f"  {count:>9}  {totals.rate(kind, label):>8.1f}  {label}")
+
+    lines += ["", "Activity by hour:"]
+    peak = max(totals.hours) or 1
+    for hour, count in enumerate(totals.hours):
+        lines.append(f"  {hour:02d}:00 {count:>9}  {'#' * round(40 * count / peak)}")
+    return "\n".join(lines)
+
+
+def to_dict(totals: Totals, top: int = 10) -> dict:
+    return {
+        "messages": totals.messages,
+        "skipped": totals.skipped,
+        "channels": [
+            {
+                "name": label,
+                "messages": count,
+                "per_hour": totals.rate("channel", label),
+            }
+            for label, count in totals.channels.most_common()
+        ],
+        "top_talkers": [
+            {"name": label, "messages": count, "per_hour": totals.rate("sender", label)}
+            for label, count in totals.senders.most_common(top)
+        ],
+        "hours": totals.hours,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="meshrc stats", description="Message statistics from meshrc logs"
+    )
+    parser.add_argument(
+        "logs", nargs="+", help="JSONL (--log) or SQLite (--logdb) logs, or archives"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of top talkers shown"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print JSON instead of a report"
+    )
+    args = parser.parse_args(argv)
+
+    for path in args.logs:
+        if not os.path.isfile(path):
+            parser.error(f"No such log: {path}")
+
+    started = time.perf_counter()
+    try:
+        totals = analyze(args.logs, args.workers)
+    except sqlite3.Error as e:
+        print(f"Cannot read log database: {e}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(to_dict(totals, args.top), indent=2))
+    else:
+        print(report(totals, args.top))
+        print(f"\n({time.perf_counter() - started:.1f}s)")
+    return 0
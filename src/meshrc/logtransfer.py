@@ -0,0 +1,345 @@
+"""Bulk copying between JSONL logs and the SQLite log: `meshrc import|export`.
+
+Import streams JSONL (meshcore-cli's format, which `--log` writes too)
+into an unindexed staging table in large transactions, so memory use stays
+flat however big the input. Duplicates, within the input and against rows
+already in the database, are then removed with two set-based deletes, and
+the remaining rows are copied into `msgs` in one pass. When the import is
+large compared to the existing log, the `msgs_context` index is dropped for
+the copy and rebuilt at the end, which is much cheaper than maintaining it
+row by row.
+
+Export streams `msgs` rows (or an archive's) back out as JSONL, rebuilding
+compacted `raw_json` (see logcompact). Both take the same filters.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+from .archive import Archive, is_archive
+from .logcompact import compact_line, load_entry, raw_json_text
+from .logdb import CREATE_MSGS_INDEX_SQL, db_uri, init_msgs_db
+from .record import split_sender
+
+# Rows inserted per executemany (and per transaction)
+IMPORT_BATCH = 50_000
+# Rebuild the index instead of updating it when importing more than this
+# fraction of the rows already logged
+REINDEX_FRACTION = 0.25
+
+STAGING_SQL = """
+CREATE TEMP TABLE import_rows (
+    timestamp INTEGER,
+    sender TEXT,
+    name TEXT,
+    text TEXT,
+    type TEXT,
+    channel_idx INTEGER,
+    pubkey_prefix TEXT,
+    raw_json TEXT
+)
+"""
+
+# What makes two log rows the same message
+DEDUP_COLUMNS = "timestamp, type, channel_idx, pubkey_prefix, text"
+
+
+def parse_time(value: str) -> float:
+    """Parse epoch seconds or an ISO date/time (local time)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value}") from None
+
+
+class RecordFilter:
+    """Selects log entries by time range, channel and sender."""
+
+    def __init__(self, since=None, until=None, channels=(), senders=()):
+        self.since = since
+        self.until = until
+        self.channel_idxs = {int(c) for c in channels if str(c).isdigit()}
+        self.channel_names = {c for c in channels if not str(c).isdigit()}
+        self.senders = tuple(s.lower() for s in senders)
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            self.since is not None
+            or self.until is not None
+            or self.channel_idxs
+            or self.channel_names
+            or self.senders
+        )
+
+    def __call__(self, entry: dict) -> bool:
+        timestamp = entry.get("timestamp") or 0
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp >= self.until:
+            return False
+        is_channel = entry.get("type") == "CHAN"
+        if self.channel_idxs or self.channel_names:
+            if not is_channel:
+                return False
+            if (
+                entry.get("channel_idx") not in self.channel_idxs
+                and entry.get("name") not in self.channel_names
+            ):
+                return False
+        if self.senders:
+            if is_channel:
+                sender, _ = split_sender(entry.get("text") or "")
+            else:
+                sender = entry.get("name")
+            if not (sender or "").lower().startswith(self.senders):
+                return False
+        return True
+
+
+def _open_input(path: str):
+    if path == "-":
+        return sys.stdin.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_jsonl(paths: list, keep, stats: dict, compact: bool = False):
+    """Yield msgs rows for the entries in JSONL files that `keep` selects."""
+    loads = json.loads
+    for path in paths:
+        f = _open_input(path)
+        try:
+            for line in f:
+                stats["read"] += 1
+                try:
+                    entry = loads(line)
+                    if not isinstance(entry, dict):
+                        raise TypeError("not a JSON object")
+                    if not entry.get("timestamp"):
+                        entry["timestamp"] = entry["sender_timestamp"]
+                except (ValueError, KeyError, TypeError):
+                    stats["skipped"] += 1
+                    continue
+                if not keep(entry):
+                    stats["filtered"] += 1
+                    continue
+                # The original line; keeps the entry exactly as logged
+                raw_json = line.decode().rstrip("\n")
+                if compact:
+                    raw_json = compact_line(entry, raw_json)
+                yield (
+                    entry["timestamp"],
+                    entry.get("sender"),
+                    entry.get("name"),
+                    entry.get("text"),
+                    entry.get("type"),
+                    entry.get("channel_idx"),
+                    entry.get("pubkey_prefix"),
+                    raw_json,
+                )
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_jsonl(log_db: str, paths: list, keep=None, compact: bool = False) -> dict:
+    stats = {"read": 0, "skipped": 0, "filtered": 0, "duplicates": 0, "imported": 0}
+    conn = sqlite3.connect(log_db, isolation_level=None)
+    try:
+        init_msgs_db(conn)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=FILE")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute(STAGING_SQL)
+
+        rows = read_jsonl(paths, keep or (lambda entry: True), stats, compact)
+        for batch in _batches(rows, IMPORT_BATCH):
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO import_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch
+            )
+            conn.execute("COMMIT")
+
+        (staged,) = conn.execute("SELECT COUNT(*) FROM import_rows").fetchone()
+        (existing,) = conn.execute("SELECT COUNT(*) FROM msgs").fetchone()
+
+        conn.execute("BEGIN")
+        conn.execute(f"CREATE INDEX temp.import_key ON import_rows ({DEDUP_COLUMNS})")
+        # Repeated within the input (e.g. overlapping files)
+        conn.execute(
+            "DELETE FROM import_rows WHERE rowid NOT IN "
+            f"(SELECT MIN(rowid) FROM import_rows GROUP BY {DEDUP_COLUMNS})"
+        )
+        if existing:
+            # Already logged; probes the msgs_context index
+            conn.execute(
+                "DELETE FROM import_rows WHERE EXISTS (SELECT 1 FROM main.msgs m "
+                "WHERE m.type IS import_rows.type "
+                "AND m.channel_idx IS import_rows.channel_idx "
+                "AND m.pubkey_prefix IS import_rows.pubkey_prefix "
+                "AND m.timestamp = import_rows.timestamp "
+                "AND m.text IS import_rows.text)"
+            )
+        (remaining,) = conn.execute("SELECT COUNT(*) FROM import_rows").fetchone()
+
+        reindex = remaining > existing * REINDEX_FRACTION
+        if reindex:
+            conn.execute("DROP INDEX IF EXISTS msgs_context")
+        conn.execute(
+            "INSERT INTO main.msgs (timestamp, sender, name, text, type, channel_idx, "
+            "pubkey_prefix, raw_json) SELECT timestamp, sender, name, text, type, "
+            "channel_idx, pubkey_prefix, raw_json FROM import_rows ORDER BY timestamp"
+        )
+        if reindex:
+            conn.execute(CREATE_MSGS_INDEX_SQL)
+        conn.execute("COMMIT")
+
+        stats["duplicates"] = staged - remaining
+        stats["imported"] = remaining
+    finally:
+        conn.close()
+    return stats
+
+
+def export_jsonl(log_dbs: list, out, keep: RecordFilter) -> dict:
+    stats = {"exported": 0, "filtered": 0}
+    sql = (
+        "SELECT timestamp, sender, name, text, type, channel_idx, pubkey_prefix, "
+        "raw_json FROM msgs"
+    )
+    params = []
+    # Narrow by time in SQL; the rest of the filter needs the entry
+    if keep.since is not None:
+        sql += " WHERE timestamp >= ?"
+        params.append(keep.since)
+    if keep.until is not None:
+        sql += " AND timestamp < ?" if params else " WHERE timestamp < ?"
+        params.append(keep.until)
+    sql += " ORDER BY rowid"
+
+    for log_db in log_dbs:
+        if is_archive(log_db):
+            with Archive(log_db) as archive:
+                rows = archive.msgs_rows(*archive.range(keep.since, keep.until))
+                _export_rows(rows, out, keep, stats)
+            continue
+        conn = sqlite3.connect(db_uri(log_db), uri=True)
+        try:
+            _export_rows(conn.execute(sql, params), out, keep, stats)
+        finally:
+            conn.close()
+    return stats
+
+
+def _export_rows(rows, out, keep: RecordFilter, stats: dict):
+    for row in rows:
+        if keep.active and not keep(load_entry(row)):
+            stats["filtered"] += 1
+            continue
+        out.write(raw_json_text(row) + "\n")
+        stats["exported"] += 1
+
+
+def _add_filter_args(parser):
+    parser.add_argument(
+        "--since", type=parse_time, help="Only messages from this time on"
+    )
+    parser.add_argument(
+        "--until", type=parse_time, help="Only messages before this time"
+    )
+    parser.add_argument(
+        "--channel",
+        action="append",
+        default=[],
+        help="Only this channel (index or name; repeatable)",
+    )
+    parser.add_argument(
+        "--sender",
+        action="append",
+        default=[],
+        help="Only senders with this name prefix (repeatable)",
+    )
+
+
+def _filter(args) -> RecordFilter:
+    return RecordFilter(args.since, args.until, args.channel, args.sender)
+
+
+def main(command: str, argv=None) -> int:
+    if command == "import":
+        parser = argparse.ArgumentParser(
+            prog="meshrc import", description="Load JSONL logs into a log database"
+        )
+        parser.add_argument("logdb", help="Log database (created if missing)")
+        parser.add_argument("logs", nargs="+", help="JSONL logs (.gz ok, - for stdin)")
+        parser.add_argument(
+            "--compact",
+            action="store_true",
+            help="Store raw_json compacted (as --logdb-compact)",
+        )
+    else:
+        parser = argparse.ArgumentParser(
+            prog="meshrc export", description="Write a log database out as JSONL"
+        )
+        parser.add_argument(
+            "logdbs",
+            nargs="+",
+            help="Log databases (or monthly partitions, or archives)",
+        )
+        parser.add_argument("-o", "--output", help="Output file (default stdout)")
+    _add_filter_args(parser)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        if command == "import":
+            for path in args.logs:
+                if path != "-" and not os.path.isfile(path):
+                    parser.error(f"No such log: {path}")
+            keep = _filter(args)
+            stats = import_jsonl(
+                args.logdb, args.logs, keep if keep.active else None, args.compact
+            )
+        else:
+            for path in args.logdbs:
+                if not os.path.isfile(path):
+                    parser.error(f"No such database: {path}")
+            with (
+                open(args.output, "w") if args.output else nullcontext(sys.stdout)
+            ) as out:
+                stats = export_jsonl(args.logdbs, out, _filter(args))
+    except sqlite3.Error as e:
+        print(f"Database error: {e}", file=sys.stderr)
+        return 1
+
+    summary = ", ".join(
+        f"{count} {name}"
+        for name, count in stats.items()
+        if count or name in ("imported", "exported")
+    )
+    print(f"{summary} ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    return 0
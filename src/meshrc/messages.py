@@ -4,10 +4,10 @@ from textual.message import Message
 
 
 class NewMessage(Message):
-    """Emitted when a new message is received."""
+    """Emitted when a new message is received, as a normalized MessageRecord."""
 
-    def __init__(self, message_data: dict[str, Any]) -> None:
-        self.message_data = message_data
+    def __init__(self, record) -> None:
+        self.record = record
         super().__init__()
 
 
@@ -34,3 +34,35 @@ class ConnectionStatus(Message):
         self.status = status
         self.connected = connected
         super().__init__()
+
+
+class MessageDelivery(Message):
+    """Emitted when an outgoing message is acked or its ack times out."""
+
+    def __init__(
+        self, ack: str, context_id: str, status: str, rtt: float | None = None
+    ) -> None:
+        self.ack = ack
+        self.context_id = context_id
+        self.status = status  # 'delivered' or 'failed'
+        self.rtt = rtt
+        super().__init__()
+
+
+class SyncProgress(Message):
+    """Emitted periodically while pending messages are drained from the device."""
+
+    def __init__(self, count: int, done: bool = False) -> None:
+        self.count = count
+        self.done = done
+        super().__init__()
+
+
+class LinkHealth(Message):
+    """Emitted by the heartbeat with each probe's round trip and link state change."""
+
+    def __init__(self, state: str, rtt: float | None, changed: bool) -> None:
+        self.state = state  # 'ok', 'slow', 'stalled', 'lost' or 'down'
+        self.rtt = rtt  # Seconds, of the last probe answered
+        self.changed = changed
+        super().__init__()
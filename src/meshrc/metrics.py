@@ -0,0 +1,217 @@
+"""Lightweight in-process metrics: counters, gauges, rates and histograms.
+
+Metrics live in the module-level `REGISTRY` and are cheap enough to update on
+every event. A snapshot can be rendered as Prometheus text or JSON.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, math.inf,
+)
+# Window (seconds) over which rates are averaged
+RATE_WINDOW = 10
+
+
+def _label_str(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Rate:
+    """Events per second over the last RATE_WINDOW seconds, in 1s buckets."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.buckets = [0] * (RATE_WINDOW + 1)
+        self.second = int(time.monotonic())
+
+    def _advance(self, now: int):
+        # Zero the buckets for the seconds that passed without events
+        last = min(now, self.second + len(self.buckets))
+        for second in range(self.second + 1, last + 1):
+            self.buckets[second % len(self.buckets)] = 0
+        self.second = max(self.second, now)
+
+    def mark(self, count: int = 1):
+        now = int(time.monotonic())
+        if now != self.second:
+            self._advance(now)
+        self.buckets[now % len(self.buckets)] += count
+
+    @property
+    def value(self) -> float:
+        now = int(time.monotonic())
+        if now != self.second:
+            self._advance(now)
+        # Exclude the current, partial second
+        return (sum(self.buckets) - self.buckets[now % len(self.buckets)]) / RATE_WINDOW
+
+    def samples(self):
+        yield self.name, self.labels, self.value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, labels: dict, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.bounds = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts, strict=True):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts, strict=True):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            yield f"{self.name}_bucket", {**self.labels, "le": le}, cumulative
+        yield f"{self.name}_sum", self.labels, self.sum
+        yield f"{self.name}_count", self.labels, self.count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # Key: (name, sorted label items), Value: metric
+        self.help = {}  # Key: name, Value: help text
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.setdefault(key, cls(name, labels))
+                self.help.setdefault(name, help)
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = "", **labels) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def rate(self, name: str, help: str = "", **labels) -> Rate:
+        return self._get(Rate, name, help, labels)
+
+    def histogram(self, name: str, help: str = "", **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        seen = set()
+        for metric in sorted(self.metrics.values(), key=lambda m: m.name):
+            if metric.name not in seen:
+                seen.add(metric.name)
+                if self.help.get(metric.name):
+                    lines.append(f"# HELP {metric.name} {self.help[metric.name]}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_str(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        result = {}
+        for metric in self.metrics.values():
+            entry = {"labels": metric.labels}
+            if isinstance(metric, Histogram):
+                entry.update(
+                    count=metric.count,
+                    sum=metric.sum,
+                    max=metric.max,
+                    p50=metric.quantile(0.5),
+                    p95=metric.quantile(0.95),
+                    p99=metric.quantile(0.99),
+                )
+            else:
+                entry["value"] = metric.value
+            result.setdefault(metric.name, []).append(entry)
+        return result
+
+    def export(self, path: str):
+        """Write a snapshot atomically; Prometheus text for .prom/.txt, else JSON."""
+        if path.endswith((".prom", ".txt")):
+            data = self.to_prometheus()
+        else:
+            data = json.dumps({"timestamp": time.time(), "metrics": self.to_dict()})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
@@ -0,0 +1,17 @@
+"""Where meshrc keeps its own files between runs."""
+
+import os
+
+
+def config_dir() -> str:
+    """Return (and create) the meshrc config directory."""
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    path = os.path.join(base, "meshrc")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def config_path(name: str) -> str:
+    return os.path.join(config_dir(), name)
@@ -0,0 +1,172 @@
+"""Profiling (`--profile`) and event-loop stall detection (`--watchdog`)."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+
+from .metrics import REGISTRY
+
+STALLS = REGISTRY.counter(
+    "meshrc_loop_stalls_total", "Event loop stalls over threshold"
+)
+STALL_TIME = REGISTRY.histogram("meshrc_loop_stall_seconds", "Duration of loop stalls")
+
+# Default sampling interval for --profile-mode sample
+SAMPLE_INTERVAL = 0.005
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _describe(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _stack(frame) -> list:
+    """Return the frames of a stack, outermost first."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    return frames[::-1]
+
+
+def culprit(frame) -> str:
+    """Describe the innermost meshrc frame of a stack, or the innermost frame."""
+    stack = _stack(frame)
+    for f in reversed(stack):
+        filename = f.f_code.co_filename
+        if filename.startswith(_PACKAGE_DIR) and filename != __file__:
+            return _describe(f)
+    return _describe(stack[-1]) if stack else "?"
+
+
+class SamplingProfiler:
+    """Samples the main thread's stack and writes folded (flamegraph) stacks."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="meshrc-sampler", daemon=True
+        )
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                stack = ";".join(f.f_code.co_qualname for f in _stack(frame))
+                self.samples[stack] += 1
+
+    def dump_stats(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def run_profiled(fn, path: str, mode: str = "cprofile"):
+    """Run `fn()` under a profiler and write the profile to `path` on exit.
+
+    `cprofile` writes pstats data (for `python -m pstats` or snakeviz);
+    `sample` writes folded stacks for flamegraph tools.
+    """
+    profiler = cProfile.Profile() if mode == "cprofile" else SamplingProfiler()
+    profiler.enable()
+    try:
+        return fn()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Collects asyncio's debug-mode slow callback warnings."""
+
+    def __init__(self, watchdog: LoopWatchdog):
+        super().__init__(logging.WARNING)
+        self.watchdog = watchdog
+
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage()
+        if message.startswith("Executing"):
+            self.watchdog.record("slow-callback", message)
+
+
+class LoopWatchdog:
+    """Detects event-loop stalls and records the code responsible.
+
+    asyncio's debug mode reports callbacks slower than the threshold, but in
+    a Textual app those are mostly message pumps. A heartbeat scheduled on the
+    loop is therefore also watched from a thread; when it falls behind, the
+    loop thread's stack is captured while it is still stuck.
+    """
+
+    def __init__(self, threshold: float, log_path: str):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.last_beat = time.monotonic()
+        self.stalled_since = None
+        self._loop = None
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._log_handler = _SlowCallbackHandler(self)
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+        logging.getLogger("asyncio").addHandler(self._log_handler)
+
+        self._beat()
+        threading.Thread(
+            target=self._watch, name="meshrc-watchdog", daemon=True
+        ).start()
+
+    def stop(self):
+        self._stop.set()
+        logging.getLogger("asyncio").removeHandler(self._log_handler)
+
+    def record(self, kind: str, detail: str):
+        line = f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {kind} {detail}\n"
+        with self._lock, open(self.log_path, "a") as f:
+            f.write(line)
+
+    def _beat(self):
+        now = time.monotonic()
+        gap = now - self.last_beat
+        self.last_beat = now
+        if self.stalled_since is not None:
+            self.stalled_since = None
+            STALL_TIME.observe(gap)
+            self.record("stall-end", f"{gap:.3f}s")
+        if not self._stop.is_set():
+            self._loop.call_later(self.threshold / 2, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            lag = time.monotonic() - self.last_beat
+            if lag <= self.threshold or self.stalled_since is not None:
+                continue
+            self.stalled_since = self.last_beat
+            STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            where = culprit(frame) if frame is not None else "?"
+            self.record("stall", f">{lag:.3f}s in {where}")
@@ -0,0 +1,97 @@
+"""Messages as immutable records, normalized once when they are received.
+
+Everything rendering and logging need (the context, the sender parsed out of
+channel text, the display time and the log entry) is worked out at ingest,
+so showing a message again, e.g. when switching contexts, parses nothing.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from .logsink import format_log_entry
+
+# Longest "Sender:" prefix accepted when splitting channel text
+MAX_SENDER_LENGTH = 32
+
+
+@dataclass(frozen=True, slots=True)
+class MessageRecord:
+    context_id: str
+    sender: str | None
+    text: str
+    timestamp: float
+    time_str: str  # Display time, HH:MM
+    outgoing: bool = False
+    status: str | None = None  # Delivery of outgoing direct messages
+    rtt: float | None = None
+    ack: str | None = None
+    log_entry: dict | None = None  # meshcore-cli compatible; not to be modified
+    mentions: tuple = ()  # (start, end) spans of highlight terms in text
+    hidden: bool = False  # Logged only, by a filter rule
+    collapsed: int = 0  # Similar messages hidden before this one by a filter rule
+
+
+def split_sender(text: str):
+    """Split channel text of the form "Sender: message"."""
+    sender, sep, body = text.partition(":")
+    sender = sender.strip()
+    if sep and 0 < len(sender) <= MAX_SENDER_LENGTH:
+        return sender, body.strip()
+    return None, text
+
+
+def display_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%H:%M")
+
+
+def incoming_record(msg: dict, context_id: str) -> MessageRecord:
+    """Normalize a received (and enriched) message payload."""
+    text = msg.get("text", "")
+    timestamp = msg.get("sender_timestamp") or msg.get("timestamp") or time.time()
+    if msg.get("context_type") == "channel":
+        sender, text = split_sender(text)
+    else:
+        sender = msg.get("sender_name")
+    return MessageRecord(
+        context_id=context_id,
+        sender=sender,
+        text=text,
+        timestamp=timestamp,
+        time_str=display_time(timestamp),
+        log_entry=format_log_entry(msg),
+    )
+
+
+def logged_record(entry: dict, context_id: str) -> MessageRecord:
+    """Rebuild a record from a log entry, e.g. when loading history."""
+    text = entry.get("text", "")
+    timestamp = entry.get("sender_timestamp") or entry.get("timestamp") or 0
+    if entry.get("type") == "CHAN":
+        sender, text = split_sender(text)
+    else:
+        sender = entry.get("name")
+    return MessageRecord(
+        context_id=context_id,
+        sender=sender,
+        text=text,
+        timestamp=timestamp,
+        time_str=display_time(timestamp),
+        log_entry=entry,
+    )
+
+
+def outgoing_record(
+    context_id: str, sender: str, text: str, status: str = None, ack: str = None
+) -> MessageRecord:
+    timestamp = time.time()
+    return MessageRecord(
+        context_id=context_id,
+        sender=sender,
+        text=text,
+        timestamp=timestamp,
+        time_str=display_time(timestamp),
+        outgoing=True,
+        status=status,
+        ack=ack,
+    )
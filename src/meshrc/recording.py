@@ -0,0 +1,168 @@
+"""Recording of MeshCore event sessions and a transport that replays them.
+
+A recording is JSON lines (gzip-compressed if the path ends in `.gz`). The
+first line is a header; every following line is one event as
+`[seconds_since_start, event_type, payload, attributes]`, with bytes values
+stored as `{"$b": "<hex>"}`.
+"""
+
+import asyncio
+import gzip
+import json
+import time
+
+from meshcore import EventType
+from meshcore.events import Event
+
+from .simulate import StandInMeshCore
+
+RECORDING_VERSION = 1
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def encode_value(value):
+    """Make an event payload JSON-serializable, keeping bytes recoverable."""
+    if isinstance(value, (bytes, bytearray)):
+        return {"$b": value.hex()}
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def decode_value(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and "$b" in value:
+            return bytes.fromhex(value["$b"])
+        return {k: decode_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+
+def encode_event(event: Event, offset: float) -> str:
+    return json.dumps(
+        [
+            round(offset, 4),
+            event.type.value,
+            encode_value(event.payload),
+            encode_value(event.attributes),
+        ],
+        separators=(",", ":"),
+    )
+
+
+def decode_event(line: str):
+    """Return (offset, Event) for a recorded event line."""
+    return decode_event_data(json.loads(line))
+
+
+def decode_event_data(data: list):
+    """Return (offset, Event) for an already parsed event line."""
+    offset, type_value, payload, attributes = data
+    payload, attributes = decode_value(payload), decode_value(attributes)
+    return offset, Event(EventType(type_value), payload, attributes)
+
+
+class EventRecorder:
+    """Appends every event it is given to a recording file."""
+
+    def __init__(self, path: str, self_info: dict | None = None):
+        self.path = path
+        self.file = _open(path, "w")
+        self.start = time.monotonic()
+        self.count = 0
+        header = {
+            "meshrc_recording": RECORDING_VERSION,
+            "started": time.time(),
+            "self_info": encode_value(self_info or {}),
+        }
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, event: Event):
+        # Subscribed as a sync callback, so events are written in dispatch order
+        self.file.write(encode_event(event, time.monotonic() - self.start) + "\n")
+        self.count += 1
+        if self.count % 100 == 0:
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+def read_recording(path: str):
+    """Return (header, iterator of (offset, Event)) for a recording file."""
+    f = _open(path, "r")
+    header = json.loads(f.readline() or "{}")
+    if header.get("meshrc_recording") != RECORDING_VERSION:
+        f.close()
+        raise ValueError(f"{path} is not a meshrc recording")
+
+    def events():
+        with f:
+            for line in f:
+                if line.strip():
+                    yield decode_event(line)
+
+    return header, events()
+
+
+class ReplayMeshCore(StandInMeshCore):
+    """Feeds a recorded session back through the subscribed handlers.
+
+    `speed` scales the recorded timing (2.0 replays twice as fast); 0 replays
+    as fast as the handlers can take it.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.finished = asyncio.Event()
+        self.stats = {"events": 0, "elapsed": 0.0}
+
+        # Preload device state so fetch_initial_data sees what the recorded
+        # session saw before the first event is replayed.
+        header, events = read_recording(path)
+        self._self_info.update(decode_value(header.get("self_info", {})))
+        for _, event in events:
+            if event.type == EventType.CONTACTS and not self._contacts:
+                self._contacts = dict(event.payload)
+            elif event.type == EventType.CHANNEL_INFO:
+                idx = event.payload.get("channel_idx", len(self.channel_table))
+                if idx == len(self.channel_table):
+                    self.channel_table.append(event.payload)
+
+    @classmethod
+    async def create(cls, path: str, speed: float = 1.0):
+        mc = cls(path, speed)
+        await mc.connect()
+        mc.spawn(mc._replay_loop())
+        return mc
+
+    async def _replay_loop(self):
+        _, events = read_recording(self.path)
+        start = time.monotonic()
+        for offset, event in events:
+            if self.speed > 0:
+                delay = offset / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if event.type == EventType.CONTACTS:
+                self._contacts = dict(event.payload)
+            await self.dispatch(event)
+            self.stats["events"] += 1
+
+        # Wait until the handlers have seen everything before reporting
+        await self.dispatcher.queue.join()
+        self.stats["elapsed"] = time.monotonic() - start
+        self.finished.set()
@@ -0,0 +1,131 @@
+"""Retention for the `--logdb` message log (`--retention-days`, `--retention-size`).
+
+Pruning is done by the log writer thread in small steps between writes, so
+it never holds the database for long: each step deletes at most
+PRUNE_BATCH expired rows and returns at most VACUUM_PAGES
+free pages to the file system (with `auto_vacuum=INCREMENTAL`, a database
+doesn't shrink otherwise). With monthly partitions, a month that has
+expired, or the oldest months beyond the size limit, are removed as whole
+files instead.
+"""
+
+import calendar
+import os
+import time
+
+from .logdb import list_partitions
+from .metrics import REGISTRY
+
+# Rows deleted per pruning step
+PRUNE_BATCH = 500
+# Free pages returned to the file system per pruning step
+VACUUM_PAGES = 256
+# Seconds between pruning steps while there is nothing to prune
+PRUNE_INTERVAL = 60
+# Seconds between pruning steps while catching up
+PRUNE_BUSY_INTERVAL = 0.5
+
+PRUNED = REGISTRY.counter("meshrc_log_pruned_total", "Log rows removed by retention")
+PARTITIONS_REMOVED = REGISTRY.counter(
+    "meshrc_log_partitions_removed_total", "Log partition files removed by retention"
+)
+
+
+def used_bytes(conn) -> int:
+    """Size of the database less its free pages."""
+    (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+    (pages,) = conn.execute("PRAGMA page_count").fetchone()
+    (free,) = conn.execute("PRAGMA freelist_count").fetchone()
+    return (pages - free) * page_size
+
+
+def _month_end(month: str) -> float:
+    year, number = map(int, month.split("-"))
+    year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return calendar.timegm((year, number, 1, 0, 0, 0))
+
+
+def _remove_db(path: str):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class Retention:
+    def __init__(self, max_age_days: float = None, max_bytes: int = None):
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_bytes = max_bytes
+        self.next_prune = 0
+
+    def due(self) -> bool:
+        return time.monotonic() >= self.next_prune
+
+    def prune(self, conn, log_db: str, partitions: dict = None) -> bool:
+        """Run one pruning step; returns whether more is left to do.
+
+        `partitions` (partitioned logs only) maps partition paths to the
+        writer's open connections, which are closed before a file goes.
+        """
+        busy = self._prune_rows(conn)
+        if partitions is not None:
+            busy = self._prune_partitions(log_db, partitions) or busy
+        interval = PRUNE_BUSY_INTERVAL if busy else PRUNE_INTERVAL
+        self.next_prune = time.monotonic() + interval
+        return busy
+
+    def _prune_rows(self, conn) -> bool:
+        deleted = 0
+        with conn:
+            if self.max_age:
+                cutoff = time.time() - self.max_age
+                # Imported rows can be older than rows already in the log, so
+                # select by timestamp rather than assuming the oldest come first
+                deleted += conn.execute(
+                    "DELETE FROM msgs WHERE rowid IN "
+                    "(SELECT rowid FROM msgs WHERE timestamp < ? LIMIT ?)",
+                    (cutoff, PRUNE_BATCH),
+                ).rowcount
+            excess = used_bytes(conn) - self.max_bytes if self.max_bytes else 0
+            if excess > 0:
+                deleted += conn.execute(
+                    "DELETE FROM msgs WHERE rowid IN "
+                    "(SELECT rowid FROM msgs ORDER BY rowid LIMIT ?)",
+                    (self._rows_for(conn, excess),),
+                ).rowcount
+        PRUNED.inc(deleted)
+
+        (free,) = conn.execute("PRAGMA freelist_count").fetchone()
+        if free:
+            # Pages are only freed as the pragma's rows are read
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        return deleted > 0 or free > VACUUM_PAGES
+
+    def _rows_for(self, conn, excess: int) -> int:
+        """Estimate how many of the oldest rows make up `excess` bytes."""
+        low, high = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM msgs").fetchone()
+        if low is None:
+            return 0
+        row_size = max(used_bytes(conn) // (high - low + 1), 1)
+        return min(excess // row_size + 1, PRUNE_BATCH)
+
+    def _prune_partitions(self, log_db: str, partitions: dict) -> bool:
+        months = list_partitions(log_db)[:-1]  # Never the newest month
+        expired = []
+        if self.max_age:
+            cutoff = time.time() - self.max_age
+            expired = [path for month, path in months if _month_end(month) < cutoff]
+        if self.max_bytes and not expired:
+            total = sum(os.path.getsize(path) for _, path in list_partitions(log_db))
+            if months and total > self.max_bytes:
+                expired = [months[0][1]]
+        for path in expired:
+            conn = partitions.pop(path, None)
+            if conn is not None:
+                conn.close()
+            _remove_db(path)
+            PARTITIONS_REMOVED.inc()
+        if not expired or not self.max_bytes:
+            return False
+        # Come back soon if removing a month wasn't enough
+        total = sum(os.path.getsize(path) for _, path in list_partitions(log_db))
+        return total > self.max_bytes
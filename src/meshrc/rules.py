@@ -0,0 +1,148 @@
+"""Filter rules (`--rules`) applied to received messages before the app sees them.
+
+A rules file is a JSON list of rules, tried in order; the first that
+matches decides what happens to a message:
+
+    [
+      {"name": "bots", "sender": "bot-", "action": "drop"},
+      {"channel": "Public", "match": "^(ping|test)$", "action": "log"},
+      {"channel": 0, "rate": "5/60", "action": "collapse", "window": 120}
+    ]
+
+Conditions (all given ones must hold):
+
+- `sender`: sender name prefix (case-insensitive)
+- `channel`: channel index or name; direct messages never match
+- `match`: regex searched in the text (case-insensitive)
+- `rate`: "N/SECONDS"; only messages beyond N per sender in that many
+  seconds match
+
+Actions:
+
+- `drop`: discard the message entirely
+- `log`: write it to the logs, but don't show it or count it as unread
+- `collapse`: show the first message, log the rest without showing them
+  for `window` seconds (default 60); the next one shown afterwards notes
+  how many were hidden
+"""
+
+import json
+import re
+import time
+from collections import deque
+from dataclasses import replace
+
+from .metrics import REGISTRY
+from .record import MessageRecord
+
+ACTIONS = ("drop", "log", "collapse")
+# Default seconds a collapse rule hides similar messages for
+COLLAPSE_WINDOW = 60
+
+
+class Rule:
+    def __init__(self, spec: dict, name: str):
+        self.name = spec.get("name") or name
+        self.action = spec.get("action", "drop")
+        if self.action not in ACTIONS:
+            raise ValueError(f"Rule {self.name}: unknown action {self.action!r}")
+        self.sender = (spec.get("sender") or "").lower() or None
+        self.channel = spec.get("channel")
+        self.match = None
+        try:
+            if spec.get("match"):
+                self.match = re.compile(spec["match"], re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Rule {self.name}: bad regex: {e}") from None
+        self.rate = None
+        if spec.get("rate"):
+            try:
+                count, _, seconds = str(spec["rate"]).partition("/")
+                self.rate = (int(count), float(seconds or 60))
+            except ValueError:
+                raise ValueError(f"Rule {self.name}: rate must be N/SECONDS") from None
+        self.window = float(spec.get("window", COLLAPSE_WINDOW))
+        self.hits = REGISTRY.counter(
+            "meshrc_rule_hits_total",
+            "Messages matched by a filter rule",
+            rule=self.name,
+        )
+        self._recent = {}  # Key: (context id, sender), Value: deque of times
+        # When senders quiet for a whole rate period were last forgotten
+        self._swept = 0.0
+        self._collapsing = {}  # Key: context id, Value: [hidden until, hidden count]
+
+    def matches(self, record: MessageRecord, msg: dict, now: float) -> bool:
+        if self.sender and not (record.sender or "").lower().startswith(self.sender):
+            return False
+        if self.channel is not None:
+            if msg.get("context_type") != "channel":
+                return False
+            if self.channel not in (msg.get("channel_idx"), msg.get("channel_name")):
+                return False
+        if self.match and not self.match.search(record.text):
+            return False
+        if self.rate:
+            limit, seconds = self.rate
+            times = self._recent.setdefault((record.context_id, record.sender), deque())
+            while times and now - times[0] > seconds:
+                times.popleft()
+            times.append(now)
+            if now - self._swept > seconds:
+                self._forget_quiet(now, seconds)
+            if len(times) <= limit:
+                return False
+        return True
+
+    def _forget_quiet(self, now: float, seconds: float):
+        # At most once a rate period, so the sweep costs O(1) per message
+        self._swept = now
+        quiet = [
+            key for key, times in self._recent.items() if now - times[-1] > seconds
+        ]
+        for key in quiet:
+            del self._recent[key]
+
+    def apply(self, record: MessageRecord, now: float) -> MessageRecord | None:
+        self.hits.inc()
+        if self.action == "drop":
+            return None
+        if self.action == "log":
+            return replace(record, hidden=True)
+
+        state = self._collapsing.get(record.context_id)
+        if state and now < state[0]:
+            state[1] += 1
+            return replace(record, hidden=True)
+        self._collapsing[record.context_id] = [now + self.window, 0]
+        if state and state[1]:
+            return replace(record, collapsed=state[1])
+        return record
+
+
+class RuleSet:
+    def __init__(self, rules: list):
+        self.rules = rules
+
+    def apply(self, record: MessageRecord, msg: dict) -> MessageRecord | None:
+        """Return the record to post, possibly hidden, or None to drop it."""
+        now = time.monotonic()
+        for rule in self.rules:
+            if rule.matches(record, msg, now):
+                return rule.apply(record, now)
+        return record
+
+    def summary(self) -> str:
+        return ", ".join(f"{rule.name}: {rule.hits.value:.0f}" for rule in self.rules)
+
+
+def load_rules(path: str) -> RuleSet:
+    """Load a rules file; raises ValueError if it is invalid."""
+    try:
+        with open(path) as f:
+            specs = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Cannot read rules from {path}: {e}") from None
+    if not isinstance(specs, list):
+        raise ValueError(f"{path}: expected a list of rules")
+    return RuleSet([Rule(spec, f"rule{i}") for i, spec in enumerate(specs, 1)])
@@ -0,0 +1,114 @@
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Button, Label, Sparkline
+
+from ..linkstats import FIELDS
+
+# Samples drawn in each sparkline
+SPARKLINE_SAMPLES = 96
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.0f}" if float(value).is_integer() else f"{value:.2f}"
+
+
+class LinkScreen(ModalScreen):
+    """Link quality of the active conversation, from the messages received."""
+
+    DEFAULT_CSS = """
+    LinkScreen {
+        align: center middle;
+    }
+
+    #dialog {
+        padding: 0 1;
+        width: 100;
+        height: auto;
+        max-height: 90%;
+        border: thick $background 80%;
+        background: $surface;
+    }
+
+    #title {
+        height: 1;
+        width: 100%;
+        content-align: center middle;
+        text-style: bold;
+    }
+
+    .field {
+        margin-top: 1;
+        width: 100%;
+    }
+
+    .field.degraded {
+        color: $error;
+    }
+
+    Sparkline {
+        height: 3;
+    }
+
+    #empty {
+        margin: 1 0;
+    }
+
+    #close {
+        width: 100%;
+    }
+    """
+
+    BINDINGS = [("escape", "close", "Close")]
+
+    def __init__(self, link_stats, context_id: str, title: str):
+        super().__init__()
+        self.link_stats = link_stats
+        self.context_id = context_id
+        self.title_text = title
+        self.shown = None  # link_stats.updated when last drawn
+
+    def compose(self) -> ComposeResult:
+        widgets = [Label(f"Link quality: {self.title_text}", id="title")]
+        for field in FIELDS:
+            widgets.append(Label("", id=f"field_{field}", classes="field"))
+            widgets.append(Sparkline([], id=f"spark_{field}"))
+        widgets.append(Label("No link data received yet.", id="empty"))
+        widgets.append(Button("Close", id="close"))
+        yield Vertical(*widgets, id="dialog")
+
+    def on_mount(self) -> None:
+        self.refresh_series()
+        self.set_interval(1.0, self.refresh_series)
+
+    def refresh_series(self) -> None:
+        if self.shown == self.link_stats.updated:
+            return
+        self.shown = self.link_stats.updated
+        fields = self.link_stats.get(self.context_id)
+        self.query_one("#empty").display = not fields
+        for field, (label, *_) in FIELDS.items():
+            series = fields.get(field)
+            text = self.query_one(f"#field_{field}", Label)
+            spark = self.query_one(f"#spark_{field}", Sparkline)
+            text.display = spark.display = series is not None
+            if series is None:
+                continue
+            trend = "  ▼ degrading" if field == "SNR" and series.degraded else ""
+            text.update(
+                f"{label}: last {_fmt(series.last)}  min {_fmt(series.min)}  "
+                f"max {_fmt(series.max)}  ewma {_fmt(series.ewma)}  "
+                f"p10/p50/p90 {_fmt(series.percentile(0.1))}/"
+                f"{_fmt(series.percentile(0.5))}/{_fmt(series.percentile(0.9))}  "
+                f"({len(series)} msgs){trend}"
+            )
+            text.set_class(bool(trend), "degraded")
+            spark.data = [value for _, value in series.recent(SPARKLINE_SAMPLES)]
+
+    def action_close(self) -> None:
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        self.dismiss()
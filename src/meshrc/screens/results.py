@@ -0,0 +1,92 @@
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Button, DataTable, Label
+
+
+class BulkResultsScreen(ModalScreen):
+    """Shows per-node results of a bulk repeater command as they arrive."""
+
+    DEFAULT_CSS = """
+    BulkResultsScreen {
+        align: center middle;
+    }
+
+    #dialog {
+        padding: 0 1;
+        width: 90;
+        height: 80%;
+        border: thick $background 80%;
+        background: $surface;
+    }
+
+    #title {
+        height: 1;
+        width: 100%;
+        content-align: center middle;
+        text-style: bold;
+    }
+
+    DataTable {
+        height: 1fr;
+    }
+
+    #close {
+        width: 100%;
+    }
+    """
+
+    BINDINGS = [("escape", "close", "Close")]
+
+    def __init__(self, title: str, targets: list[dict], **kwargs):
+        super().__init__(**kwargs)
+        self.title_text = title
+        self.targets = targets
+        self.done = 0
+
+    def compose(self) -> ComposeResult:
+        yield Vertical(
+            Label(self.title_text, id="title"),
+            DataTable(id="results", cursor_type="row", zebra_stripes=True),
+            Button("Close", id="close"),
+            id="dialog",
+        )
+
+    def on_mount(self) -> None:
+        table = self.query_one("#results", DataTable)
+        table.add_column("Node", key="node")
+        table.add_column("Result", key="result")
+        table.add_column("Latency", key="latency")
+        table.add_column("Detail", key="detail")
+        for contact in self.targets:
+            table.add_row(
+                contact.get("adv_name", contact.get("public_key", "")[:8]),
+                "…",
+                "",
+                "",
+                key=contact.get("public_key", ""),
+            )
+        self._update_title()
+
+    def set_result(self, result: dict) -> None:
+        """Fill in the row for a finished node."""
+        if not self.is_mounted or not self.is_attached:
+            return
+        table = self.query_one("#results", DataTable)
+        row = result["key"]
+        latency = f"{result['latency']:.1f}s" if result["latency"] is not None else "-"
+        table.update_cell(row, "result", "ok" if result["ok"] else "fail")
+        table.update_cell(row, "latency", latency)
+        table.update_cell(row, "detail", result["detail"])
+        self.done += 1
+        self._update_title()
+
+    def _update_title(self) -> None:
+        label = self.query_one("#title", Label)
+        label.update(f"{self.title_text} ({self.done}/{len(self.targets)})")
+
+    def action_close(self) -> None:
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        self.dismiss()
@@ -0,0 +1,88 @@
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Button, DataTable, Label
+
+from ..metrics import REGISTRY, Histogram
+
+
+def _fmt_seconds(value: float) -> str:
+    if value >= 1:
+        return f"{value:.2f}s"
+    return f"{value * 1000:.2f}ms"
+
+
+class StatsScreen(ModalScreen):
+    """Live view of the in-process performance metrics."""
+
+    DEFAULT_CSS = """
+    StatsScreen {
+        align: center middle;
+    }
+
+    #dialog {
+        padding: 0 1;
+        width: 100;
+        height: 80%;
+        border: thick $background 80%;
+        background: $surface;
+    }
+
+    #title {
+        height: 1;
+        width: 100%;
+        content-align: center middle;
+        text-style: bold;
+    }
+
+    DataTable {
+        height: 1fr;
+    }
+
+    #close {
+        width: 100%;
+    }
+    """
+
+    BINDINGS = [("escape", "close", "Close")]
+
+    def compose(self) -> ComposeResult:
+        yield Vertical(
+            Label("Performance", id="title"),
+            DataTable(id="metrics", cursor_type="row", zebra_stripes=True),
+            Button("Close", id="close"),
+            id="dialog",
+        )
+
+    def on_mount(self) -> None:
+        table = self.query_one("#metrics", DataTable)
+        table.add_columns("Metric", "Labels", "Value/Sum", "Count", "p50", "p95", "Max")
+        self.refresh_metrics()
+        self.set_interval(1.0, self.refresh_metrics)
+
+    def refresh_metrics(self) -> None:
+        table = self.query_one("#metrics", DataTable)
+        table.clear()
+        for metric in sorted(REGISTRY.metrics.values(), key=lambda m: m.name):
+            name = metric.name.removeprefix("meshrc_")
+            labels = ",".join(f"{k}={v}" for k, v in metric.labels.items())
+            if isinstance(metric, Histogram):
+                table.add_row(
+                    name,
+                    labels,
+                    _fmt_seconds(metric.sum),
+                    str(metric.count),
+                    _fmt_seconds(metric.quantile(0.5)),
+                    _fmt_seconds(metric.quantile(0.95)),
+                    _fmt_seconds(metric.max),
+                )
+            else:
+                value = metric.value
+                text = f"{value:.1f}" if isinstance(value, float) else str(value)
+                table.add_row(name, labels, text, "", "", "", "")
+
+    def action_close(self) -> None:
+        self.dismiss()
+
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        self.dismiss()
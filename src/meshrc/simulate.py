@@ -0,0 +1,440 @@
+"""Stand-in MeshCore transports that run without a radio.
+
+`StandInMeshCore` implements the part of the `MeshCore` surface used by
+`MeshClient` (subscribe, wait_for_event, contacts, self_info and the commands
+in `StandInCommands`) on top of meshcore's own `EventDispatcher`, so handlers
+see events exactly as they would from a device. `SimulatedMeshCore` adds a
+synthetic traffic generator for load testing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+
+from meshcore import EventType
+from meshcore.events import Event, EventDispatcher
+
+# Defaults for --simulate, overridable as key=value pairs
+SIMULATE_DEFAULTS = {
+    "contacts": 50,  # Number of contacts (a fifth of them repeaters)
+    "channels": 4,  # Number of channels
+    "rate": 1.0,  # Mean messages per second
+    "burst": 0,  # Messages per burst (0 disables bursts)
+    "burst_every": 30.0,  # Mean seconds between bursts
+    "dup": 0.0,  # Probability a message is heard again (flood duplicates)
+    "dup_max": 3,  # Maximum extra copies of a duplicated message
+    "disconnect": 0.0,  # Mean seconds between disconnects (0 disables)
+    "outage": 5.0,  # Seconds a simulated disconnect lasts
+    "backlog": 0,  # Messages queued on the device before we connect
+    "dm_ratio": 0.2,  # Share of direct messages among generated traffic
+    "ack_latency": 2.0,  # Mean seconds before an outgoing DM is acked
+    "ack_loss": 0.1,  # Probability an outgoing DM is never acked
+    "seed": None,  # Random seed for reproducible runs
+}
+
+WORDS = (
+    "copy", "relay", "north", "ridge", "battery", "solar", "check", "test",
+    "signal", "weak", "strong", "anyone", "hello", "mesh", "node", "route",
+    "weather", "clear", "rain", "wind", "qrv", "73", "back", "online",
+)
+
+
+def parse_simulate_spec(spec: str | None) -> dict:
+    """Parse a `key=value,key=value` --simulate spec over the defaults."""
+    options = dict(SIMULATE_DEFAULTS)
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition("=")
+        key = key.strip().replace("-", "_")
+        if not sep or key not in options:
+            raise ValueError(f"Unknown simulate option: {item.strip()}")
+        default = SIMULATE_DEFAULTS[key]
+        options[key] = type(default)(value) if default is not None else int(value)
+    return options
+
+
+class _Subscription:
+    """Handle returned when a stand-in is asked for a subscription it ignores."""
+
+    def unsubscribe(self):
+        pass
+
+
+class StandInCommands:
+    """The subset of `meshcore` commands used by meshrc, answered locally.
+
+    Responses are dispatched through the stand-in's dispatcher just like the
+    reader would, then returned to the caller.
+    """
+
+    def __init__(self, mc: StandInMeshCore):
+        self.mc = mc
+
+    async def _reply(self, event_type, payload=None, attributes=None):
+        event = Event(event_type, payload if payload is not None else {}, attributes)
+        await self.mc.dispatch(event)
+        return event
+
+    async def send_appstart(self, timeout=None):
+        return await self._reply(EventType.SELF_INFO, dict(self.mc.self_info))
+
+    async def get_time(self):
+        return await self._reply(EventType.CURRENT_TIME, {"time": int(time.time())})
+
+    async def get_contacts_async(self, lastmod=0):
+        return await self.get_contacts(lastmod)
+
+    async def get_contacts(self, lastmod=0, timeout=5):
+        return await self._reply(EventType.CONTACTS, dict(self.mc.contacts))
+
+    async def get_channel(self, channel_idx: int):
+        if 0 <= channel_idx < len(self.mc.channel_table):
+            return await self._reply(
+                EventType.CHANNEL_INFO, dict(self.mc.channel_table[channel_idx])
+            )
+        return await self._reply(EventType.ERROR, {"reason": "not_found"})
+
+    async def set_channel(
+        self, channel_idx: int, channel_name: str, channel_secret=None
+    ):
+        entry = {
+            "channel_idx": channel_idx,
+            "channel_name": channel_name,
+            "channel_secret": bytes(16),
+        }
+        while len(self.mc.channel_table) <= channel_idx:
+            self.mc.channel_table.append(
+                {
+                    "channel_idx": len(self.mc.channel_table),
+                    "channel_name": "",
+                    "channel_secret": bytes(16),
+                }
+            )
+        self.mc.channel_table[channel_idx] = entry
+        return await self._reply(EventType.OK)
+
+    async def get_msg(self, timeout=None):
+        if not self.mc.waiting:
+            return await self._reply(EventType.NO_MORE_MSGS)
+        return await self._reply(*self.mc.waiting.pop(0))
+
+    async def _sent(self):
+        code = random.randbytes(4)
+        payload = {"type": 0, "expected_ack": code, "suggested_timeout": 10000}
+        return code, await self._reply(
+            EventType.MSG_SENT, payload, {"type": 0, "expected_ack": code.hex()}
+        )
+
+    async def send_msg(self, dst, msg: str, timestamp=None, attempt=0):
+        code, event = await self._sent()
+        self.mc.on_sent_msg(dst, msg, code)
+        return event
+
+    async def send_chan_msg(self, chan: int, msg: str, timestamp=None):
+        _, event = await self._sent()
+        return event
+
+    async def send_statusreq(self, dst):
+        _, event = await self._sent()
+        self.mc.on_status_request(dst)
+        return event
+
+    async def send_login(self, dst, pwd: str):
+        _, event = await self._sent()
+        self.mc.on_login(dst, pwd)
+        return event
+
+    async def send_logout(self, dst):
+        return await self._reply(EventType.OK)
+
+    async def send_trace(self, auth_code=0, tag=None, flags=None, path=None):
+        tag = tag if tag is not None else random.randint(1, 0xFFFFFFFF)
+        _, event = await self._sent()
+        self.mc.on_trace(tag, path)
+        return event
+
+
+class StandInMeshCore:
+    """Base for transports that stand in for a MeshCore device."""
+
+    commands_class = StandInCommands
+
+    def __init__(self, name: str = "meshrc-sim"):
+        self.dispatcher = EventDispatcher()
+        self.commands = self.commands_class(self)
+        self._contacts = {}
+        self._self_info = {"name": name, "public_key": random.randbytes(32).hex()}
+        self.channel_table = []  # What get_channel reports, like the device's slots
+        self.waiting = []  # (event_type, payload, attributes) queued for get_msg
+        self.connected = False
+        self._tasks = set()
+
+    # MeshCore-compatible surface
+
+    @property
+    def contacts(self):
+        return self._contacts
+
+    @property
+    def self_info(self):
+        return self._self_info
+
+    @property
+    def is_connected(self):
+        return self.connected
+
+    def subscribe(self, event_type, callback, attribute_filters=None):
+        return self.dispatcher.subscribe(event_type, callback, attribute_filters)
+
+    async def wait_for_event(self, event_type, attribute_filters=None, timeout=None):
+        return await self.dispatcher.wait_for_event(
+            event_type, attribute_filters, timeout
+        )
+
+    def get_contact_by_key_prefix(self, prefix: str):
+        prefix = prefix.lower()
+        for key, contact in self._contacts.items():
+            if key.lower().startswith(prefix):
+                return contact
+        return None
+
+    def get_contact_by_name(self, name: str):
+        for contact in self._contacts.values():
+            if contact.get("adv_name") == name:
+                return contact
+        return None
+
+    async def start_auto_message_fetching(self):
+        # Live traffic is pushed as it is generated, and the backlog is
+        # drained by MeshClient.sync_messages.
+        return _Subscription()
+
+    async def stop_auto_message_fetching(self):
+        pass
+
+    async def connect(self):
+        await self.dispatcher.start()
+        self.connected = True
+        await self.dispatch(Event(EventType.CONNECTED, {}))
+        return await self.commands.send_appstart()
+
+    def stop(self):
+        """Synchronously stop generating and dispatching events."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self.dispatcher._task and not self.dispatcher._task.done():
+            self.dispatcher.running = False
+            self.dispatcher._task.cancel()
+
+    async def disconnect(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.connected:
+            self.connected = False
+            await self.dispatch(Event(EventType.DISCONNECTED, {}))
+            # The dispatcher stops processing as soon as stop() is called, and
+            # would then wait forever for the events still queued
+            await self.dispatcher.queue.join()
+        await self.dispatcher.stop()
+
+    # Helpers for subclasses
+
+    async def dispatch(self, event: Event):
+        await self.dispatcher.dispatch(event)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def on_sent_msg(self, dst, msg: str, code: bytes):
+        pass
+
+    def on_status_request(self, dst):
+        pass
+
+    def on_login(self, dst, pwd: str):
+        pass
+
+    def on_trace(self, tag: int, path):
+        pass
+
+
+class SimulatedMeshCore(StandInMeshCore):
+    """A synthetic mesh generating configurable traffic for load testing."""
+
+    def __init__(self, **options):
+        self.options = {**SIMULATE_DEFAULTS, **options}
+        self.rng = random.Random(self.options["seed"])
+        super().__init__()
+        self.stats = {"generated": 0, "duplicates": 0, "bursts": 0, "disconnects": 0}
+        self._populate()
+
+    @classmethod
+    async def create(cls, **options):
+        mc = cls(**options)
+        await mc.connect()
+        mc.spawn(mc._traffic_loop())
+        if mc.options["burst"]:
+            mc.spawn(mc._burst_loop())
+        if mc.options["disconnect"]:
+            mc.spawn(mc._disconnect_loop())
+        return mc
+
+    def _populate(self):
+        rng = self.rng
+        now = int(time.time())
+        for i in range(self.options["contacts"]):
+            key = rng.randbytes(32).hex()
+            is_repeater = i % 5 == 0
+            self._contacts[key] = {
+                "public_key": key,
+                "type": 2 if is_repeater else 1,
+                "flags": 0,
+                "out_path_len": rng.randint(-1, 4),
+                "out_path": "",
+                "adv_name": f"{'rpt' if is_repeater else 'node'}-{i:04d}",
+                "last_advert": now - rng.randint(0, 86400),
+                "adv_lat": 0.0,
+                "adv_lon": 0.0,
+                "lastmod": now,
+            }
+        for idx in range(self.options["channels"]):
+            self.channel_table.append(
+                {
+                    "channel_idx": idx,
+                    "channel_name": "Public" if idx == 0 else f"#sim{idx}",
+                    "channel_secret": bytes(16),
+                }
+            )
+        for _ in range(self.options["backlog"]):
+            self.waiting.append(self._make_message())
+
+    def _make_message(self):
+        rng = self.rng
+        contact = rng.choice(list(self._contacts.values())) if self._contacts else None
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12)))
+        common = {
+            "path_len": rng.randint(0, 6),
+            "txt_type": 0,
+            "sender_timestamp": int(time.time()),
+            "SNR": round(rng.uniform(-15, 12) * 4) / 4,
+        }
+
+        if not self.channel_table or (
+            contact and rng.random() < self.options["dm_ratio"]
+        ):
+            # Without contacts, from a sender we don't know
+            key = contact["public_key"] if contact else rng.randbytes(32).hex()
+            prefix = key[:12]
+            payload = {"type": "PRIV", "pubkey_prefix": prefix, **common, "text": text}
+            return (
+                EventType.CONTACT_MSG_RECV,
+                payload,
+                {"pubkey_prefix": prefix, "txt_type": 0},
+            )
+
+        idx = rng.randrange(len(self.channel_table))
+        name = contact["adv_name"] if contact else "anon"
+        payload = {
+            "type": "CHAN",
+            "channel_idx": idx,
+            **common,
+            "text": f"{name}: {text}",
+        }
+        return (
+            EventType.CHANNEL_MSG_RECV,
+            payload,
+            {"channel_idx": idx, "txt_type": 0},
+        )
+
+    async def _emit(self, count: int = 1):
+        for _ in range(count):
+            event_type, payload, attributes = self._make_message()
+            copies = 1
+            if self.rng.random() < self.options["dup"]:
+                copies += self.rng.randint(1, self.options["dup_max"])
+                self.stats["duplicates"] += copies - 1
+            for _ in range(copies):
+                await self.dispatch(Event(event_type, dict(payload), dict(attributes)))
+            self.stats["generated"] += 1
+
+    async def _traffic_loop(self):
+        rate = self.options["rate"]
+        if rate <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if self.connected:
+                await self._emit()
+
+    async def _burst_loop(self):
+        while True:
+            await asyncio.sleep(self.rng.expovariate(1 / self.options["burst_every"]))
+            if self.connected:
+                self.stats["bursts"] += 1
+                await self._emit(self.options["burst"])
+
+    async def _disconnect_loop(self):
+        while True:
+            await asyncio.sleep(self.rng.expovariate(1 / self.options["disconnect"]))
+            self.connected = False
+            self.stats["disconnects"] += 1
+            await self.dispatch(Event(EventType.DISCONNECTED, {}))
+            await asyncio.sleep(self.options["outage"])
+            self.connected = True
+            await self.dispatch(Event(EventType.CONNECTED, {}))
+
+    # Responses to our own requests
+
+    def on_sent_msg(self, dst, msg: str, code: bytes):
+        if self.rng.random() < self.options["ack_loss"]:
+            return
+        delay = self.rng.expovariate(1 / self.options["ack_latency"])
+        event = Event(EventType.ACK, {"code": code.hex()}, {"code": code.hex()})
+        self.spawn(self._dispatch_later(delay, event))
+
+    def on_status_request(self, dst):
+        key = dst["public_key"] if isinstance(dst, dict) else str(dst)
+        status = {
+            "pubkey_pre": key[:12],
+            "bat": self.rng.randint(3500, 4200),
+            "tx_queue_len": self.rng.randint(0, 5),
+            "noise_floor": self.rng.randint(-120, -100),
+            "last_rssi": self.rng.randint(-120, -60),
+            "nb_recv": self.rng.randint(0, 100000),
+            "nb_sent": self.rng.randint(0, 100000),
+            "airtime": self.rng.randint(0, 100000),
+            "uptime": self.rng.randint(0, 30 * 86400),
+            "full_evts": 0,
+            "last_snr": round(self.rng.uniform(-15, 12) * 4) / 4,
+        }
+        event = Event(EventType.STATUS_RESPONSE, status, {"pubkey_prefix": key[:12]})
+        self.spawn(self._dispatch_later(self.rng.uniform(0.5, 3.0), event))
+
+    def on_login(self, dst, pwd: str):
+        # Any password is accepted
+        key = dst["public_key"] if isinstance(dst, dict) else str(dst)
+        payload = {"permissions": 1, "is_admin": True, "pubkey_prefix": key[:12]}
+        event = Event(EventType.LOGIN_SUCCESS, payload, {"pubkey_prefix": key[:12]})
+        self.spawn(self._dispatch_later(self.rng.uniform(0.5, 3.0), event))
+
+    def on_trace(self, tag: int, path):
+        hops = len(path.split(",")) if isinstance(path, str) and path else 0
+        nodes = [
+            {"hash": hop, "snr": round(self.rng.uniform(-15, 12) * 4) / 4}
+            for hop in (path.split(",") if hops else [])
+        ]
+        nodes.append({"snr": round(self.rng.uniform(-15, 12) * 4) / 4})
+        payload = {"tag": tag, "auth": 0, "flags": 0, "path_len": hops, "path": nodes}
+        event = Event(EventType.TRACE_DATA, payload, {"tag": tag, "auth_code": 0})
+        self.spawn(self._dispatch_later(self.rng.uniform(0.5, 3.0), event))
+
+    async def _dispatch_later(self, delay: float, event: Event):
+        await asyncio.sleep(delay)
+        if self.connected:
+            await self.dispatch(event)
@@ -0,0 +1,182 @@
+"""Persistent UI state: favorites, recents and per-context read markers.
+
+The state is small, so it is loaded whole at startup and kept in memory.
+Changes mark the store dirty and are written together, off the event loop,
+a short while later, so toggling a favorite or switching contexts never
+waits on the disk.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+STATE_FILE = "state.db"
+# Seconds changes are collected before they are written together
+STATE_FLUSH_DELAY = 2.0
+# Number of recently used contacts remembered
+RECENTS_SIZE = 20
+
+CREATE_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS favorites (key TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS recents (key TEXT PRIMARY KEY, used_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS last_read (
+    context_id TEXT PRIMARY KEY, timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class StateStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(CREATE_STATE_SQL)
+        rows = self.conn.execute("SELECT key FROM favorites")
+        self.favorites = {key for (key,) in rows}
+        # Most recently used first
+        rows = self.conn.execute("SELECT key FROM recents ORDER BY used_at DESC")
+        self.recents = [key for (key,) in rows]
+        rows = self.conn.execute("SELECT context_id, timestamp FROM last_read")
+        self.last_read = dict(rows)
+
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE name = 'created'"
+        ).fetchone()
+        if row:
+            self.created = int(row[0])
+        else:
+            # Messages logged before the store existed count as read
+            self.created = int(time.time())
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO meta (name, value) VALUES ('created', ?)",
+                    (self.created,),
+                )
+
+        self._dirty = False
+        self._flush_handle = None
+        self._flush_task = None
+        self._lock = threading.Lock()  # Held while writing to or closing conn
+        self.closed = False
+
+    def toggle_favorite(self, key: str) -> bool:
+        if key in self.favorites:
+            self.favorites.remove(key)
+        else:
+            self.favorites.add(key)
+        self._changed()
+        return key in self.favorites
+
+    def mark_recent(self, key: str):
+        if self.recents[:1] == [key]:
+            return
+        if key in self.recents:
+            self.recents.remove(key)
+        self.recents.insert(0, key)
+        del self.recents[RECENTS_SIZE:]
+        self._changed()
+
+    def mark_read(self, context_id: str, timestamp: int = None):
+        self.last_read[context_id] = int(timestamp or time.time())
+        self._changed()
+
+    def read_since(self, context_id: str) -> int:
+        return self.last_read.get(context_id, self.created)
+
+    def _changed(self):
+        self._dirty = True
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(STATE_FLUSH_DELAY, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        # Snapshot on the loop, where the state is changed; write in a thread
+        self._flush_task = asyncio.create_task(
+            asyncio.to_thread(self._write, self._snapshot())
+        )
+
+    def flush(self):
+        """Write pending changes now."""
+        self._write(self._snapshot())
+
+    def _snapshot(self):
+        if not self._dirty:
+            return None
+        self._dirty = False
+        now = time.time()
+        return (
+            [(key,) for key in self.favorites],
+            # Decreasing times, so the order survives a reload
+            [(key, now - i) for i, key in enumerate(self.recents)],
+            list(self.last_read.items()),
+        )
+
+    def _write(self, snapshot):
+        if snapshot is None:
+            return
+        with self._lock:
+            if self.closed:
+                return  # Superseded by the final write in close()
+            self._write_snapshot(snapshot)
+
+    def _write_snapshot(self, snapshot):
+        favorites, recents, last_read = snapshot
+        with self.conn:
+            self.conn.execute("DELETE FROM favorites")
+            self.conn.executemany("INSERT INTO favorites (key) VALUES (?)", favorites)
+            self.conn.execute("DELETE FROM recents")
+            self.conn.executemany(
+                "INSERT INTO recents (key, used_at) VALUES (?, ?)", recents
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO last_read (context_id, timestamp)"
+                " VALUES (?, ?)",
+                last_read,
+            )
+
+    def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # All of the state, as a write still in flight is skipped
+        self._dirty = True
+        snapshot = self._snapshot()
+        with self._lock:
+            self._write_snapshot(snapshot)
+            self.closed = True
+            self.conn.close()
+
+
+def unread_counts(conn, context_for, read_since, until: int) -> dict:
+    """Count messages logged after each context's read marker and up to `until`.
+
+    `context_for(type, channel_idx, pubkey_prefix)` maps logged messages to
+    a context id (or None to skip them) and `read_since(context_id)` returns
+    its marker. Counting uses the
+    (type, channel_idx, pubkey_prefix, timestamp) index on the log, so each
+    context is a range count. Runs blocking on a log connection, so call it
+    through the app's ReaderPool.
+    """
+    counts = {}
+    contexts = conn.execute(
+        "SELECT DISTINCT type, channel_idx, pubkey_prefix FROM msgs"
+    ).fetchall()
+    for msg_type, channel_idx, pubkey_prefix in contexts:
+        context_id = context_for(msg_type, channel_idx, pubkey_prefix)
+        if context_id is None:
+            continue
+        (count,) = conn.execute(
+            "SELECT COUNT(*) FROM msgs WHERE type = ? AND channel_idx IS ? "
+            "AND pubkey_prefix IS ? AND timestamp > ? AND timestamp <= ?",
+            (msg_type, channel_idx, pubkey_prefix, read_since(context_id), until),
+        ).fetchone()
+        if count:
+            counts[context_id] = counts.get(context_id, 0) + count
+    return counts
@@ -0,0 +1,190 @@
+"""Scheduled status polling of repeaters with time-series storage."""
+
+import asyncio
+import random
+import sqlite3
+import time
+from contextlib import closing, suppress
+
+from .bulk import BULK_TIMEOUT, request_status_payload
+
+# Default seconds between polls of the same node
+POLL_INTERVAL = 900.0
+# Each interval is scaled by a random factor in [1 - jitter, 1 + jitter]
+POLL_JITTER = 0.2
+# Upper bound for the backoff applied to unresponsive nodes
+MAX_BACKOFF = 6 * 3600.0
+
+# Status fields kept in the time-series table
+STATUS_FIELDS = (
+    "uptime",
+    "bat",
+    "tx_queue_len",
+    "noise_floor",
+    "last_rssi",
+    "last_snr",
+    "nb_recv",
+    "nb_sent",
+    "airtime",
+    "full_evts",
+)
+
+# One row per poll; a failed poll leaves the status columns NULL so
+# reachability can be computed alongside the node's own counters.
+CREATE_STATUS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS status_samples (
+    timestamp INTEGER NOT NULL,
+    pubkey_prefix TEXT NOT NULL,
+    rtt_ms INTEGER,
+    uptime INTEGER,
+    bat INTEGER,
+    tx_queue_len INTEGER,
+    noise_floor INTEGER,
+    last_rssi INTEGER,
+    last_snr REAL,
+    nb_recv INTEGER,
+    nb_sent INTEGER,
+    airtime INTEGER,
+    full_evts INTEGER,
+    PRIMARY KEY (pubkey_prefix, timestamp)
+) WITHOUT ROWID;
+"""
+
+
+class AirtimeBudget:
+    """Token bucket limiting how many requests we put on the air.
+
+    Interactive sends `spend()` without waiting; background jobs `acquire()`
+    and so yield to interactive traffic when the budget is used up.
+    """
+
+    def __init__(self, per_minute: float = 6.0, burst: float = 6.0):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def spend(self, count: float = 1.0):
+        self._refill()
+        # Allow going into debt, but not unboundedly
+        self.tokens = max(self.tokens - count, -self.burst)
+
+    async def acquire(self, count: float = 1.0):
+        while True:
+            self._refill()
+            if self.tokens >= count:
+                self.tokens -= count
+                return
+            await asyncio.sleep((count - self.tokens) / self.rate)
+
+
+class TelemetryPoller:
+    """Polls the status of a set of contacts on jittered intervals.
+
+    Targets are names or public key prefixes and are resolved against the
+    current contact list on every round, so contacts that show up later are
+    picked up too.
+    """
+
+    def __init__(
+        self,
+        mc,
+        targets: list[str],
+        airtime: AirtimeBudget,
+        db_path: str | None = None,
+        interval: float = POLL_INTERVAL,
+    ):
+        self.mc = mc
+        self.targets = [t.lower() for t in targets]
+        self.airtime = airtime
+        self.db_path = db_path
+        self.interval = interval
+        self.next_due = {}  # Key: public key, Value: monotonic due time
+        self.failures = {}  # Key: public key, Value: consecutive failures
+        self.latest = {}  # Key: public key, Value: last status payload
+        self._task = None
+
+    def start(self):
+        if self.db_path:
+            with closing(sqlite3.connect(self.db_path)) as conn, conn:
+                conn.execute(CREATE_STATUS_TABLE_SQL)
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    def _resolve(self):
+        contacts = []
+        for key, contact in self.mc.contacts.items():
+            name = contact.get("adv_name", "").lower()
+            if any(name == t or key.lower().startswith(t) for t in self.targets):
+                contacts.append(contact)
+        return contacts
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            contacts = self._resolve()
+            for contact in contacts:
+                # Spread the first round over a minute instead of polling at once
+                self.next_due.setdefault(
+                    contact["public_key"], now + random.uniform(0, 60)
+                )
+
+            due = [c for c in contacts if self.next_due[c["public_key"]] <= now]
+            if not due:
+                upcoming = [self.next_due[c["public_key"]] for c in contacts]
+                delay = min(upcoming) - now if upcoming else 60.0
+                await asyncio.sleep(min(max(delay, 1.0), 60.0))
+                continue
+
+            contact = min(due, key=lambda c: self.next_due[c["public_key"]])
+            await self.airtime.acquire()
+            await self._poll(contact)
+
+    async def _poll(self, contact: dict):
+        key = contact["public_key"]
+        start = time.monotonic()
+        try:
+            status = await asyncio.wait_for(
+                request_status_payload(self.mc, contact, BULK_TIMEOUT), BULK_TIMEOUT
+            )
+        except Exception:
+            status = None
+        rtt = time.monotonic() - start
+
+        if status is None:
+            failures = self.failures.get(key, 0) + 1
+            self.failures[key] = failures
+            delay = min(self.interval * 2**failures, MAX_BACKOFF)
+        else:
+            self.failures[key] = 0
+            self.latest[key] = status
+            delay = self.interval
+        self.next_due[key] = time.monotonic() + self._jittered(delay)
+
+        if self.db_path:
+            row = (int(time.time()), key[:12], int(rtt * 1000) if status else None)
+            row += tuple(status.get(name) if status else None for name in STATUS_FIELDS)
+            with suppress(sqlite3.Error):
+                await asyncio.to_thread(self._write_sample, row)
+
+    def _write_sample(self, row: tuple):
+        columns = ("timestamp", "pubkey_prefix", "rtt_ms") + STATUS_FIELDS
+        # closing() as well: the connection's own context manager only commits
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO status_samples ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                row,
+            )
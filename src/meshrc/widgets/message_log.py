@@ -4,8 +4,24 @@ from rich.table import Table
 from rich.text import Text
 from textual.widgets import RichLog
 
+from ..metrics import REGISTRY
+from ..record import MessageRecord, display_time, split_sender
+
 MESSAGE_GROUPING_THRESHOLD_SECONDS = 300
 
+RENDER_TIME = REGISTRY.histogram(
+    "meshrc_render_seconds", "Time to lay out and write one message row"
+)
+
+MENTION_STYLE = "bold reverse yellow"
+
+# Delivery state markers for outgoing direct messages
+DELIVERY_MARKS = {
+    "pending": ("…", "dim"),
+    "delivered": ("✓", "green"),
+    "failed": ("✗", "bold red"),
+}
+
 
 class MessageLog(RichLog):
     def __init__(self, **kwargs):
@@ -13,38 +29,88 @@ class MessageLog(RichLog):
         super().__init__(wrap=False, **kwargs)
         self.last_sender = None
         self.last_ts_val = 0
+        self.last_ts_str = ""
+        # Per row written: its table and the grouping state before it, so the
+        # rows from a changed one on can be redrawn
+        self.rows = []
 
     def clear(self):
         super().clear()
         self.last_sender = None
         self.last_ts_val = 0
-
-    def add_message(self, sender: str, content: str, timestamp: float = None):
-        ts_val = timestamp if timestamp else datetime.now().timestamp()
-        ts_str = datetime.fromtimestamp(ts_val).strftime("%H:%M")
-
-        # Parse content for "Sender : Message" pattern
-        if not sender and ":" in content:
-            parsed_sender, sep, parsed_content = content.partition(":")
-            parsed_sender = parsed_sender.strip()
-
-            if 0 < len(parsed_sender) <= 32:
-                sender = parsed_sender
-                content = parsed_content.strip()
-
+        self.last_ts_str = ""
+        self.rows = []
+
+    def add_record(self, record: MessageRecord):
+        """Show a message normalized at ingest; nothing is parsed here."""
+        with RENDER_TIME.time():
+            self._add_message(
+                record.sender,
+                record.text,
+                record.timestamp,
+                record.time_str,
+                record.status,
+                record.rtt,
+                record.mentions,
+                record.collapsed,
+            )
+
+    def redraw_from(self, index: int, records: list) -> bool:
+        """Redraw the rows from the index-th on with `records` (e.g. an ack came).
+
+        Rows before it are written again as they were laid out; only the
+        records' rows are built anew. Returns False if the rows shown don't
+        match, and the log needs a full reload.
+        """
+        if not records or len(self.rows) - index != len(records):
+            return False
+        kept = self.rows[:index]
+        grouping = self.rows[index][1]
+        super().clear()
+        self.rows = kept
+        for table, _ in kept:
+            self.write(table)
+        self.last_sender, self.last_ts_val, self.last_ts_str = grouping
+        for record in records:
+            self.add_record(record)
+        return True
+
+    def add_message(
+        self,
+        sender: str,
+        content: str,
+        timestamp: float = None,
+        status: str = None,
+        rtt: float = None,
+    ):
+        with RENDER_TIME.time():
+            ts_val = timestamp if timestamp else datetime.now().timestamp()
+
+            # Parse content for "Sender : Message" pattern
+            if not sender:
+                sender, content = split_sender(content)
+
+            self._add_message(
+                sender, content, ts_val, display_time(ts_val), status, rtt
+            )
+
+    def _add_message(
+        self, sender, content, ts_val, ts_str, status, rtt, mentions=(), collapsed=0
+    ):
         # Logic for hiding repetitive info
         show_ts = True
         show_sender = True
-
+        grouping = (self.last_sender, self.last_ts_val, self.last_ts_str)
         if self.last_sender == sender and (
             ts_val - self.last_ts_val < MESSAGE_GROUPING_THRESHOLD_SECONDS
         ):
             show_sender = False
-            if ts_str == datetime.fromtimestamp(self.last_ts_val).strftime("%H:%M"):
+            if ts_str == self.last_ts_str:
                 show_ts = False
 
         self.last_sender = sender
         self.last_ts_val = ts_val
+        self.last_ts_str = ts_str
 
         # Get actual available width to force correct wrapping
         # Subtract margin for scrollbar/border
@@ -72,7 +138,21 @@ class MessageLog(RichLog):
         c_sep = "│"
 
         c_msg = content
+        if mentions:
+            c_msg = Text(content)
+            for start, end in mentions:
+                c_msg.stylize(MENTION_STYLE, start, end)
+        if status in DELIVERY_MARKS:
+            mark, style = DELIVERY_MARKS[status]
+            c_msg = Text.assemble(c_msg, (f" {mark}", style))
+            if rtt is not None:
+                c_msg.append(f" {rtt:.1f}s", style="dim")
+        if collapsed:
+            c_msg = Text.assemble(
+                c_msg, (f" (+{collapsed} similar hidden)", "dim italic")
+            )
 
         table.add_row(c_time, c_nick, c_sep, c_msg)
 
+        self.rows.append((table, grouping))
         self.write(table)
@@ -1,11 +1,18 @@
+import asyncio
+from contextlib import suppress
 from typing import Any
 
-from textual.app import ComposeResult
 from textual.app import ComposeResult
 from textual.containers import Horizontal, Vertical
+from textual.message import Message
 from textual.reactive import reactive
 from textual.widgets import Button, Input, Label, ListItem, ListView, Static
-from textual.message import Message
+
+from ..metrics import REGISTRY
+
+REFRESH_TIME = REGISTRY.histogram(
+    "meshrc_sidebar_refresh_seconds", "Time to rebuild the sidebar list"
+)
 
 
 class ContactItem(ListItem):
@@ -39,6 +46,30 @@ class ContactItem(ListItem):
         display: block;
     }
 
+    ContactItem Label.mentions {
+        width: auto;
+        min-width: 3;
+        background: $warning;
+        color: $background;
+        text-align: center;
+        padding: 0 1;
+        display: none;
+    }
+
+    ContactItem.mentioned Label.mentions {
+        display: block;
+    }
+
+    ContactItem Label.link {
+        width: auto;
+        color: $error;
+        display: none;
+    }
+
+    ContactItem.weak Label.link {
+        display: block;
+    }
+
     ContactItem.favorite Label.name {
         color: $accent;
         text-style: bold;
@@ -56,6 +87,8 @@ class ContactItem(ListItem):
     """
 
     unread_count = reactive(0)
+    mention_count = reactive(0)
+    weak_link = reactive(False)
     is_favorite = reactive(False)
 
     def __init__(self, label: str, id: str = None, favorite: bool = False, key: str = "") -> None:
@@ -67,6 +100,8 @@ class ContactItem(ListItem):
     def compose(self) -> ComposeResult:
         display_label = f"★ {self.label_text}" if self.is_favorite else self.label_text
         yield Label(display_label, classes="name")
+        yield Label("▼ ", classes="link")
+        yield Label(f"@{self.mention_count}", classes="mentions")
         yield Label(str(self.unread_count), classes="badge")
 
     def watch_unread_count(self, count: int) -> None:
@@ -82,6 +117,21 @@ class ContactItem(ListItem):
         except Exception:
             pass
 
+    def watch_mention_count(self, count: int) -> None:
+        if not self.is_mounted:
+            return
+        try:
+            self.query_one(".mentions", Label).update(f"@{count}")
+            self.set_class(count > 0, "mentioned")
+        except Exception:
+            pass
+
+    def watch_weak_link(self, weak: bool) -> None:
+        self.set_class(weak, "weak")
+        self.tooltip = self.tooltip.removesuffix("\nSignal degrading")
+        if weak:
+            self.tooltip += "\nSignal degrading"
+
     def watch_is_favorite(self, favorite: bool) -> None:
         if not self.is_mounted:
             return
@@ -194,14 +244,21 @@ class Sidebar(Vertical):
     }
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, state=None, **kwargs):
         super().__init__(**kwargs)
         self.all_contacts: dict[str, Any] = {}
         self.all_channels: list[dict[str, Any]] = []
-        self.favorites: set[str] = set()
-        self.recents: list[str] = []
+        # Favorites and recents persist in the app's StateStore when given one
+        self.state = state
+        self.favorites: set[str] = state.favorites if state else set()
+        self.recents: list[str] = state.recents if state else []
         self.search_query: str = ""
         self.unread_counts: dict[str, int] = {}
+        self.mention_counts: dict[str, int] = {}
+        self.weak_links: set[str] = set()  # Items whose link quality is degrading
+        # Channel and contact updates can arrive together; rebuilding the
+        # list concurrently would mount duplicate item ids.
+        self._refresh_lock = asyncio.Lock()
 
     def compose(self) -> ComposeResult:
         yield Input(placeholder="Search contacts...", id="contact_search")
@@ -214,8 +271,6 @@ class Sidebar(Vertical):
 
     def update_channels(self, channels: list[dict[str, Any]]) -> None:
         self.all_channels = channels
-        import asyncio
-
         asyncio.create_task(self.refresh_list())
 
     async def update_contacts(self, contacts: dict[str, Any]) -> None:
@@ -223,9 +278,22 @@ class Sidebar(Vertical):
         await self.refresh_list()
 
     async def mark_recent(self, key: str):
-        pass
+        if self.state:
+            self.state.mark_recent(key)
+        else:
+            if key in self.recents:
+                self.recents.remove(key)
+            self.recents.insert(0, key)
+        # The order is applied on the next rebuild; only restyle the item now
+        with suppress(Exception):
+            self.query_one(f"#contact_{key}", ContactItem).add_class("recent")
 
     async def refresh_list(self) -> None:
+        async with self._refresh_lock:
+            with REFRESH_TIME.time():
+                await self._rebuild_list()
+
+    async def _rebuild_list(self) -> None:
         list_view = self.query_one("#sidebar_list", ListView)
 
         selected_id = None
@@ -237,16 +305,19 @@ class Sidebar(Vertical):
 
         # Channels
         await list_view.append(SidebarHeader("CHANNELS", show_controls=True))
-        sorted_channels = sorted(self.all_channels, key=lambda x: x.get('channel_idx', 0))
+        # Channels merged from several devices carry their own context id and label
+        sorted_channels = sorted(
+            self.all_channels,
+            key=lambda x: (x.get("device_index", 0), x.get("channel_idx", 0)),
+        )
         for ch in sorted_channels:
             name = ch.get("channel_name", "")
             if not name: continue
             idx = ch.get('channel_idx')
-            c_id = f"chan_{idx}"
-            item = ContactItem(name, id=c_id)
+            c_id = ch.get("context_id", f"chan_{idx}")
+            item = ContactItem(ch.get("label", name), id=c_id)
             await list_view.append(item)
-            if c_id in self.unread_counts:
-                item.unread_count = self.unread_counts[c_id]
+            self._restore_counts(item)
 
         # Contacts
         await list_view.append(SidebarHeader("CONTACTS"))
@@ -257,15 +328,23 @@ class Sidebar(Vertical):
             if not self.search_query or self.search_query in name.lower():
                 all_candidates.append((key, name))
         
-        # Sort: Favorites first (False), then Alpha
-        all_candidates.sort(key=lambda x: (x[0] not in self.favorites, x[1].lower()))
+        # Sort: Favorites first (False), then most recently used, then Alpha
+        recent_rank = {key: i for i, key in enumerate(self.recents)}
+        all_candidates.sort(
+            key=lambda x: (
+                x[0] not in self.favorites,
+                recent_rank.get(x[0], len(recent_rank)),
+                x[1].lower(),
+            )
+        )
 
         for key, name in all_candidates:
             c_id = f"contact_{key}"
             item = ContactItem(name, id=c_id, favorite=(key in self.favorites), key=key)
+            if key in recent_rank:
+                item.add_class("recent")
             await list_view.append(item)
-            if c_id in self.unread_counts:
-                item.unread_count = self.unread_counts[c_id]
+            self._restore_counts(item)
 
         # Restore selection
         if selected_id:
@@ -274,11 +353,20 @@ class Sidebar(Vertical):
                     list_view.index = i
                     break
 
+    def _restore_counts(self, item: ContactItem):
+        if item.id in self.unread_counts:
+            item.unread_count = self.unread_counts[item.id]
+        if item.id in self.mention_counts:
+            item.mention_count = self.mention_counts[item.id]
+        item.weak_link = item.id in self.weak_links
+
     async def toggle_favorite(self, item_id: str):
         if not item_id or not item_id.startswith("contact_"):
             return
         key = item_id.split("contact_")[1]
-        if key in self.favorites:
+        if self.state:
+            self.state.toggle_favorite(key)
+        elif key in self.favorites:
             self.favorites.remove(key)
         else:
             self.favorites.add(key)
@@ -298,6 +386,24 @@ class Sidebar(Vertical):
 
     def clear_unread(self, item_id: str):
         self.set_unread(item_id, 0)
+        if self.mention_counts.pop(item_id, None):
+            with suppress(Exception):
+                self.query_one(f"#{item_id}", ContactItem).mention_count = 0
+
+    def increment_mentions(self, item_id: str):
+        """Count a message mentioning a highlight term, apart from unread ones."""
+        count = self.mention_counts.get(item_id, 0) + 1
+        self.mention_counts[item_id] = count
+        with suppress(Exception):
+            self.query_one(f"#{item_id}", ContactItem).mention_count = count
+
+    def set_weak_link(self, item_id: str, weak: bool):
+        if weak:
+            self.weak_links.add(item_id)
+        else:
+            self.weak_links.discard(item_id)
+        with suppress(Exception):
+            self.query_one(f"#{item_id}", ContactItem).weak_link = weak
 
     def select_next(self):
         list_view = self.query_one("#sidebar_list", ListView)
@@ -369,4 +475,19 @@ class Sidebar(Vertical):
             if isinstance(item, ContactItem) and item.unread_count > 0:
                 list_view.index = i
                 return item
-        return None
\ No newline at end of file
+        return None
+
+    def select_next_mention(self):
+        list_view = self.query_one("#sidebar_list", ListView)
+        if not list_view.children:
+            return None
+
+        start_index = list_view.index if list_view.index is not None else -1
+        count = len(list_view.children)
+        for offset in range(1, count + 1):
+            i = (start_index + offset) % count
+            item = list_view.children[i]
+            if isinstance(item, ContactItem) and item.mention_count > 0:
+                list_view.index = i
+                return item
+        return None
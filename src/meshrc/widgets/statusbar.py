@@ -0,0 +1,26 @@
+from textual.widgets import Static
+
+
+class StatusBar(Static):
+    """A one-line bar showing named status segments (sync progress, etc)."""
+
+    DEFAULT_CSS = """
+    StatusBar {
+        height: 1;
+        padding: 0 1;
+        background: $surface-darken-1;
+        color: $text-muted;
+    }
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__("", **kwargs)
+        self.segments: dict[str, str] = {}
+
+    def set_segment(self, name: str, text: str | None):
+        """Set or clear (with None/empty text) a named segment."""
+        if text:
+            self.segments[name] = text
+        else:
+            self.segments.pop(name, None)
+        self.update(" │ ".join(self.segments.values()))